@@ -7,6 +7,8 @@ from celery import Celery
 from celery.signals import worker_ready, worker_shutdown
 import redis
 import time
+import json
+import threading
 import logging
 
 # Настройка логирования
@@ -22,6 +24,13 @@ RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://redis:6379/0')
 # Backend URL для AI Tasks (используется в tasks.py)
 # BACKEND_INTERNAL_URL используется в tasks.py как BACKEND_URL
 
+# Push-уведомления о новых постах (Backend публикует после ingest)
+NEW_POSTS_CHANNEL = os.getenv('NEW_POSTS_CHANNEL', 'morningstar:new_posts')
+# Минимальный интервал между проверками, запущенными по событиям
+NEW_POSTS_DEBOUNCE_SECONDS = float(os.getenv('NEW_POSTS_DEBOUNCE_SECONDS', '5'))
+# Beat остается страховкой на случай потери события
+AI_POLL_SAFETY_NET_SECONDS = float(os.getenv('AI_POLL_SAFETY_NET_SECONDS', '120'))
+
 # Создание Celery app
 app = Celery('ai_services')
 
@@ -60,7 +69,7 @@ app.conf.update(
     beat_schedule={
         'auto-check-new-posts': {
             'task': 'tasks.check_for_new_posts',
-            'schedule': 30.0,  # Каждые 30 секунд
+            'schedule': AI_POLL_SAFETY_NET_SECONDS,  # Страховка: основной триггер - событие new_posts
             'options': {
                 'queue': 'monitoring',
                 'priority': 5,  # Низкий приоритет, не мешает основной обработке
@@ -102,6 +111,41 @@ def wait_for_redis():
     logger.error("❌ Failed to connect to Redis after maximum retries")
     return False
 
+def new_posts_listener():
+    """Подписка на new_posts: ставит check_for_new_posts сразу после ingest (с debounce)"""
+    last_scheduled_at = 0.0
+    
+    while True:
+        try:
+            client = redis.from_url(REDIS_URL)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(NEW_POSTS_CHANNEL)
+            logger.info(f"📡 Подписка на новые посты: {NEW_POSTS_CHANNEL}")
+            
+            for message in pubsub.listen():
+                try:
+                    event = json.loads(message['data'])
+                except (TypeError, ValueError):
+                    event = {}
+                
+                now = time.monotonic()
+                if last_scheduled_at > now:
+                    # Проверка уже запланирована и подхватит эти посты
+                    continue
+                
+                countdown = max(0.0, last_scheduled_at + NEW_POSTS_DEBOUNCE_SECONDS - now)
+                last_scheduled_at = now + countdown
+                app.send_task(
+                    'tasks.check_for_new_posts',
+                    queue='monitoring',
+                    countdown=countdown
+                )
+                logger.info(f"📣 Новые посты ({event.get('created', '?')}), проверка через {countdown:.1f}с")
+                
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка подписки на новые посты: {e}, переподключение через 10с")
+            time.sleep(10)
+
 @worker_ready.connect
 def worker_ready_handler(sender=None, **kwargs):
     """Обработчик готовности worker"""
@@ -109,6 +153,12 @@ def worker_ready_handler(sender=None, **kwargs):
     logger.info(f"Worker: {sender}")
     logger.info(f"Broker: {REDIS_URL}")
     logger.info(f"Backend: {RESULT_BACKEND}")
+    
+    # Слушатель запускается только на worker'е, который обслуживает очередь monitoring
+    task_consumer = getattr(sender, 'task_consumer', None)
+    queues = [queue.name for queue in getattr(task_consumer, 'queues', [])]
+    if 'monitoring' in queues:
+        threading.Thread(target=new_posts_listener, name='new-posts-listener', daemon=True).start()
 
 @worker_shutdown.connect
 def worker_shutdown_handler(sender=None, **kwargs):
@@ -21,22 +21,37 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
 
 import asyncio
-import aiohttp
 import json
 import logging
 import argparse
+import socket
+import time
 from typing import Dict, List, Optional, Any
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 
 from models.post import Post
 from utils.settings_manager import SettingsManager
+from utils.http_client import BackendHTTPClient
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # push-уведомления опциональны - остается опрос
+    aioredis = None
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('AIOrchestrator_v5_Parallel')
 
+SERVICE_LABELS = {
+    'categorization': '🏷️ Категоризация',
+    'summarization': '📝 Саммаризация'
+}
+
+# Лимит post_ids одного запроса /api/ai/results/by-posts (AI_RESULTS_LOOKUP_MAX_POSTS в Backend)
+RESULTS_LOOKUP_MAX_POSTS = 500
+
 class ProcessingStatus(Enum):
     PENDING = "pending"
     PROCESSING = "processing"
@@ -54,6 +69,15 @@ class ProcessingResult:
     processing_version: str = "v5.8_single_summarization"
     error_message: Optional[str] = None
 
+@dataclass
+class PipelineBatch:
+    """Арендованный батч одного бота, проходящий стадии fetch → LLM → persist"""
+    bot: Dict[str, Any]
+    post_ids: List[int]  # все арендованные посты - аренду снимаем по ним
+    posts: List[Dict[str, Any]]  # посты, подготовленные для LLM
+    lease_deadline: Optional[float] = None  # time.monotonic() истечения аренды (отсчет от запроса claim)
+    results: List[ProcessingResult] = field(default_factory=list)
+
 class AIOrchestrator:
     def __init__(self, backend_url: str = "http://localhost:8000", batch_size: int = None):
         self.backend_url = backend_url
@@ -63,8 +87,11 @@ class AIOrchestrator:
         if not self.openai_api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
         
+        # Один keep-alive пул соединений к Backend на процесс: оркестратор, SettingsManager и сервисы
+        self.http = BackendHTTPClient()
+        
         # Инициализируем SettingsManager для динамической загрузки LLM настроек
-        self.settings_manager = SettingsManager(backend_url=backend_url)
+        self.settings_manager = SettingsManager(backend_url=backend_url, http_client=self.http)
         
         self.categorization_service = None
         self.summarization_service = None
@@ -74,34 +101,66 @@ class AIOrchestrator:
         self.summarization_is_running = False
         self.workers_lock = asyncio.Lock()
         
-        # Лимиты для предотвращения слишком долгой обработки
-        self.max_batches_per_cycle = 10
+        # Аренда батча истекает, если воркер завис или упал
         self.batch_timeout_minutes = 5
         
+        # Боты обрабатываются параллельно: общий лимит одновременных LLM батчей (на оба сервиса)
+        # и число батчей одного бота в конвейере сервиса (аренда → LLM → сохранение)
+        self.max_concurrent_batches = int(os.getenv('AI_MAX_CONCURRENT_BATCHES', '4'))
+        self.per_bot_concurrency = int(os.getenv('AI_PER_BOT_CONCURRENCY', '3'))
+        self.batch_semaphore = asyncio.Semaphore(self.max_concurrent_batches)
+        
+        # Конвейер fetch → LLM → persist: ограниченные очереди между стадиями (backpressure)
+        self.pipeline_queue_size = int(os.getenv('AI_PIPELINE_QUEUE_SIZE', '2'))
+        self.pipeline_persist_workers = int(os.getenv('AI_PIPELINE_PERSIST_WORKERS', '2'))
+        
+        # Одиночные запросы саммаризации идут параллельно: общий лимит одновременных запросов
+        self.summarization_concurrency = int(os.getenv('AI_SUMMARIZATION_CONCURRENCY', '5'))
+        self.summarization_semaphore = asyncio.Semaphore(self.summarization_concurrency)
+        self.pipeline_queues: Dict[str, Dict[str, asyncio.Queue]] = {}
+        
+        # Идентификатор воркера для аренды постов (POST /api/ai/work/claim)
+        self.worker_id = f"orchestrator-{socket.gethostname()}-{os.getpid()}"
+        
+        # Push-уведомления о новых постах (Redis pub/sub от Backend ingest)
+        self.redis_url = os.getenv('REDIS_URL', os.getenv('CELERY_BROKER_URL', 'redis://redis:6379/0'))
+        self.new_posts_channel = os.getenv('NEW_POSTS_CHANNEL', 'morningstar:new_posts')
+        self.push_connected = False
+        self.work_signals = {
+            'categorization': asyncio.Event(),
+            'summarization': asyncio.Event()
+        }
+        # Опрос остается страховкой: редкий при активной подписке, прежний 30с без нее
+        self.idle_poll_seconds = int(os.getenv('AI_IDLE_POLL_SECONDS', '120'))
+        self.fallback_poll_seconds = 30
+        
+        # Снимок топологии ботов (/api/bot-topology): перечитывается условным GET по ETag
+        self.bot_topology: Optional[Dict[str, Any]] = None
+        self.bot_topology_etag: Optional[str] = None
+        
         logger.info(f"🚀 AI Orchestrator v5.7 инициализирован (Параллельная архитектура)")
         logger.info(f"   Backend URL: {backend_url}")
         logger.info(f"   Размер батча: {batch_size if batch_size else 'будет загружен из настроек'}")
-        logger.info(f"   Макс батчей за цикл: {self.max_batches_per_cycle}")
+        logger.info(f"   Параллельных батчей: {self.max_concurrent_batches} (на бота: {self.per_bot_concurrency}), очереди конвейера: {self.pipeline_queue_size}")
         logger.info(f"   SettingsManager: инициализирован для динамической загрузки LLM настроек")
     
     async def _get_batch_size_from_settings(self) -> int:
         """Получение размера батча из настроек Backend API (MAX_POSTS_FOR_AI_ANALYSIS)"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.backend_url}/api/settings") as response:
-                    if response.status == 200:
-                        settings = await response.json()
-                        for setting in settings:
-                            if setting.get('key') == 'MAX_POSTS_FOR_AI_ANALYSIS':
-                                batch_size = int(setting.get('value', 30))
-                                logger.info(f"📦 Размер батча из настроек MAX_POSTS_FOR_AI_ANALYSIS: {batch_size}")
-                                return batch_size
+            async with self.http.session.get(f"{self.backend_url}/api/settings") as response:
+                if response.status == 200:
+                    settings = await response.json()
+                    for setting in settings:
+                        if setting.get('key') == 'MAX_POSTS_FOR_AI_ANALYSIS':
+                            batch_size = int(setting.get('value', 30))
+                            logger.info(f"📦 Размер батча из настроек MAX_POSTS_FOR_AI_ANALYSIS: {batch_size}")
+                            return batch_size
                         
-                        logger.warning("⚠️ Настройка 'MAX_POSTS_FOR_AI_ANALYSIS' не найдена, используем 30")
-                        return 30
-                    else:
-                        logger.error(f"❌ Ошибка получения настроек: HTTP {response.status}")
-                        return 30
+                    logger.warning("⚠️ Настройка 'MAX_POSTS_FOR_AI_ANALYSIS' не найдена, используем 30")
+                    return 30
+                else:
+                    logger.error(f"❌ Ошибка получения настроек: HTTP {response.status}")
+                    return 30
         except Exception as e:
             logger.error(f"❌ Ошибка запроса настроек: {str(e)}")
             return 30
@@ -132,7 +191,8 @@ class AIOrchestrator:
                 openai_api_key=self.openai_api_key,
                 backend_url=self.backend_url,
                 batch_size=self.batch_size,  # Используем размер батча из настроек
-                settings_manager=self.settings_manager  # Передаем SettingsManager
+                settings_manager=self.settings_manager,  # Передаем SettingsManager
+                http_client=self.http
             )
             
             self.summarization_service = SummarizationService(
@@ -164,6 +224,7 @@ class AIOrchestrator:
                 self.categorization_worker(),
                 self.summarization_worker(),
                 self.heartbeat_worker(),
+                self.new_posts_listener(),
                 return_exceptions=True
             )
         except KeyboardInterrupt:
@@ -198,12 +259,11 @@ class AIOrchestrator:
         
         # Получаем статистику из Backend API
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.backend_url}/api/ai/status") as response:
-                    if response.status == 200:
-                        ai_stats = await response.json()
-                    else:
-                        ai_stats = {}
+            async with self.http.session.get(f"{self.backend_url}/api/ai/status") as response:
+                if response.status == 200:
+                    ai_stats = await response.json()
+                else:
+                    ai_stats = {}
         except:
             ai_stats = {}
         
@@ -224,25 +284,79 @@ class AIOrchestrator:
             "version": "v5.7_parallel_workers",
             "timestamp": datetime.now().isoformat(),
             "backend_url": self.backend_url,
-            "batch_size": self.batch_size
+            "batch_size": self.batch_size,
+            "details": {
+                "http": self.http.get_stats(),
+                "pipeline": self.get_pipeline_stats()
+            }
         }
 
     async def send_heartbeat(self, status_data: Dict[str, Any]):
         """Отправляет heartbeat статус в Backend API"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.backend_url}/api/ai/orchestrator-status",
-                    json=status_data,
-                    headers={"Content-Type": "application/json"}
-                ) as response:
-                    if response.status == 200:
-                        logger.debug("💓 Heartbeat отправлен успешно")
-                    else:
-                        logger.warning(f"⚠️ Heartbeat ошибка: {response.status}")
+            async with self.http.session.post(
+                f"{self.backend_url}/api/ai/orchestrator-status",
+                json=status_data,
+                headers={"Content-Type": "application/json"}
+            ) as response:
+                if response.status == 200:
+                    logger.debug("💓 Heartbeat отправлен успешно")
+                else:
+                    logger.warning(f"⚠️ Heartbeat ошибка: {response.status}")
         except Exception as e:
             logger.warning(f"⚠️ Ошибка отправки heartbeat: {e}")
 
+    async def new_posts_listener(self):
+        """Подписка на событие new_posts: будит workers сразу после ingest вместо ожидания опроса"""
+        if aioredis is None:
+            logger.warning("⚠️ Пакет redis недоступен - новые посты обнаруживаются только опросом")
+            return
+        
+        logger.info(f"📡 Запуск New Posts Listener ({self.new_posts_channel})")
+        
+        while True:
+            client = None
+            try:
+                client = aioredis.from_url(self.redis_url)
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(self.new_posts_channel)
+                self.push_connected = True
+                logger.info("📡 Подписка на новые посты активна")
+                
+                async for message in pubsub.listen():
+                    try:
+                        event = json.loads(message['data'])
+                    except (TypeError, ValueError):
+                        event = {}
+                    logger.info(f"📣 Новые посты: {event.get('created', '?')} в каналах {event.get('channel_telegram_ids', [])}")
+                    for signal in self.work_signals.values():
+                        signal.set()
+                        
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка подписки на новые посты: {e}")
+            finally:
+                self.push_connected = False
+                if client is not None:
+                    try:
+                        await client.aclose()
+                    except Exception:
+                        pass
+            
+            # Переподключение; пока подписки нет, workers опрашивают с прежним интервалом
+            await asyncio.sleep(10)
+
+    async def wait_for_work_signal(self, service: str):
+        """Ждать события new_posts или истечения интервала опроса (страховка)"""
+        signal = self.work_signals[service]
+        timeout = self.idle_poll_seconds if self.push_connected else self.fallback_poll_seconds
+        try:
+            await asyncio.wait_for(signal.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        signal.clear()
+
     async def categorization_worker(self):
         """Worker цикл для категоризации"""
         logger.info("🏷️ Запуск Categorization Worker")
@@ -259,7 +373,7 @@ class AIOrchestrator:
                 # Быстрая проверка наличия работы
                 if not await self.has_uncategorized_posts():
                     logger.debug("🏷️ Нет некатегоризированных постов")
-                    await asyncio.sleep(30)
+                    await self.wait_for_work_signal('categorization')
                     continue
                 
                 # Выставляем флаг активности
@@ -277,8 +391,8 @@ class AIOrchestrator:
                         self.categorization_is_running = False
                     logger.info("🏷️ Categorization Worker: цикл завершен")
                 
-                # Небольшая пауза перед следующей проверкой
-                await asyncio.sleep(30)
+                # Ждем новых постов (или интервала опроса) перед следующей проверкой
+                await self.wait_for_work_signal('categorization')
                 
             except Exception as e:
                 logger.error(f"❌ Ошибка в Categorization Worker: {e}")
@@ -303,7 +417,7 @@ class AIOrchestrator:
                 # Быстрая проверка наличия работы
                 if not await self.has_unsummarized_posts():
                     logger.debug("📝 Нет несаммаризированных постов")
-                    await asyncio.sleep(30)
+                    await self.wait_for_work_signal('summarization')
                     continue
                 
                 # Выставляем флаг активности
@@ -321,8 +435,8 @@ class AIOrchestrator:
                         self.summarization_is_running = False
                     logger.info("📝 Summarization Worker: цикл завершен")
                 
-                # Небольшая пауза перед следующей проверкой
-                await asyncio.sleep(30)
+                # Ждем новых постов (или интервала опроса) перед следующей проверкой
+                await self.wait_for_work_signal('summarization')
                 
             except Exception as e:
                 logger.error(f"❌ Ошибка в Summarization Worker: {e}")
@@ -333,210 +447,233 @@ class AIOrchestrator:
 
     async def has_uncategorized_posts(self) -> bool:
         """Быстрая проверка наличия некатегоризированных постов"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.backend_url}/api/ai/status") as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        # Проверяем количество некатегоризированных постов
-                        flags_stats = data.get("flags_stats", {})
-                        categorized = flags_stats.get("categorized", 0)
-                        total_posts = data.get("total_posts", 0)
-                        uncategorized = total_posts - categorized
-                        logger.debug(f"🏷️ Проверка категоризации: {categorized}/{total_posts} (осталось: {uncategorized})")
-                        return uncategorized > 0
-        except Exception as e:
-            logger.warning(f"⚠️ Ошибка проверки некатегоризированных постов: {e}")
-            # При ошибке считаем что работа есть (fail-safe)
-            return True
-        return False
+        return await self.has_work_available('categorization')
 
     async def has_unsummarized_posts(self) -> bool:
         """Быстрая проверка наличия несаммаризированных постов"""
+        return await self.has_work_available('summarization')
+
+    async def has_work_available(self, service: str) -> bool:
+        """Проверка наличия работы через GET /api/ai/work/available (EXISTS по каждому боту)"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.backend_url}/api/ai/status") as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        # Проверяем количество несаммаризированных постов (независимо от категоризации)
-                        flags_stats = data.get("flags_stats", {})
-                        summarized = flags_stats.get("summarized", 0)
-                        total_posts = data.get("total_posts", 0)
-                        unsummarized = total_posts - summarized
-                        logger.debug(f"📝 Проверка саммаризации: {summarized}/{total_posts} (осталось: {unsummarized})")
-                        return unsummarized > 0
+            async with self.http.session.get(
+                f"{self.backend_url}/api/ai/work/available",
+                params={"service": service}
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    has_work = data.get("services", {}).get(service, False)
+                    logger.debug(f"🔍 Проверка работы для {service}: {'есть' if has_work else 'нет'}")
+                    return has_work
         except Exception as e:
-            logger.warning(f"⚠️ Ошибка проверки несаммаризированных постов: {e}")
+            logger.warning(f"⚠️ Ошибка проверки наличия работы для {service}: {e}")
             # При ошибке считаем что работа есть (fail-safe)
             return True
         return False
 
     async def process_all_categorization(self):
         """Обрабатывает ВСЕ некатегоризированные посты до завершения"""
-        batches_processed = 0
-        
-        while batches_processed < self.max_batches_per_cycle:
-            # Получаем активных ботов
-            active_bots = await self.get_active_bots()
-            if not active_bots:
-                logger.info("✅ Нет активных ботов для категоризации")
-                break
-            
-            work_found = False
-            
-            for bot in active_bots:
-                try:
-                    # Получаем посты для категоризации
-                    posts = await self.get_posts_for_categorization(bot)
-                    
-                    if posts:
-                        work_found = True
-                        logger.info(f"🏷️ Категоризация: {len(posts)} постов для бота '{bot['name']}'")
-                        
-                        # Обрабатываем категоризацию
-                        await self.process_categorization_batch(posts, bot)
-                        
-                        # Флаг категоризации обновляется в process_categorization_batch
-                        
-                except Exception as e:
-                    logger.error(f"❌ Ошибка категоризации для бота '{bot['name']}': {e}")
-            
-            if not work_found:
-                logger.info("✅ Все посты категоризированы")
-                break
-            
-            batches_processed += 1
-            
-            # Небольшая пауза между батчами
-            await asyncio.sleep(1)
-        
-        if batches_processed >= self.max_batches_per_cycle:
-            logger.warning(f"⚠️ Достигнут лимит батчей категоризации: {self.max_batches_per_cycle}")
+        processed = await self.process_all_bots('categorization')
+        logger.info(f"✅ Все посты категоризированы (обработано за цикл: {processed})")
 
     async def process_all_summarization(self):
         """Обрабатывает ВСЕ несаммаризированные посты до завершения"""
-        batches_processed = 0
-        
-        while batches_processed < self.max_batches_per_cycle:
-            # Получаем активных ботов
-            active_bots = await self.get_active_bots()
-            if not active_bots:
-                logger.info("✅ Нет активных ботов для саммаризации")
-                break
-            
-            work_found = False
-            
-            for bot in active_bots:
-                try:
-                    # Получаем посты для саммаризации
-                    posts = await self.get_posts_for_summarization(bot)
-                    
-                    if posts:
-                        work_found = True
-                        logger.info(f"📝 Саммаризация: {len(posts)} постов для бота '{bot['name']}'")
-                        
-                        # Обрабатываем саммаризацию
-                        await self.process_summarization_batch(posts, bot)
-                        
-                        # Флаг саммаризации обновляется в process_summarization_batch
-                        
-                except Exception as e:
-                    logger.error(f"❌ Ошибка саммаризации для бота '{bot['name']}': {e}")
+        processed = await self.process_all_bots('summarization')
+        logger.info(f"✅ Все посты саммаризированы (обработано за цикл: {processed})")
+
+    async def process_all_bots(self, service: str) -> int:
+        """Параллельная обработка активных ботов конвейером fetch → LLM → persist.
+        
+        Каждый бот выбирается до пустой очереди. Пока один батч в LLM, следующий уже
+        арендован, а предыдущий сохраняется - I/O Backend и задержка LLM перекрываются.
+        Медленный LLM батч одного бота не задерживает остальных.
+        """
+        active_bots = await self.get_active_bots()
+        if not active_bots:
+            logger.info(f"✅ Нет активных ботов для {service}")
+            return 0
+        
+        fetched = asyncio.Queue(maxsize=self.pipeline_queue_size)
+        to_persist = asyncio.Queue(maxsize=self.pipeline_queue_size)
+        self.pipeline_queues[service] = {"fetched": fetched, "persist": to_persist}
+        
+        # Слоты бота: батчей одного бота в конвейере одновременно (освобождаются после сохранения)
+        bot_slots = {bot['id']: asyncio.Semaphore(self.per_bot_concurrency) for bot in active_bots}
+        stalled_bots = set()
+        totals = {"processed": 0}
+        
+        llm_workers = [
+            asyncio.create_task(self.llm_stage(service, fetched, to_persist))
+            for _ in range(self.max_concurrent_batches)
+        ]
+        persist_workers = [
+            asyncio.create_task(self.persist_stage(service, to_persist, bot_slots, stalled_bots, totals))
+            for _ in range(self.pipeline_persist_workers)
+        ]
+        try:
+            await asyncio.gather(*[
+                self.fetch_stage(bot, service, fetched, bot_slots[bot['id']], stalled_bots)
+                for bot in active_bots
+            ])
+            await fetched.join()
+            await to_persist.join()
+        finally:
+            for task in llm_workers + persist_workers:
+                task.cancel()
+            await asyncio.gather(*llm_workers, *persist_workers, return_exceptions=True)
+            self.pipeline_queues.pop(service, None)
+        
+        return totals["processed"]
+
+    async def fetch_stage(self, bot: Dict[str, Any], service: str, fetched: asyncio.Queue,
+                          slots: asyncio.Semaphore, stalled_bots: set):
+        """Стадия fetch: арендовать батчи бота, пока аренда не вернет пустой список"""
+        while bot['id'] not in stalled_bots:
+            await slots.acquire()
+            # Аренда отсчитывается от запроса claim - ожидание в очередях тоже расходует ее
+            lease_deadline = time.monotonic() + self.batch_timeout_minutes * 60
+            posts = await self.claim_posts(bot, service)
+            if not posts:
+                slots.release()
+                return
             
-            if not work_found:
-                logger.info("✅ Все посты саммаризированы")
-                break
+            logger.info(f"{SERVICE_LABELS[service]}: {len(posts)} постов для бота '{bot['name']}'")
+            batch = PipelineBatch(bot=bot, post_ids=[p['id'] for p in posts], posts=posts, lease_deadline=lease_deadline)
+            if service == 'summarization':
+                batch.posts = await self.attach_categories(posts, bot)
             
-            batches_processed += 1
+            # Полная очередь блокирует аренду следующего батча (backpressure)
+            await fetched.put(batch)
+
+    async def llm_stage(self, service: str, fetched: asyncio.Queue, to_persist: asyncio.Queue):
+        """Стадия LLM: обработка батчей под общим лимитом одновременных LLM батчей"""
+        while True:
+            batch = await fetched.get()
+            try:
+                async with self.batch_semaphore:
+                    if service == 'categorization':
+                        batch.results = await self.categorize_batch(batch.posts, batch.bot)
+                    else:
+                        batch.results = await self.summarize_batch(batch.posts, batch.bot, lease_deadline=batch.lease_deadline)
+            except Exception as e:
+                logger.error(f"❌ Ошибка {service} для бота '{batch.bot['name']}': {e}")
+            finally:
+                # Батч уходит на сохранение даже с ошибкой: там снимается аренда и слот бота
+                await to_persist.put(batch)
+                fetched.task_done()
+
+    async def persist_stage(self, service: str, to_persist: asyncio.Queue, bot_slots: Dict[int, asyncio.Semaphore],
+                            stalled_bots: set, totals: Dict[str, int]):
+        """Стадия persist: сохранить результаты, обновить флаги и снять аренду"""
+        while True:
+            batch = await to_persist.get()
+            bot = batch.bot
+            processed = 0
+            try:
+                processed = await self.persist_results(batch.results, bot, service)
+            except Exception as e:
+                logger.error(f"❌ Ошибка сохранения {service} для бота '{bot['name']}': {e}")
+            finally:
+                await self.release_posts(batch.post_ids, bot['id'], service)
+                bot_slots[bot['id']].release()
+                to_persist.task_done()
             
-            # Небольшая пауза между батчами
-            await asyncio.sleep(1)
-        
-        if batches_processed >= self.max_batches_per_cycle:
-            logger.warning(f"⚠️ Достигнут лимит батчей саммаризации: {self.max_batches_per_cycle}")
+            totals["processed"] += processed
+            if not processed and bot['id'] not in stalled_bots:
+                # Батч без результата вернется в следующей аренде - не крутим его по кругу
+                stalled_bots.add(bot['id'])
+                logger.warning(f"⚠️ {service}: батч бота '{bot['name']}' без результата, бот отложен до следующего цикла")
+
+    def get_pipeline_stats(self) -> Dict[str, Any]:
+        """Глубина очередей конвейера по сервисам (пусто - конвейер сервиса простаивает)"""
+        return {
+            service: {
+                stage: {"depth": queue.qsize(), "maxsize": queue.maxsize}
+                for stage, queue in queues.items()
+            }
+            for service, queues in self.pipeline_queues.items()
+        }
 
     # ===== ВСПОМОГАТЕЛЬНЫЕ МЕТОДЫ =====
     
     async def get_posts_for_categorization(self, bot: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Получить посты для категоризации (is_categorized=false)"""
-        bot_id = bot['id']
-        
-        # Получаем каналы бота
-        channels = await self.get_bot_channels(bot_id)
-        if not channels:
-            return []
+        """Арендовать посты для категоризации (is_categorized=false)"""
+        return await self.claim_posts(bot, 'categorization')
+
+    async def get_posts_for_summarization(self, bot: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Арендовать посты для саммаризации (is_summarized=false)"""
+        return await self.claim_posts(bot, 'summarization')
+
+    async def claim_posts(self, bot: Dict[str, Any], service: str) -> List[Dict[str, Any]]:
+        """Атомарная аренда постов через POST /api/ai/work/claim.
         
-        channel_telegram_ids = [ch['telegram_id'] for ch in channels]
+        Backend выдает каждому воркеру непересекающийся набор постов (SKIP LOCKED),
+        поэтому несколько оркестраторов не дублируют LLM вызовы. Если воркер упадет,
+        аренда истечет через batch_timeout_minutes и посты заберет другой воркер.
+        """
+        payload = {
+            "bot_id": bot['id'],
+            "service": service,
+            "worker_id": self.worker_id,
+            "limit": self.batch_size,
+            "lease_seconds": self.batch_timeout_minutes * 60
+        }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                params = {
-                    "channel_telegram_ids": ",".join(map(str, channel_telegram_ids)),
-                    "bot_id": bot_id,
-                    "limit": self.batch_size,
-                    "require_categorization": "true"  # Только некатегоризированные
-                }
-                
-                logger.debug(f"📋 Запрос постов для категоризации с limit={self.batch_size}")
-                
-                async with session.get(
-                    f"{self.backend_url}/api/posts/unprocessed",
-                    params=params
-                ) as response:
-                    if response.status == 200:
-                        posts = await response.json()
-                        logger.debug(f"📊 Получено {len(posts)} постов для категоризации (запрошено limit={self.batch_size})")
-                        return posts  # Endpoint возвращает список напрямую
-                    else:
-                        logger.warning(f"⚠️ Ошибка получения постов для категоризации: {response.status}")
-                        return []
+            async with self.http.session.post(
+                f"{self.backend_url}/api/ai/work/claim",
+                json=payload
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    posts = data.get("posts", [])
+                    logger.debug(f"🔒 Арендовано {len(posts)} постов для {service} (limit={self.batch_size}, до {data.get('lease_expires_at')})")
+                    return posts
+                else:
+                    logger.warning(f"⚠️ Ошибка аренды постов для {service}: {response.status}")
+                    return []
         except Exception as e:
-            logger.error(f"❌ Ошибка запроса постов для категоризации: {e}")
+            logger.error(f"❌ Ошибка запроса аренды постов для {service}: {e}")
             return []
 
-    async def get_posts_for_summarization(self, bot: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Получить посты для саммаризации (is_categorized=true, is_summarized=false)"""
-        bot_id = bot['id']
-        
-        # Получаем каналы бота
-        channels = await self.get_bot_channels(bot_id)
-        if not channels:
-            return []
-        
-        channel_telegram_ids = [ch['telegram_id'] for ch in channels]
+    async def release_posts(self, post_ids: List[int], bot_id: int, service: str):
+        """Снять аренду постов (успешные посты backend освобождает сам при сохранении статуса)"""
+        if not post_ids:
+            return
         
         try:
-            async with aiohttp.ClientSession() as session:
-                params = {
-                    "channel_telegram_ids": ",".join(map(str, channel_telegram_ids)),
+            async with self.http.session.post(
+                f"{self.backend_url}/api/ai/work/release",
+                json={
                     "bot_id": bot_id,
-                    "limit": self.batch_size,
-                    "require_summarization": "true"  # Только несаммаризированные
+                    "service": service,
+                    "post_ids": post_ids,
+                    "worker_id": self.worker_id
                 }
-                
-                logger.debug(f"📋 Запрос постов для саммаризации с limit={self.batch_size}")
-                
-                async with session.get(
-                    f"{self.backend_url}/api/posts/unprocessed",
-                    params=params
-                ) as response:
-                    if response.status == 200:
-                        posts = await response.json()
-                        logger.debug(f"📊 Получено {len(posts)} постов для саммаризации (запрошено limit={self.batch_size})")
-                        return posts  # Endpoint возвращает список напрямую
-                    else:
-                        logger.warning(f"⚠️ Ошибка получения постов для саммаризации: {response.status}")
-                        return []
+            ) as response:
+                if response.status != 200:
+                    logger.warning(f"⚠️ Ошибка снятия аренды для {service}: {response.status}")
         except Exception as e:
-            logger.error(f"❌ Ошибка запроса постов для саммаризации: {e}")
-            return []
+            # Не критично: аренда истечет сама
+            logger.warning(f"⚠️ Ошибка снятия аренды для {service}: {e}")
+
+    async def process_categorization_batch(self, posts: List[Dict], bot: Dict) -> int:
+        """Обработка батча категоризации без конвейера (возвращает число сохраненных результатов)"""
+        results = await self.categorize_batch(posts, bot)
+        return await self.persist_results(results, bot, 'categorization')
 
-    async def process_categorization_batch(self, posts: List[Dict], bot: Dict):
-        """Обработка батча категоризации"""
+    async def process_summarization_batch(self, posts: List[Dict], bot: Dict, lease_deadline: Optional[float] = None) -> int:
+        """Обработка батча саммаризации без конвейера (возвращает число успешных постов)"""
+        processed_posts = await self.attach_categories(posts, bot)
+        results = await self.summarize_batch(processed_posts, bot, lease_deadline=lease_deadline)
+        return await self.persist_results(results, bot, 'summarization')
+
+    async def categorize_batch(self, posts: List[Dict], bot: Dict) -> List[ProcessingResult]:
+        """LLM стадия категоризации: результаты батча без сохранения"""
         categories = await self.get_bot_categories(bot['id'])
         if not categories:
             logger.warning(f"⚠️ У бота {bot['name']} нет категорий для категоризации")
-            return
+            return []
         
         # Используем существующий CategorizationService
         if self.categorization_service:
@@ -561,144 +698,199 @@ class AIOrchestrator:
                     post_objects, bot['id']
                 )
                 
-                if results:
-                    # Конвертируем результаты в ProcessingResult
-                    processing_results = []
-                    for result in results:
-                        processing_result = ProcessingResult(
-                            post_id=result.get('post_id', 0),
-                            bot_id=bot['id'],
-                            success=True,
-                            categories=result,
-                            summaries={},
-                            metrics=result.get('metrics', {})
-                        )
-                        processing_results.append(processing_result)
-                    
-                    # Сохраняем результаты категоризации
-                    saved_count = await self.save_results(processing_results)
-                    logger.info(f"✅ Категоризация: сохранено {saved_count} результатов")
-                    
-                    # Обновляем флаги категоризации
-                    post_ids = [result.get('post_id', 0) for result in results if result.get('post_id')]
-                    if post_ids:
-                        await self.sync_service_status(post_ids, bot['id'], 'categorization')
+                # Конвертируем результаты в ProcessingResult
+                return [
+                    ProcessingResult(
+                        post_id=result.get('post_id', 0),
+                        bot_id=bot['id'],
+                        success=True,
+                        categories=result,
+                        summaries={},
+                        metrics=result.get('metrics', {})
+                    )
+                    for result in results or []
+                ]
                 
             except Exception as e:
                 logger.error(f"❌ Ошибка обработки категоризации: {e}")
+        return []
+
+    async def attach_categories(self, posts: List[Dict], bot: Dict) -> List[Dict]:
+        """Для саммаризации нужны категоризированные данные: посты без категорий пропускаются"""
+        # processed_data всего батча одним запросом; Backend без bulk endpoint - по посту
+        processed_by_post = await self.get_processed_data_bulk([post['id'] for post in posts], bot['id'])
+        
+        processed_posts = []
+        for post in posts:
+            if processed_by_post is not None:
+                processed_data = processed_by_post.get(post['id'])
+            else:
+                processed_data = await self.get_processed_data(post['id'], bot['id'])
+            if processed_data and processed_data.get('categories'):
+                processed_posts.append({
+                    **post,
+                    'categories': processed_data['categories']
+                })
+        return processed_posts
 
-    async def process_summarization_batch(self, posts: List[Dict], bot: Dict):
-        """Обработка батча саммаризации (по одному посту за раз)"""
+    async def summarize_batch(self, processed_posts: List[Dict], bot: Dict,
+                              lease_deadline: Optional[float] = None) -> List[ProcessingResult]:
+        """LLM стадия саммаризации: посты по одному, параллельно (результаты батча без сохранения).
+        lease_deadline - time.monotonic() истечения аренды; без него аренда считается взятой сейчас"""
         # Используем существующий SummarizationService
-        if self.summarization_service:
-            try:
-                # Для саммаризации нужны категоризированные данные
-                processed_posts = []
-                for post in posts:
-                    # Получаем данные из processed_data для этого поста и бота
-                    processed_data = await self.get_processed_data(post['id'], bot['id'])
-                    if processed_data and processed_data.get('categories'):
-                        processed_posts.append({
-                            **post,
-                            'categories': processed_data['categories']
-                        })
-                
-                if processed_posts:
-                    # Логируем параметры для отладки
-                    max_summary_length = bot.get("max_summary_length", 150)
-                    logger.info(f"📊 Параметры саммаризации для бота '{bot.get('name')}' (ID: {bot.get('id')}):")
-                    logger.info(f"   - max_summary_length: {max_summary_length}")
-                    logger.info(f"   - language: {bot.get('default_language', 'ru')}")
-                    logger.info(f"   - custom_prompt: {'Есть' if bot.get('summarization_prompt') else 'Нет'}")
-                    logger.info(f"   - постов для обработки: {len(processed_posts)}")
-                    
-                    # ВАЖНО: Обрабатываем посты ПО ОДНОМУ для избежания проблем с большими батчами
-                    logger.info(f"📝 Используем ОДИНОЧНУЮ обработку для каждого поста (избегаем проблем с батчами)")
-                    
-                    processing_results = []
-                    
-                    for i, post in enumerate(processed_posts):
-                        try:
-                            # Извлекаем текст для поста
-                            text = f"{post.get('title', '')} {post.get('content', '')}".strip()
-                            
-                            logger.debug(f"📄 Обработка поста {post['id']} ({i+1}/{len(processed_posts)})")
-                            
-                            # Используем SINGLE режим для каждого поста
-                            result = await self.summarization_service.process(
-                                text=text,
-                                language=bot.get("default_language", "ru"),
-                                custom_prompt=bot.get("summarization_prompt"),
-                                max_summary_length=max_summary_length
-                            )
-                            
-                            # Извлекаем саммаризацию из результата
-                            if isinstance(result, dict):
-                                # Если это словарь с полем 'summary'
-                                summary_text = result.get('summary', '')
-                                logger.debug(f"✅ Саммаризация поста {post['id']}: {len(summary_text)} символов")
-                            else:
-                                # Если это просто строка
-                                summary_text = result
-                                logger.debug(f"✅ Саммаризация поста {post['id']}: {len(summary_text)} символов")
-                            
-                            # Формируем результат в правильном формате для Backend API
-                            summaries_dict = {
-                                "ru": summary_text  # Backend ожидает язык как ключ
-                            }
-                            
-                            processing_result = ProcessingResult(
-                                post_id=post['id'],
-                                bot_id=bot['id'],
-                                success=True,
-                                categories=post.get('categories', {}),
-                                summaries=summaries_dict,
-                                metrics={}
-                            )
-                            processing_results.append(processing_result)
-                            
-                        except Exception as e:
-                            logger.error(f"❌ Ошибка обработки поста {post['id']}: {e}")
-                            # Добавляем пустой результат с ошибкой
-                            processing_results.append(ProcessingResult(
-                                post_id=post['id'],
-                                bot_id=bot['id'],
-                                success=False,
-                                categories=post.get('categories', {}),
-                                summaries={"ru": f"Ошибка обработки: {str(e)}"},
-                                metrics={},
-                                error_message=str(e)
-                            ))
-                    
-                    # Сохраняем результаты саммаризации
-                    if processing_results:
-                        saved_count = await self.save_results(processing_results)
-                        logger.info(f"✅ Саммаризация: сохранено {saved_count} результатов")
-                        
-                        # Обновляем флаги саммаризации
-                        successful_post_ids = [r.post_id for r in processing_results if r.success]
-                        if successful_post_ids:
-                            await self.sync_service_status(successful_post_ids, bot['id'], 'summarization')
-                
-            except Exception as e:
-                logger.error(f"❌ Ошибка обработки саммаризации: {e}")
+        if not self.summarization_service or not processed_posts:
+            return []
+        
+        if lease_deadline is None:
+            lease_deadline = time.monotonic() + self.batch_timeout_minutes * 60
+        lease_remaining = lease_deadline - time.monotonic()
+        if lease_remaining <= 0:
+            # Аренда истекла в очереди - посты уже может забрать другой воркер
+            logger.warning(f"⚠️ Аренда батча бота '{bot.get('name')}' истекла до саммаризации, пропускаем {len(processed_posts)} постов")
+            return []
+        
+        # Логируем параметры для отладки
+        max_summary_length = bot.get("max_summary_length", 150)
+        logger.info(f"📊 Параметры саммаризации для бота '{bot.get('name')}' (ID: {bot.get('id')}):")
+        logger.info(f"   - max_summary_length: {max_summary_length}")
+        logger.info(f"   - language: {bot.get('default_language', 'ru')}")
+        logger.info(f"   - custom_prompt: {'Есть' if bot.get('summarization_prompt') else 'Нет'}")
+        logger.info(f"   - постов для обработки: {len(processed_posts)}")
+        
+        # ВАЖНО: каждый пост - отдельный запрос (избегаем проблем с большими батчами),
+        # запросы идут параллельно, задержка батча ~ самый медленный запрос
+        logger.info(f"📝 ОДИНОЧНАЯ обработка каждого поста, до {self.summarization_concurrency} запросов параллельно")
+        
+        tasks = [
+            asyncio.create_task(self.summarize_post(post, bot, max_summary_length))
+            for post in processed_posts
+        ]
+        processing_results = []
+        try:
+            # Собираем по мере готовности; не успевшие до истечения аренды посты вернутся в следующей аренде
+            for next_done in asyncio.as_completed(tasks, timeout=lease_remaining):
+                processing_results.append(await next_done)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Саммаризация бота '{bot.get('name')}' не уложилась в аренду: сохраняем {len(processing_results)}/{len(tasks)}")
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        return processing_results
+
+    async def summarize_post(self, post: Dict, bot: Dict, max_summary_length: int) -> ProcessingResult:
+        """Саммаризация одного поста под общим лимитом параллельных запросов"""
+        try:
+            # Извлекаем текст для поста
+            text = f"{post.get('title', '')} {post.get('content', '')}".strip()
+            
+            logger.debug(f"📄 Обработка поста {post['id']}")
+            
+            # Используем SINGLE режим для каждого поста
+            async with self.summarization_semaphore:
+                result = await self.summarization_service.process(
+                    text=text,
+                    language=bot.get("default_language", "ru"),
+                    custom_prompt=bot.get("summarization_prompt"),
+                    max_summary_length=max_summary_length
+                )
+            
+            # Извлекаем саммаризацию из результата
+            if isinstance(result, dict):
+                # Сервис не бросает исключения: ошибка OpenAI (например, 429) приходит статусом
+                if result.get('status') == 'error':
+                    raise RuntimeError(result.get('error', 'ошибка саммаризации'))
+                # Если это словарь с полем 'summary'
+                summary_text = result.get('summary', '')
+            else:
+                # Если это просто строка
+                summary_text = result
+            logger.debug(f"✅ Саммаризация поста {post['id']}: {len(summary_text)} символов")
+            
+            # Формируем результат в правильном формате для Backend API
+            summaries_dict = {
+                "ru": summary_text  # Backend ожидает язык как ключ
+            }
+            
+            return ProcessingResult(
+                post_id=post['id'],
+                bot_id=bot['id'],
+                success=True,
+                categories=post.get('categories', {}),
+                summaries=summaries_dict,
+                metrics={}
+            )
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка обработки поста {post['id']}: {e}")
+            # Результат с ошибкой не сохраняется (см. persist_results) - пост вернется в следующей аренде
+            return ProcessingResult(
+                post_id=post['id'],
+                bot_id=bot['id'],
+                success=False,
+                categories=post.get('categories', {}),
+                summaries={},
+                metrics={},
+                error_message=str(e)
+            )
+
+    async def persist_results(self, results: List[ProcessingResult], bot: Dict, service: str) -> int:
+        """Persist стадия: сохранить результаты и обновить флаги сервиса (возвращает число успешных постов)"""
+        # Неудачные результаты не отправляем: backend по непустому summary пометил бы пост
+        # саммаризированным, а текст ошибки попал бы в дайджест. Пост останется необработанным
+        # и вернется в следующей аренде
+        failed_post_ids = [r.post_id for r in results if not r.success]
+        if failed_post_ids:
+            logger.warning(f"⚠️ {SERVICE_LABELS[service]}: {len(failed_post_ids)} постов с ошибкой не сохраняются (повтор в следующей аренде): {failed_post_ids}")
+        results = [r for r in results if r.success]
+        if not results:
+            return 0
+        
+        saved_count = await self.save_results(results)
+        logger.info(f"✅ {SERVICE_LABELS[service]}: сохранено {saved_count} результатов")
+        
+        # Обновляем флаги сервиса
+        successful_post_ids = [r.post_id for r in results if r.post_id]
+        if successful_post_ids:
+            await self.sync_service_status(successful_post_ids, bot['id'], service)
+        return len(successful_post_ids) if saved_count else 0
 
     async def get_processed_data(self, post_id: int, bot_id: int) -> Optional[Dict]:
         """Получить обработанные данные для поста и бота"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.backend_url}/api/ai/results",
-                    params={"post_id": post_id, "bot_id": bot_id}
-                ) as response:
-                    if response.status == 200:
-                        results = await response.json()  # Endpoint возвращает список
-                        return results[0] if results else None
-                    return None
+            async with self.http.session.get(
+                f"{self.backend_url}/api/ai/results",
+                params={"post_id": post_id, "bot_id": bot_id}
+            ) as response:
+                if response.status == 200:
+                    results = await response.json()  # Endpoint возвращает список
+                    return results[0] if results else None
+                return None
         except Exception as e:
             logger.warning(f"⚠️ Ошибка получения processed_data для поста {post_id}: {e}")
             return None
 
+    async def get_processed_data_bulk(self, post_ids: List[int], bot_id: int) -> Optional[Dict[int, Dict]]:
+        """processed_data бота для списка постов через /api/ai/results/by-posts: {post_id: строка}.
+        None - запрос не удался (вызывающий переходит на get_processed_data по посту)."""
+        processed_by_post = {}
+        try:
+            for i in range(0, len(post_ids), RESULTS_LOOKUP_MAX_POSTS):
+                chunk = post_ids[i:i + RESULTS_LOOKUP_MAX_POSTS]
+                async with self.http.session.get(
+                    f"{self.backend_url}/api/ai/results/by-posts",
+                    params={"bot_id": bot_id, "post_ids": ",".join(str(post_id) for post_id in chunk)}
+                ) as response:
+                    if response.status != 200:
+                        logger.warning(f"⚠️ Ошибка bulk получения processed_data: {response.status}")
+                        return None
+                    for row in await response.json():
+                        processed_by_post[row['post_id']] = row
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка bulk получения processed_data для бота {bot_id}: {e}")
+            return None
+        return processed_by_post
+
     # ===== МЕТОДЫ ИЗ V4 (НЕИЗМЕНЕННЫЕ) =====
     
     async def sync_service_status(self, post_ids: List[int], bot_id: int, service: str):
@@ -730,17 +922,16 @@ class AIOrchestrator:
                 **update_data
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.put(
-                    f"{self.backend_url}/api/ai/results/sync-status",
-                    json=payload
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        logger.info(f"✅ Обновлен флаг {service}: {len(post_ids)} постов, статус: {data.get('message', 'OK')}")
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"❌ Ошибка обновления флага {service}: {response.status} - {error_text}")
+            async with self.http.session.put(
+                f"{self.backend_url}/api/ai/results/sync-status",
+                json=payload
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    logger.info(f"✅ Обновлен флаг {service}: {len(post_ids)} постов, статус: {data.get('message', 'OK')}")
+                else:
+                    error_text = await response.text()
+                    logger.error(f"❌ Ошибка обновления флага {service}: {response.status} - {error_text}")
         
         except Exception as e:
             logger.error(f"❌ Ошибка синхронизации статуса {service}: {e}")
@@ -770,73 +961,121 @@ class AIOrchestrator:
                 results_data.append(result_dict)
             
             # Отправляем батчевый запрос (API ожидает список, не объект)
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.backend_url}/api/ai/results/batch",
-                    json=results_data  # Передаем список напрямую
-                ) as response:
-                    if response.status == 201:
-                        data = await response.json()
-                        saved_count = data.get("saved_count", 0)
-                        logger.info(f"✅ Сохранено {saved_count} результатов в processed_data")
-                        return saved_count
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"❌ Ошибка сохранения результатов: {response.status} - {error_text}")
-                        return 0
+            async with self.http.session.post(
+                f"{self.backend_url}/api/ai/results/batch",
+                json=results_data  # Передаем список напрямую
+            ) as response:
+                if response.status == 201:
+                    data = await response.json()
+                    # Endpoint возвращает список сохраненных записей (RETURNING)
+                    saved_count = len(data) if isinstance(data, list) else data.get("saved_count", 0)
+                    logger.info(f"✅ Сохранено {saved_count} результатов в processed_data")
+                    return saved_count
+                else:
+                    error_text = await response.text()
+                    logger.error(f"❌ Ошибка сохранения результатов: {response.status} - {error_text}")
+                    return 0
         
         except Exception as e:
             logger.error(f"❌ Ошибка сохранения результатов: {e}")
             return 0
 
+    async def refresh_bot_topology(self) -> Optional[Dict[str, Any]]:
+        """Обновить снимок топологии ботов: If-None-Match → 304 без тела, если ничего не менялось.
+        При ошибке остается последний полученный снимок (None - backend без /api/bot-topology)."""
+        headers = {"If-None-Match": self.bot_topology_etag} if self.bot_topology and self.bot_topology_etag else {}
+        try:
+            async with self.http.session.get(f"{self.backend_url}/api/bot-topology", headers=headers) as response:
+                if response.status == 304:
+                    return self.bot_topology
+                if response.status == 200:
+                    self.bot_topology = await response.json()
+                    self.bot_topology_etag = response.headers.get("ETag")
+                    logger.info(f"🗺️ Топология ботов обновлена: версия {self.bot_topology.get('version')}, ботов {len(self.bot_topology.get('bots', []))}")
+                else:
+                    logger.warning(f"⚠️ Ошибка получения топологии ботов: {response.status}")
+        except Exception as e:
+            logger.error(f"❌ Ошибка запроса топологии ботов: {e}")
+        return self.bot_topology
+
+    def _topology_bot(self, bot_id: int) -> Optional[Dict[str, Any]]:
+        """Бот из последнего снимка топологии"""
+        for bot in (self.bot_topology or {}).get("bots", []):
+            if bot["id"] == bot_id:
+                return bot
+        return None
+
     async def get_active_bots(self) -> List[Dict[str, Any]]:
-        """Получить список активных ботов"""
+        """Получить список активных ботов (раз в цикл - условный запрос топологии)"""
+        topology = await self.refresh_bot_topology()
+        if topology is not None:
+            # Фильтруем активных ботов по status (не по is_active, так как оно может быть некорректным)
+            active_bots = [bot for bot in topology.get("bots", []) if bot.get("status") == "active"]
+            logger.info(f"🔍 Найдено {len(active_bots)} активных ботов из {len(topology.get('bots', []))} общих")
+            return active_bots
+        
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.backend_url}/api/public-bots") as response:
-                    if response.status == 200:
-                        bots = await response.json()  # Endpoint возвращает список напрямую
-                        # Фильтруем активных ботов по status (не по is_active, так как оно может быть некорректным)
-                        active_bots = [bot for bot in bots if bot.get("status") == "active"]
-                        logger.info(f"🔍 Найдено {len(active_bots)} активных ботов из {len(bots)} общих")
-                        return active_bots
-                    else:
-                        logger.error(f"❌ Ошибка получения ботов: {response.status}")
-                        return []
+            async with self.http.session.get(f"{self.backend_url}/api/public-bots") as response:
+                if response.status == 200:
+                    bots = await response.json()  # Endpoint возвращает список напрямую
+                    # Фильтруем активных ботов по status (не по is_active, так как оно может быть некорректным)
+                    active_bots = [bot for bot in bots if bot.get("status") == "active"]
+                    logger.info(f"🔍 Найдено {len(active_bots)} активных ботов из {len(bots)} общих")
+                    return active_bots
+                else:
+                    logger.error(f"❌ Ошибка получения ботов: {response.status}")
+                    return []
         except Exception as e:
             logger.error(f"❌ Ошибка запроса ботов: {e}")
             return []
 
     async def get_bot_channels(self, bot_id: int) -> List[Dict[str, Any]]:
-        """Получить каналы для бота"""
+        """Получить каналы для бота (из снимка топологии, без отдельного запроса)"""
+        if self.bot_topology is None:
+            await self.refresh_bot_topology()
+        if self.bot_topology is not None:
+            bot = self._topology_bot(bot_id)
+            return bot["channels"] if bot else []
+        
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.backend_url}/api/public-bots/{bot_id}/channels") as response:
-                    if response.status == 200:
-                        channels = await response.json()  # Endpoint возвращает список напрямую
-                        return channels
-                    else:
-                        logger.warning(f"⚠️ Ошибка получения каналов для бота {bot_id}: {response.status}")
-                        return []
+            async with self.http.session.get(f"{self.backend_url}/api/public-bots/{bot_id}/channels") as response:
+                if response.status == 200:
+                    channels = await response.json()  # Endpoint возвращает список напрямую
+                    return channels
+                else:
+                    logger.warning(f"⚠️ Ошибка получения каналов для бота {bot_id}: {response.status}")
+                    return []
         except Exception as e:
             logger.error(f"❌ Ошибка запроса каналов для бота {bot_id}: {e}")
             return []
 
     async def get_bot_categories(self, bot_id: int) -> List[Dict[str, Any]]:
-        """Получить категории для бота"""
+        """Получить категории для бота (из снимка топологии, без отдельного запроса)"""
+        if self.bot_topology is None:
+            await self.refresh_bot_topology()
+        if self.bot_topology is not None:
+            bot = self._topology_bot(bot_id)
+            return bot["categories"] if bot else []
+        
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.backend_url}/api/public-bots/{bot_id}/categories") as response:
-                    if response.status == 200:
-                        categories = await response.json()  # Endpoint возвращает список напрямую
-                        return categories
-                    else:
-                        logger.warning(f"⚠️ Ошибка получения категорий для бота {bot_id}: {response.status}")
-                        return []
+            async with self.http.session.get(f"{self.backend_url}/api/public-bots/{bot_id}/categories") as response:
+                if response.status == 200:
+                    categories = await response.json()  # Endpoint возвращает список напрямую
+                    return categories
+                else:
+                    logger.warning(f"⚠️ Ошибка получения категорий для бота {bot_id}: {response.status}")
+                    return []
         except Exception as e:
             logger.error(f"❌ Ошибка запроса категорий для бота {bot_id}: {e}")
             return []
 
+    async def close(self):
+        """Остановка: закрываем OpenAI клиенты сервисов и общий HTTP пул"""
+        for service in (self.categorization_service, self.summarization_service):
+            if service is not None:
+                await service.close()
+        await self.http.close()
+    
     # ===== LEGACY МЕТОДЫ ДЛЯ СОВМЕСТИМОСТИ =====
     
     async def run_single_batch(self, skip_initialization: bool = False):
@@ -888,6 +1127,8 @@ async def main():
     except Exception as e:
         logger.error(f"❌ Критическая ошибка: {e}")
         return 1
+    finally:
+        await orchestrator.close()
     
     return 0
 
@@ -5,13 +5,13 @@ CategorizationService v3.0 - БАТЧЕВАЯ AI-категоризация по
 """
 
 import asyncio
-import aiohttp
 import json
 import re
 import logging
 from typing import Dict, List, Optional, Tuple, Any
 from openai import AsyncOpenAI
 from models.post import Post
+from utils.http_client import BackendHTTPClient
 import math
 
 # Настройка логирования
@@ -24,7 +24,7 @@ class CategorizationService:
     v3.0 - БАТЧЕВАЯ обработка как в N8N для максимальной производительности
     """
     
-    def __init__(self, openai_api_key: str = None, backend_url: str = "http://localhost:8000", batch_size: int = 30, settings_manager=None):
+    def __init__(self, openai_api_key: str = None, backend_url: str = "http://localhost:8000", batch_size: int = 30, settings_manager=None, http_client: BackendHTTPClient = None):
         """
         Инициализация сервиса
         
@@ -33,11 +33,14 @@ class CategorizationService:
             backend_url: URL Backend API
             batch_size: Размер батча для обработки (по умолчанию как в N8N)
             settings_manager: Менеджер настроек для динамических LLM
+            http_client: Общий пул соединений к Backend API (по умолчанию - клиент SettingsManager)
         """
         self.openai_api_key = openai_api_key
         self.backend_url = backend_url
         self.batch_size = batch_size
         self.settings_manager = settings_manager
+        self._owns_http = http_client is None and settings_manager is None
+        self.http = http_client or (settings_manager.http if settings_manager else BackendHTTPClient(pooled=False))
         
         # НЕ инициализируем OpenAI клиент сразу - будем создавать динамически
         self.openai_client = None
@@ -91,6 +94,7 @@ class CategorizationService:
     async def close(self):
         """
         🔒 ЯВНОЕ закрытие OpenAI клиента для предотвращения ошибок Event loop is closed
+        (и собственного HTTP пула, если он не общий)
         """
         if self.openai_client:
             try:
@@ -100,6 +104,8 @@ class CategorizationService:
                 logger.warning(f"⚠️ CategorizationService: ошибка закрытия OpenAI клиента: {e}")
             finally:
                 self.openai_client = None
+        if self._owns_http:
+            await self.http.close()
         
     async def process_with_bot_config(self, posts: List[Post], bot_id: int) -> List[Dict[str, Any]]:
         """
@@ -422,13 +428,12 @@ class CategorizationService:
     async def _get_bot_config(self, bot_id: int) -> Optional[Dict[str, Any]]:
         """Получение конфигурации бота"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.backend_url}/api/public-bots/{bot_id}") as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        logger.error(f"Ошибка получения конфигурации бота: HTTP {response.status}")
-                        return None
+            async with self.http.request("GET", f"{self.backend_url}/api/public-bots/{bot_id}") as response:
+                if response.status == 200:
+                    return await response.json()
+                else:
+                    logger.error(f"Ошибка получения конфигурации бота: HTTP {response.status}")
+                    return None
         except Exception as e:
             logger.error(f"Ошибка запроса конфигурации бота: {str(e)}")
             return None
@@ -436,13 +441,12 @@ class CategorizationService:
     async def _get_bot_categories(self, bot_id: int) -> List[Dict[str, Any]]:
         """Получение категорий бота с описаниями"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.backend_url}/api/public-bots/{bot_id}/categories") as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        logger.error(f"Ошибка получения категорий бота: HTTP {response.status}")
-                        return []
+            async with self.http.request("GET", f"{self.backend_url}/api/public-bots/{bot_id}/categories") as response:
+                if response.status == 200:
+                    return await response.json()
+                else:
+                    logger.error(f"Ошибка получения категорий бота: HTTP {response.status}")
+                    return []
         except Exception as e:
             logger.error(f"Ошибка запроса категорий бота: {str(e)}")
             return []
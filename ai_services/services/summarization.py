@@ -1,6 +1,7 @@
 from typing import Dict, Any, Optional, List
 from .base import BaseAIService
 from openai import AsyncOpenAI
+from utils.rate_limiter import ModelRateLimiter
 from loguru import logger
 import os
 import json
@@ -15,11 +16,14 @@ class SummarizationService(BaseAIService):
         max_tokens: int = 4000,
         temperature: float = 0.3,
         max_summary_length: int = 150,
-        settings_manager=None
+        settings_manager=None,
+        rate_limiter: ModelRateLimiter = None
     ):
         super().__init__(model_name, max_tokens, temperature)
         self.max_summary_length = max_summary_length
         self.settings_manager = settings_manager
+        # Параллельные запросы к одной модели разносятся по лимиту RPM (AI_MODEL_RPM)
+        self.rate_limiter = rate_limiter or ModelRateLimiter.from_env()
         self.logger = logger.bind(service="SummarizationService")
         
         # Клиент OpenAI будет инициализирован при первом использовании
@@ -100,6 +104,7 @@ class SummarizationService(BaseAIService):
             prompt = self._build_single_prompt(custom_prompt, language, summary_length)
             
             # Вызываем OpenAI API
+            await self.rate_limiter.acquire(model)
             response = await self.client.chat.completions.create(
                 model=model,
                 messages=[
@@ -153,6 +158,7 @@ class SummarizationService(BaseAIService):
             batch_prompt = self._build_batch_prompt(texts, custom_prompt, language, summary_length)
             
             # Отправляем запрос к OpenAI
+            await self.rate_limiter.acquire(model)
             response = await self.client.chat.completions.create(
                 model=model,
                 messages=[
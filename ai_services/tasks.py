@@ -35,6 +35,8 @@ app = get_celery_app()
 
 # === Helper constants ===
 BACKEND_URL = os.getenv("BACKEND_INTERNAL_URL", "http://backend:8000")
+# Время аренды постов, выданных check_for_new_posts (должно покрывать очередь + LLM обработку)
+CELERY_WORK_LEASE_SECONDS = int(os.getenv("CELERY_WORK_LEASE_SECONDS", "900"))
 
 
 # Test and health check tasks
@@ -821,37 +823,55 @@ def check_for_new_posts(self):
     try:
         import httpx
         
-        # 1. Получаем список активных ботов
-        active_bots_resp = httpx.get(f"{BACKEND_URL}/api/public-bots?status_filter=active")
-        active_bots_resp.raise_for_status()
-        active_bots = active_bots_resp.json()
+        # 1. Дешевая проверка наличия работы по всем активным ботам (EXISTS, без выборки постов)
+        probe_resp = httpx.get(f"{BACKEND_URL}/api/ai/work/available", params={'status_filter': 'active'})
+        probe_resp.raise_for_status()
+        probe = probe_resp.json()
 
-        if not active_bots:
+        if not probe.get('bots'):
             logger.info("✅ Нет активных ботов для обработки.")
             return {'status': 'no_active_bots'}
 
+        if not probe.get('work_available'):
+            logger.info("✅ Нет новых постов для обработки.")
+            return {
+                'task_id': self.request.id,
+                'status': 'nothing_to_do',
+                'timestamp': time.time()
+            }
+
         total_dispatched_posts = 0
         dispatched_bots_count = 0
 
-        # 2. Для каждого бота ищем необработанные посты
-        for bot in active_bots:
-            bot_id = bot['id']
+        # 2. Арендуем посты только там, где есть работа
+        for bot in probe['bots']:
+            bot_id = bot['bot_id']
             
-            # 🔧 ИСПРАВЛЕНИЕ: Проверяем КАТЕГОРИЗАЦИЮ
-            response_cat = httpx.get(
-                f"{BACKEND_URL}/api/posts/unprocessed",
-                params={'bot_id': bot_id, 'limit': 500, 'require_categorization': True} 
-            )
-            response_cat.raise_for_status()
-            categorization_posts = response_cat.json()
-
-            # 🔧 ИСПРАВЛЕНИЕ: Проверяем САММАРИЗАЦИЮ
-            response_sum = httpx.get(
-                f"{BACKEND_URL}/api/posts/unprocessed",
-                params={'bot_id': bot_id, 'limit': 500, 'require_summarization': True} 
-            )
-            response_sum.raise_for_status()
-            summarization_posts = response_sum.json()
+            # 🔒 Арендуем посты: параллельные проверки и оркестраторы не получат те же посты,
+            # аренда снимается при сохранении результатов (/api/ai/service-results/batch)
+            claim_params = {
+                'bot_id': bot_id,
+                'worker_id': f"celery-{self.request.hostname}",
+                'limit': 500,
+                'lease_seconds': CELERY_WORK_LEASE_SECONDS
+            }
+            categorization_posts = []
+            if bot.get('categorization'):
+                response_cat = httpx.post(
+                    f"{BACKEND_URL}/api/ai/work/claim",
+                    json={**claim_params, 'service': 'categorization'}
+                )
+                response_cat.raise_for_status()
+                categorization_posts = response_cat.json().get('posts', [])
+
+            summarization_posts = []
+            if bot.get('summarization'):
+                response_sum = httpx.post(
+                    f"{BACKEND_URL}/api/ai/work/claim",
+                    json={**claim_params, 'service': 'summarization'}
+                )
+                response_sum.raise_for_status()
+                summarization_posts = response_sum.json().get('posts', [])
 
             # Запускаем диспетчер для категоризации
             if categorization_posts:
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+BackendHTTPClient - общий пул HTTP соединений к Backend API
+Долгоживущий aiohttp.ClientSession с keep-alive на event loop оркестратора:
+SettingsManager и AI сервисы получают тот же клиент вместо ClientSession на каждый запрос.
+Без долгоживущего loop (asyncio.run на каждый вызов в Celery задачах) клиент создается
+с pooled=False - сессия на один запрос, как раньше.
+"""
+
+import asyncio
+import os
+import re
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+
+import aiohttp
+from loguru import logger
+
+
+class BackendHTTPClient:
+    """Пул keep-alive соединений с лимитами на хост и статистикой времени запросов"""
+
+    def __init__(
+        self,
+        limit: int = None,
+        limit_per_host: int = None,
+        timeout_seconds: float = None,
+        keepalive_timeout: float = None,
+        pooled: bool = True
+    ):
+        """
+        Args:
+            limit: Максимум соединений в пуле (AI_HTTP_POOL_LIMIT, по умолчанию 100)
+            limit_per_host: Максимум соединений на один хост (AI_HTTP_LIMIT_PER_HOST, по умолчанию 20)
+            timeout_seconds: Общий таймаут запроса (AI_HTTP_TIMEOUT_SECONDS, по умолчанию 300)
+            keepalive_timeout: Сколько держать простаивающее соединение (AI_HTTP_KEEPALIVE_SECONDS, по умолчанию 60)
+            pooled: False - без пула, request() открывает сессию на один запрос
+                    (для вызовов через asyncio.run, где loop живет один вызов)
+        """
+        self.limit = limit if limit is not None else int(os.getenv("AI_HTTP_POOL_LIMIT", "100"))
+        self.limit_per_host = limit_per_host if limit_per_host is not None else int(os.getenv("AI_HTTP_LIMIT_PER_HOST", "20"))
+        self.timeout_seconds = timeout_seconds if timeout_seconds is not None else float(os.getenv("AI_HTTP_TIMEOUT_SECONDS", "300"))
+        self.keepalive_timeout = keepalive_timeout if keepalive_timeout is not None else float(os.getenv("AI_HTTP_KEEPALIVE_SECONDS", "60"))
+        self.pooled = pooled
+
+        # Сессия aiohttp привязана к своему loop и не потокобезопасна - пул на каждый event loop
+        # (потоки Celery воркера с --pool=threads работают каждый в своем loop)
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+        self._sessions_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self.logger = logger.bind(component="BackendHTTPClient")
+
+    def _create_session(self, connector: aiohttp.BaseConnector = None) -> aiohttp.ClientSession:
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._on_request_start)
+        trace_config.on_request_end.append(self._on_request_end)
+        trace_config.on_request_exception.append(self._on_request_exception)
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout_seconds),
+            trace_configs=[trace_config]
+        )
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Сессия пула текущего event loop; создается при первом запросе в этом loop.
+
+        Сессия используется и закрывается только в своем loop (close() из него же).
+        """
+        if not self.pooled:
+            raise RuntimeError("BackendHTTPClient(pooled=False): используйте request()")
+        loop = asyncio.get_running_loop()
+        with self._sessions_lock:
+            session = self._sessions.get(loop)
+            if session is None or session.closed:
+                self._drop_finished_loops()
+                session = self._sessions[loop] = self._create_session(
+                    aiohttp.TCPConnector(
+                        limit=self.limit,
+                        limit_per_host=self.limit_per_host,
+                        keepalive_timeout=self.keepalive_timeout,
+                        ttl_dns_cache=300
+                    )
+                )
+                self.logger.info(f"🔌 HTTP пул создан: limit={self.limit}, limit_per_host={self.limit_per_host}, timeout={self.timeout_seconds}с")
+        return session
+
+    def _drop_finished_loops(self):
+        """Забыть пулы завершенных loop - закрыть их в своем loop уже нельзя (вызывается под _sessions_lock)"""
+        for loop in [loop for loop in self._sessions if loop.is_closed()]:
+            session = self._sessions.pop(loop)
+            if not session.closed:
+                self.logger.warning("⚠️ HTTP пул завершенного event loop не был закрыт (close() до завершения loop)")
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, **kwargs):
+        """Запрос к Backend API: через пул текущего loop или (pooled=False) через сессию на один запрос"""
+        if self.pooled:
+            async with self.session.request(method, url, **kwargs) as response:
+                yield response
+        else:
+            async with self._create_session() as session:
+                async with session.request(method, url, **kwargs) as response:
+                    yield response
+
+    async def close(self):
+        """Закрыть пул текущего event loop (при остановке оркестратора)"""
+        loop = asyncio.get_running_loop()
+        with self._sessions_lock:
+            session = self._sessions.pop(loop, None)
+            self._drop_finished_loops()
+        if session is not None and not session.closed:
+            await session.close()
+            self.logger.info("🔒 HTTP пул закрыт")
+
+    # ===== СТАТИСТИКА ЗАПРОСОВ =====
+
+    @staticmethod
+    def _endpoint(method: str, url) -> str:
+        """Ключ статистики: метод + путь с идентификаторами, свернутыми в {id}"""
+        path = re.sub(r"/\d+(?=/|$)", "/{id}", url.path)
+        return f"{method} {path}"
+
+    def _record(self, trace_config_ctx, method: str, url, error: bool):
+        elapsed_ms = (time.perf_counter() - trace_config_ctx.started_at) * 1000
+        stats = self._stats.setdefault(
+            self._endpoint(method, url),
+            {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0}
+        )
+        stats["count"] += 1
+        stats["errors"] += int(error)
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    async def _on_request_start(self, session, trace_config_ctx, params):
+        trace_config_ctx.started_at = time.perf_counter()
+
+    async def _on_request_end(self, session, trace_config_ctx, params):
+        self._record(trace_config_ctx, params.method, params.url, params.response.status >= 400)
+
+    async def _on_request_exception(self, session, trace_config_ctx, params):
+        self._record(trace_config_ctx, params.method, params.url, True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Время запросов по endpoint'ам и состояние пула"""
+        return {
+            "pool": {
+                "open_sessions": sum(not session.closed for session in list(self._sessions.values())),
+                "pooled": self.pooled,
+                "limit": self.limit,
+                "limit_per_host": self.limit_per_host
+            },
+            "endpoints": {
+                endpoint: {
+                    "count": stats["count"],
+                    "errors": stats["errors"],
+                    "avg_ms": round(stats["total_ms"] / stats["count"], 1),
+                    "max_ms": round(stats["max_ms"], 1)
+                }
+                for endpoint, stats in self._stats.items()
+            }
+        }
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+ModelRateLimiter - лимит запросов в минуту к LLM по моделям
+Запросы одной модели разносятся равномерно (60/rpm секунд), чтобы параллельная
+обработка не упиралась в 429 от OpenAI всплеском в начале батча
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict
+
+from loguru import logger
+
+
+class ModelRateLimiter:
+    """Равномерный интервал между запросами к одной модели"""
+
+    def __init__(self, limits: Dict[str, int] = None, default_rpm: int = 0):
+        """
+        Args:
+            limits: Лимит запросов в минуту по имени модели
+            default_rpm: Лимит для моделей без явного лимита (0 - без ограничения)
+        """
+        self.limits = limits or {}
+        self.default_rpm = default_rpm
+        self._next_slot: Dict[str, float] = {}
+        self.logger = logger.bind(component="ModelRateLimiter")
+
+    @classmethod
+    def from_env(cls) -> "ModelRateLimiter":
+        """AI_MODEL_RPM="gpt-4o-mini=500,gpt-4o=60", AI_MODEL_RPM_DEFAULT=0"""
+        limits = {}
+        for item in os.getenv("AI_MODEL_RPM", "").split(","):
+            model, _, rpm = item.partition("=")
+            if model.strip() and rpm.strip():
+                limits[model.strip()] = int(rpm)
+        return cls(limits=limits, default_rpm=int(os.getenv("AI_MODEL_RPM_DEFAULT", "0")))
+
+    async def acquire(self, model: str):
+        """Дождаться слота для запроса к модели"""
+        rpm = self.limits.get(model, self.default_rpm)
+        if rpm <= 0:
+            return
+
+        # Слот резервируется без await - конкурентные корутины получают разные слоты
+        now = time.monotonic()
+        slot = max(now, self._next_slot.get(model, now))
+        self._next_slot[model] = slot + 60.0 / rpm
+        if slot > now:
+            self.logger.debug(f"⏳ {model}: ожидание слота {slot - now:.2f}с (лимит {rpm}/мин)")
+            await asyncio.sleep(slot - now)
@@ -5,16 +5,17 @@ SettingsManager - Централизованное управление наст
 """
 
 import asyncio
-import aiohttp
 import time
 from typing import Dict, Any, Optional
 from loguru import logger
 import os
 
+from utils.http_client import BackendHTTPClient
+
 class SettingsManager:
     """Менеджер настроек для AI сервисов"""
     
-    def __init__(self, backend_url: str = None, cache_ttl: int = 300):
+    def __init__(self, backend_url: str = None, cache_ttl: int = 300, http_client: BackendHTTPClient = None):
         if backend_url is None:
             backend_url = os.getenv("BACKEND_API_URL", "http://localhost:8000")
         """
@@ -23,9 +24,13 @@ class SettingsManager:
         Args:
             backend_url: URL Backend API
             cache_ttl: Время жизни кэша в секундах (по умолчанию 5 минут)
+            http_client: Общий пул соединений (оркестратор); без него - сессия на запрос
+                         (Celery задачи вызывают менеджер через asyncio.run - loop живет один вызов)
         """
         self.backend_url = backend_url
         self.cache_ttl = cache_ttl
+        self._owns_http = http_client is None
+        self.http = http_client or BackendHTTPClient(pooled=False)
         self._cache = {}
         self._cache_timestamp = 0
         self.logger = logger.bind(component="SettingsManager")
@@ -95,25 +100,24 @@ class SettingsManager:
             Словарь настроек или None при ошибке
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.backend_url}/api/settings") as response:
-                    if response.status == 200:
-                        settings_list = await response.json()
+            async with self.http.request("GET", f"{self.backend_url}/api/settings") as response:
+                if response.status == 200:
+                    settings_list = await response.json()
                         
-                        # Преобразуем список в словарь key->value
-                        settings_dict = {s['key']: s['value'] for s in settings_list}
+                    # Преобразуем список в словарь key->value
+                    settings_dict = {s['key']: s['value'] for s in settings_list}
                         
-                        # Обновляем кэш
-                        self._cache = settings_dict
-                        self._cache_timestamp = time.time()
+                    # Обновляем кэш
+                    self._cache = settings_dict
+                    self._cache_timestamp = time.time()
                         
-                        ai_settings_count = len([k for k in settings_dict.keys() if k.startswith('ai_')])
-                        self.logger.info(f"🔄 Настройки обновлены из API: {ai_settings_count} AI настроек")
+                    ai_settings_count = len([k for k in settings_dict.keys() if k.startswith('ai_')])
+                    self.logger.info(f"🔄 Настройки обновлены из API: {ai_settings_count} AI настроек")
                         
-                        return settings_dict
-                    else:
-                        self.logger.error(f"❌ Backend API недоступен: HTTP {response.status}")
-                        return None
+                    return settings_dict
+                else:
+                    self.logger.error(f"❌ Backend API недоступен: HTTP {response.status}")
+                    return None
                         
         except Exception as e:
             self.logger.error(f"❌ Ошибка загрузки настроек из API: {e}")
@@ -295,6 +299,11 @@ class SettingsManager:
             'ai_settings_count': len([k for k in self._cache.keys() if k.startswith('ai_')]) if self._cache else 0
         }
     
+    async def close(self):
+        """Закрывает собственный пул соединений (общий пул закрывает его владелец)"""
+        if self._owns_http:
+            await self.http.close()
+    
     async def get_openai_key(self) -> str:
         """
         Получает OpenAI API ключ из Backend API
@@ -307,24 +316,23 @@ class SettingsManager:
         """
         try:
             # Используем endpoint /api/config/{key} для получения ключа
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.backend_url}/api/config/OPENAI_API_KEY"
-                self.logger.info(f"🔑 Получение OpenAI API ключа из: {url}")
+            url = f"{self.backend_url}/api/config/OPENAI_API_KEY"
+            self.logger.info(f"🔑 Получение OpenAI API ключа из: {url}")
                 
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        api_key = data.get('value')
+            async with self.http.request("GET", url) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    api_key = data.get('value')
                         
-                        if api_key:
-                            self.logger.info("✅ OpenAI API ключ успешно получен")
-                            return api_key
-                        else:
-                            raise ValueError("OpenAI API ключ пуст в ответе Backend API")
+                    if api_key:
+                        self.logger.info("✅ OpenAI API ключ успешно получен")
+                        return api_key
                     else:
-                        error_text = await response.text()
-                        self.logger.error(f"❌ Ошибка получения OpenAI ключа: {response.status} - {error_text}")
-                        raise ValueError(f"Не удалось получить OpenAI ключ: HTTP {response.status}")
+                        raise ValueError("OpenAI API ключ пуст в ответе Backend API")
+                else:
+                    error_text = await response.text()
+                    self.logger.error(f"❌ Ошибка получения OpenAI ключа: {response.status} - {error_text}")
+                    raise ValueError(f"Не удалось получить OpenAI ключ: HTTP {response.status}")
                         
         except Exception as e:
             self.logger.error(f"❌ Ошибка получения OpenAI ключа: {e}")
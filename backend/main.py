@@ -1,23 +1,39 @@
-from fastapi import FastAPI, HTTPException, Depends, status, Query
+from fastapi import FastAPI, HTTPException, Depends, status, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, Text, DateTime, ForeignKey, Table, Float, UniqueConstraint, BigInteger, and_, or_, Index, func, JSON
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, Column, Integer, String, Boolean, Text, DateTime, ForeignKey, Table, Float, UniqueConstraint, BigInteger, and_, or_, Index, func, JSON, text, tuple_, literal, literal_column, select, Computed, update
 from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.sql import func
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any, Union
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import os
 from dotenv import load_dotenv
 from typing import Dict, Any, Union
 import json
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+import zlib
+import base64
+import time
 from urllib.parse import quote_plus
 import logging
 import aiohttp
 import asyncio
 from celery import Celery
+import redis
+
+try:
+    import orjson  # Быстрый JSON для больших списков (?fast=true); в requirements.txt, без него - stdlib json
+except ImportError:
+    orjson = None
 
 # Настройка логгера
 logging.basicConfig(level=logging.INFO)
@@ -62,6 +78,41 @@ except Exception as e:
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# 🚀 Async движок для горячих endpoints (PostgreSQL - asyncpg, SQLite fallback - aiosqlite).
+# Синхронная логика запросов выполняется через AsyncSession.run_sync на async соединении,
+# поэтому конкурентность ограничена пулом соединений, а не threadpool Starlette.
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "20"))
+ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "10"))
+try:
+    if USE_POSTGRESQL:
+        async_engine = create_async_engine(
+            DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1),
+            pool_size=ASYNC_DB_POOL_SIZE,
+            max_overflow=ASYNC_DB_MAX_OVERFLOW,
+            pool_pre_ping=True
+        )
+    else:
+        async_engine = create_async_engine(DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1))
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+except ImportError as e:
+    print(f"⚠️ Async драйвер БД недоступен ({e}) - горячие endpoints работают через threadpool")
+    async_engine = None
+    AsyncSessionLocal = None
+
+async def _run_db(fn, *args, **kwargs):
+    """Выполнить fn(db, *args, **kwargs) с sync Session API поверх async соединения.
+    Без async драйвера - прежний путь: SessionLocal в threadpool."""
+    if AsyncSessionLocal is None:
+        def call():
+            db = SessionLocal()
+            try:
+                return fn(db, *args, **kwargs)
+            finally:
+                db.close()
+        return await run_in_threadpool(call)
+    async with AsyncSessionLocal() as session:
+        return await session.run_sync(fn, *args, **kwargs)
+
 # FastAPI приложение
 app = FastAPI(
     title="MorningStar Admin API",
@@ -69,6 +120,12 @@ app = FastAPI(
     version="1.0.0"
 )
 
+@app.on_event("shutdown")
+async def _dispose_async_engine():
+    """Закрываем соединения async пула при остановке приложения"""
+    if async_engine is not None:
+        await async_engine.dispose()
+
 # Celery client для взаимодействия с AI Services
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
 celery_client = Celery(
@@ -77,6 +134,28 @@ celery_client = Celery(
     backend=CELERY_BROKER_URL
 )
 
+# Redis pub/sub: событие о новых постах для AI Orchestrator и Celery dispatcher
+REDIS_URL = os.getenv("REDIS_URL", CELERY_BROKER_URL)
+NEW_POSTS_CHANNEL = os.getenv("NEW_POSTS_CHANNEL", "morningstar:new_posts")
+_redis_client = None
+_redis_retry_at = 0.0  # после ошибки не обращаемся к Redis до этого момента (time.monotonic)
+
+def _get_redis_client():
+    """Ленивое подключение к Redis (короткие таймауты - Redis не должен тормозить API)"""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(REDIS_URL, socket_timeout=1, socket_connect_timeout=1)
+    return _redis_client
+
+def _redis_available() -> bool:
+    return time.monotonic() >= _redis_retry_at
+
+def _redis_failed(action: str, error: Exception):
+    """Ошибка Redis: логируем и не обращаемся к нему 30 секунд (запросы работают без Redis)"""
+    global _redis_retry_at
+    _redis_retry_at = time.monotonic() + 30
+    logger.warning(f"⚠️ Redis недоступен ({action}), повтор через 30с: {error}")
+
 # CORS middleware для админ-панели (исправленная версия)
 app.add_middleware(
     CORSMiddleware,
@@ -288,6 +367,14 @@ class PostCache(Base):
     userbot_metadata = Column(JSONB if USE_POSTGRESQL else Text, default={} if USE_POSTGRESQL else "{}")
     # processing_status = Column(String, default="pending")  # УБРАНО: заменено мультитенантными статусами в processed_data
 
+    # Уникальность поста в канале - нужна для INSERT ... ON CONFLICT DO NOTHING в /api/posts/batch
+    __table_args__ = (
+        UniqueConstraint('channel_telegram_id', 'telegram_message_id', name='uq_posts_cache_channel_message'),
+        # Keyset пагинация /api/posts/cache*: ORDER BY (sort_column, id) читается по индексу
+        Index('idx_posts_cache_collected_at_id', 'collected_at', 'id'),
+        Index('idx_posts_cache_post_date_id', 'post_date', 'id'),
+    )
+
 # Обновляем модель Category для связи с пользователями
 # 🚀 МУЛЬТИТЕНАНТНАЯ ТАБЛИЦА ПОДПИСОК (заменяет старую user_subscriptions)
 user_category_subscriptions = Table(
@@ -331,8 +418,57 @@ def get_db():
     finally:
         db.close()
 
+# Кэш отрендеренных блоков постов дайджеста: (версия шаблона, bot_id, post_id, processed_at) -> текст.
+# processed_at меняется при перезаписи AI результата, поэтому устаревший блок не используется.
+# При изменении формата блока поста нужно поднять DIGEST_FRAGMENT_TEMPLATE_VERSION.
+DIGEST_FRAGMENT_TEMPLATE_VERSION = 1
+DIGEST_FRAGMENT_CACHE_SIZE = int(os.getenv("DIGEST_FRAGMENT_CACHE_SIZE", "20000"))
+_digest_fragment_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_digest_fragment_cache_lock = threading.Lock()
+
+def _render_digest_post_fragment(post: dict) -> str:
+    parts = []
+    summary = post.get('summary') or post.get('ai_summary') or ''
+    url = post.get('url') or ''
+    title = post.get('title') or ''
+    if summary:
+        parts.append(f"💬 {summary}\n")
+    if url:
+        short = title[:80] + ("..." if len(title) > 80 else "")
+        parts.append(f"🔗 {url} <i>{short}</i>\n")
+    metrics = []
+    for k, icon in [("importance","⚡"),("urgency","🚨"),("significance","🎯"),("views","👁")]:
+        v = post.get(k)
+        if v not in (None, 0, "0"):
+            metrics.append(f"{icon} {v}")
+    if metrics:
+        parts.append(f"📊 {' • '.join(metrics)}\n")
+    parts.append("\n")
+    return ''.join(parts)
+
+def _digest_post_fragment(post: dict, bot_id: Optional[int]) -> str:
+    """Блок поста из LRU кэша (без bot_id или id поста - рендер без кэша)"""
+    post_id = post.get('id')
+    if bot_id is None or post_id is None:
+        return _render_digest_post_fragment(post)
+
+    key = (DIGEST_FRAGMENT_TEMPLATE_VERSION, bot_id, post_id, post.get('processed_at'))
+    with _digest_fragment_cache_lock:
+        fragment = _digest_fragment_cache.get(key)
+        if fragment is not None:
+            _digest_fragment_cache.move_to_end(key)
+            return fragment
+
+    fragment = _render_digest_post_fragment(post)
+    with _digest_fragment_cache_lock:
+        _digest_fragment_cache[key] = fragment
+        while len(_digest_fragment_cache) > DIGEST_FRAGMENT_CACHE_SIZE:
+            _digest_fragment_cache.popitem(last=False)
+    return fragment
+
 # Helper: сборка текста дайджеста
-def _build_digest_text(grouped_posts: dict, subscribed_names: set, created_at: Optional[str] = None) -> str:
+def _build_digest_text(grouped_posts: dict, subscribed_names: set, created_at: Optional[str] = None, bot_id: Optional[int] = None) -> str:
+    """Сборка дайджеста из заголовков тем/каналов и готовых блоков постов (кэш по bot_id)"""
     parts = []
     parts.append("📰 Ваш персональный дайджест\n\n")
     if created_at:
@@ -346,23 +482,7 @@ def _build_digest_text(grouped_posts: dict, subscribed_names: set, created_at: O
         for channel_name, posts in sorted(channels_map.items(), key=lambda x: len(x[1]), reverse=True):
             parts.append(f"\n📺 <b>{channel_name}</b>\n")
             posts.sort(key=lambda p: (p.get('post_date') or ''), reverse=True)
-            for post in posts:
-                summary = post.get('summary') or post.get('ai_summary') or ''
-                url = post.get('url') or ''
-                title = post.get('title') or ''
-                if summary:
-                    parts.append(f"💬 {summary}\n")
-                if url:
-                    short = title[:80] + ("..." if len(title) > 80 else "")
-                    parts.append(f"🔗 {url} <i>{short}</i>\n")
-                metrics = []
-                for k, icon in [("importance","⚡"),("urgency","🚨"),("significance","🎯"),("views","👁")]:
-                    v = post.get(k)
-                    if v not in (None, 0, "0"):
-                        metrics.append(f"{icon} {v}")
-                if metrics:
-                    parts.append(f"📊 {' • '.join(metrics)}\n")
-                parts.append("\n")
+            parts.extend(_digest_post_fragment(post, bot_id) for post in posts)
 
     if subscribed_names:
         parts.append(f"🎯 Ваши подписки: {', '.join(sorted(subscribed_names))}\n\n")
@@ -703,6 +823,7 @@ class PostCacheWithAIResponse(PostCacheBase):
     ai_importance: Optional[float] = None
     ai_urgency: Optional[float] = None
     ai_significance: Optional[float] = None
+    ai_digest_score: Optional[float] = None
     ai_processed_at: Optional[datetime] = None
     ai_processing_version: Optional[str] = None
     
@@ -1076,6 +1197,7 @@ def update_category(category_id: int, category: CategoryUpdate, db: Session = De
         setattr(db_category, field, value)
     
     db.commit()
+    _invalidate_bot_topology()
     db.refresh(db_category)
     return db_category
 
@@ -1091,6 +1213,7 @@ def delete_category(category_id: int, db: Session = Depends(get_db)):
     
     db.delete(category)
     db.commit()
+    _invalidate_bot_topology()
     return {"message": "Категория успешно удалена"}
 
 # API Routes для каналов
@@ -1182,6 +1305,7 @@ def update_channel(channel_id: int, channel: ChannelUpdate, db: Session = Depend
         setattr(db_channel, field, value)
     
     db.commit()
+    _invalidate_bot_topology()
     db.refresh(db_channel)
     return db_channel
 
@@ -1197,6 +1321,7 @@ def delete_channel(channel_id: int, db: Session = Depends(get_db)):
     
     db.delete(channel)
     db.commit()
+    _invalidate_bot_topology()
     return {"message": "Канал успешно удален"}
 
 @app.post("/api/channels/validate")
@@ -1270,33 +1395,17 @@ def get_stats(db: Session = Depends(get_db)):
     if active_bots:
         active_bot_ids = [bot.id for bot in active_bots]
         
-        # Получаем каналы активных ботов
-        bot_channels = db.query(BotChannel).filter(
+        # Проверяем, что у активных ботов есть каналы
+        has_bot_channels = db.query(BotChannel.id).filter(
             BotChannel.public_bot_id.in_(active_bot_ids),
             BotChannel.is_active == True
-        ).all()
+        ).first() is not None
         
-        if bot_channels:
-            channel_ids = [bc.channel_id for bc in bot_channels]
-            channels_info = db.query(Channel).filter(Channel.id.in_(channel_ids)).all()
-            channel_telegram_ids = [ch.telegram_id for ch in channels_info]
-            
-            # Мультитенантная статистика по статусам
-            posts_pending = db.query(PostCache.id).join(
-                ProcessedData, PostCache.id == ProcessedData.post_id
-            ).filter(
-                ProcessedData.processing_status == 'pending',
-                ProcessedData.public_bot_id.in_(active_bot_ids),
-                PostCache.channel_telegram_id.in_(channel_telegram_ids)
-            ).distinct().count()
-            
-            posts_processed = db.query(PostCache.id).join(
-                ProcessedData, PostCache.id == ProcessedData.post_id
-            ).filter(
-                ProcessedData.processing_status == 'completed',
-                ProcessedData.public_bot_id.in_(active_bot_ids),
-                PostCache.channel_telegram_id.in_(channel_telegram_ids)
-            ).distinct().count()
+        if has_bot_channels:
+            # Мультитенантная статистика по статусам (счетчики ai_status_counters, O(bots))
+            active_counters = _sum_ai_status_counters(_load_ai_status_counters(db, active_bot_ids))
+            posts_pending = active_counters.get('status:pending', 0)
+            posts_processed = active_counters.get('status:completed', 0)
         else:
             posts_pending = 0
             posts_processed = 0
@@ -1767,31 +1876,254 @@ def get_user_bot_subscriptions(bot_id: int, telegram_id: int, db: Session = Depe
     return result
 
 
-@app.get("/api/public-bots/{bot_id}/users/{telegram_id}/digest")
-def get_user_personal_digest(
+# === КЭШ ПЕРСОНАЛЬНОГО ДАЙДЖЕСТА ===
+# Redis hash digest:{bot_id}:{telegram_id}: поле - сигнатура подписок и параметров запроса, значение - готовый
+# ответ и поколения, при которых он собран. Запись в processed_data бота увеличивает digest:gen:{bot_id}
+# (массовые операции без конкретного бота - digest:gen:all), и старые ответы перестают совпадать без поиска
+# ключей. Изменение подписок удаляет hash пользователя целиком.
+DIGEST_CACHE_TTL_SECONDS = int(os.getenv("DIGEST_CACHE_TTL_SECONDS", "900"))
+DIGEST_CACHE_GLOBAL_GENERATION_KEY = "digest:gen:all"
+# Сброс не дошел до Redis: при следующем обращении к Redis увеличиваем digest:gen:all,
+# иначе ответы, собранные до записи в processed_data, совпадут с поколением и отдадутся устаревшими
+_digest_invalidation_pending = False
+
+def _digest_cache_key(bot_id: int, telegram_id: int) -> str:
+    return f"digest:{bot_id}:{telegram_id}"
+
+def _digest_subscription_signature(subs_categories, subscribed_channel_ids, max_posts: int, date_from: Optional[str], delta_window=None) -> str:
+    """Сигнатура интересов пользователя: одинаковая у пользователей с одинаковыми подписками"""
+    raw = json.dumps([
+        sorted((c.id, c.name) for c in subs_categories),
+        sorted(subscribed_channel_ids),
+        max_posts,
+        date_from,
+        delta_window
+    ], ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+def _get_cached_digest(bot_id: int, telegram_id: int, signature: str):
+    """Возвращает (ответ из кэша или None, текущие поколения для записи нового ответа)"""
+    if not _redis_available():
+        return None, None
+    try:
+        _apply_pending_digest_invalidation()
+        pipe = _get_redis_client().pipeline(transaction=False)
+        pipe.get(DIGEST_CACHE_GLOBAL_GENERATION_KEY)
+        pipe.get(f"digest:gen:{bot_id}")
+        pipe.hget(_digest_cache_key(bot_id, telegram_id), signature)
+        global_generation, bot_generation, cached = pipe.execute()
+    except Exception as e:
+        _redis_failed("чтение кэша дайджеста", e)
+        return None, None
+
+    generations = [int(global_generation or 0), int(bot_generation or 0)]
+    if cached:
+        entry = json.loads(cached)
+        if entry.get("generations") == generations:
+            return entry["digest"], generations
+    return None, generations
+
+def _store_cached_digest(bot_id: int, telegram_ids, signature: str, generations, digest: dict):
+    """Записать дайджест в кэш пользователей с одинаковой сигнатурой подписок (одним pipeline)"""
+    if generations is None or not _redis_available():
+        return
+    entry = json.dumps({"generations": generations, "digest": digest}, ensure_ascii=False)
+    try:
+        pipe = _get_redis_client().pipeline(transaction=False)
+        for telegram_id in telegram_ids:
+            key = _digest_cache_key(bot_id, telegram_id)
+            pipe.hset(key, signature, entry)
+            pipe.expire(key, DIGEST_CACHE_TTL_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        _redis_failed("запись кэша дайджеста", e)
+
+def _apply_pending_digest_invalidation():
+    """Довести до Redis сброс, не выполненный из-за ошибки Redis (общим поколением - боты неизвестны)"""
+    global _digest_invalidation_pending
+    if _digest_invalidation_pending:
+        _get_redis_client().incr(DIGEST_CACHE_GLOBAL_GENERATION_KEY)
+        _digest_invalidation_pending = False
+
+def _invalidate_digest_cache(bot_ids=None):
+    """Сбросить кэш дайджестов ботов после записи в processed_data (bot_ids=None - всех ботов).
+    В отличие от чтения кэша выполняется и в паузе после ошибки Redis - пропущенный сброс
+    оставил бы устаревшие ответы на весь DIGEST_CACHE_TTL_SECONDS."""
+    global _digest_invalidation_pending
+    try:
+        _apply_pending_digest_invalidation()
+        if bot_ids is None:
+            _get_redis_client().incr(DIGEST_CACHE_GLOBAL_GENERATION_KEY)
+            return
+        unique_bot_ids = sorted(set(bot_ids))
+        if not unique_bot_ids:
+            return
+        pipe = _get_redis_client().pipeline(transaction=False)
+        for bot_id in unique_bot_ids:
+            pipe.incr(f"digest:gen:{bot_id}")
+        pipe.execute()
+    except Exception as e:
+        _digest_invalidation_pending = True
+        _redis_failed("сброс кэша дайджестов", e)
+
+def _invalidate_user_digest_cache(bot_id: int, telegram_id: int):
+    """Сбросить кэш дайджеста пользователя после изменения подписок"""
+    if not _redis_available():
+        return
+    try:
+        _get_redis_client().delete(_digest_cache_key(bot_id, telegram_id))
+    except Exception as e:
+        _redis_failed("сброс кэша дайджеста пользователя", e)
+
+# Ответы без выборки постов (нет подписок) - общие для /digest и batch генерации
+DIGEST_NO_CATEGORY_SUBS_TEXT = '❌ У вас нет активных подписок по категориям. Используйте /subscribe для выбора тем.'
+DIGEST_NO_CHANNEL_SUBS_TEXT = '❌ У вас нет подписанных каналов. Используйте /channels для выбора.'
+DIGEST_NO_NEW_POSTS_TEXT = '✅ Новых постов по вашим подпискам с прошлого дайджеста нет. Загляните позже!'
+
+def _empty_digest(text: str) -> dict:
+    return {
+        'text': text,
+        'total_posts': 0,
+        'selected_posts': 0,
+        'themes': []
+    }
+
+def _digest_max_posts(bot: PublicBot, limit: Optional[int]) -> int:
+    max_posts = bot.max_posts_per_digest or limit
+    if limit:
+        max_posts = min(max_posts, limit)
+    return max_posts
+
+def _select_personal_digest(
+    db: Session,
     bot_id: int,
     telegram_id: int,
-    limit: int = Query(15, ge=1, le=50),
-    date_from: Optional[str] = None,
-    db: Session = Depends(get_db)
-):
-    """Сформировать персональный дайджест на стороне Backend.
+    subs_categories,
+    max_posts: int,
+    date_from: Optional[str],
+    processed_after: Optional[datetime] = None,
+    processed_until: Optional[datetime] = None
+) -> dict:
+    """Выборка постов и текст персонального дайджеста.
+    Подписки берутся JOIN'ом по telegram_id - в batch режиме это любой пользователь группы
+    с одинаковой сигнатурой подписок. processed_after/processed_until - окно delta дайджеста."""
+    # Посты с AI результатами для bot_id: подписки, непустое summary и max_posts - в одном запросе,
+    # поэтому редкие темы пользователя не теряются за окном свежих постов других категорий
+    subscribed_category_lower_names = db.query(func.lower(Category.name)).join(
+        user_category_subscriptions,
+        Category.id == user_category_subscriptions.c.category_id
+    ).filter(
+        user_category_subscriptions.c.user_telegram_id == telegram_id,
+        user_category_subscriptions.c.public_bot_id == bot_id
+    )
+    q = db.query(
+        PostCache.id,
+        PostCache.title,
+        PostCache.content,
+        PostCache.views,
+        PostCache.post_date,
+        ProcessedData.summary_text,
+        ProcessedData.category_name,
+        ProcessedData.importance,
+        ProcessedData.urgency,
+        ProcessedData.significance,
+        ProcessedData.processed_at,
+        ProcessedData.public_bot_id,
+        Channel.id.label('channel_id'),
+        Channel.title.label('channel_title'),
+    ).join(
+        ProcessedData, PostCache.id == ProcessedData.post_id
+    ).join(
+        Channel, Channel.telegram_id == PostCache.channel_telegram_id
+    ).join(
+        # Фильтр по подписанным каналам
+        user_channel_subscriptions,
+        and_(
+            user_channel_subscriptions.c.channel_id == Channel.id,
+            user_channel_subscriptions.c.user_telegram_id == telegram_id,
+            user_channel_subscriptions.c.public_bot_id == bot_id
+        )
+    ).filter(
+        ProcessedData.public_bot_id == bot_id,
+        ProcessedData.is_categorized == True,
+        # Фильтр по подпискам категорий (без учета регистра)
+        func.lower(ProcessedData.category_name).in_(subscribed_category_lower_names.scalar_subquery()),
+        # Суммари (обязательно не пустое)
+        func.trim(ProcessedData.summary_text) != ''
+    )
+    if date_from:
+        try:
+            dt_from = datetime.fromisoformat(date_from.replace('Z', '+00:00'))
+            q = q.filter(PostCache.post_date >= dt_from)
+        except Exception:
+            pass
+    # Delta окно: только посты, обработанные после водяного знака доставки
+    if processed_after is not None:
+        q = q.filter(ProcessedData.processed_at > processed_after)
+    if processed_until is not None:
+        q = q.filter(ProcessedData.processed_at <= processed_until)
 
-    Логика:
-    - Получаем подписки пользователя (категории и каналы) для данного бота
-    - Берём обработанные AI посты из processed_data по bot_id (JOIN с posts_cache)
-    - Фильтруем по индивидуальной категории поста и подпискам пользователя, а также по подписанным каналам
-    - Ограничиваем количеством limit или max_posts_per_digest из public_bots
-    - Группируем по теме → каналу и собираем готовый текст
-    """
+    # Берем самые свежие по дате поста
+    rows = q.order_by(PostCache.post_date.desc(), PostCache.id.desc()).limit(max_posts).all()
+
+    # Группировка: тема → канал
+    grouped: dict = {}
+    for row in rows:
+        theme = str(row.category_name)
+        channel_title = row.channel_title or "Канал"
+        grouped.setdefault(theme, {}).setdefault(channel_title, []).append({
+            'id': row.id,
+            'processed_at': row.processed_at,
+            'title': row.title,
+            'summary': row.summary_text,
+            'importance': row.importance or 0,
+            'urgency': row.urgency or 0,
+            'significance': row.significance or 0,
+            'views': row.views or 0,
+            'post_date': row.post_date,
+        })
+    selected_posts = len(rows)
+
+    subscribed_human = {c.name for c in subs_categories}
+    try:
+        logging.getLogger("main").info(
+            f"digest: bot_id={bot_id}, user_id={telegram_id}, subs_cat={len(subs_categories)}, "
+            f"rows={len(rows)}, selected={selected_posts}"
+        )
+    except Exception:
+        pass
+    text = _build_digest_text(grouped, subscribed_human, bot_id=bot_id)
+    digest = {
+        'text': text,
+        'total_posts': len(rows),
+        'selected_posts': selected_posts,
+        'themes': list(grouped.keys()),
+    }
+    return digest
+
+# processed_at = now() - время начала транзакции записи: транзакция, начатая раньше чтения дайджеста,
+# но закоммиченная после него, добавит строки с processed_at меньше водяного знака, и delta их пропустит.
+# Верхняя граница окна отстает от текущего времени на запас не меньше длительности транзакции записи.
+DIGEST_DELTA_SAFETY_LAG_SECONDS = int(os.getenv("DIGEST_DELTA_SAFETY_LAG_SECONDS", "60"))
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """datetime с tzinfo=UTC: PostgreSQL отдает TIMESTAMPTZ aware, SQLite - naive (время в UTC).
+    Без приведения сравнение naive и aware значений падает с TypeError."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def _load_personal_digest_context(db: Session, bot_id: int, telegram_id: int, limit: int, delta: bool) -> dict:
+    """Бот, подписки пользователя и окно delta дайджеста.
+    Ранний выход (нет подписок / нет новых постов) - готовый ответ в ключе 'digest'."""
     # Проверяем бота и настройки
     bot = db.query(PublicBot).filter(PublicBot.id == bot_id).first()
     if not bot:
         raise HTTPException(status_code=404, detail="Бот не найден")
 
-    max_posts = bot.max_posts_per_digest or limit
-    if limit:
-        max_posts = min(max_posts, limit)
+    max_posts = _digest_max_posts(bot, limit)
 
     # Подписки пользователя
     subs_categories = db.query(Category).join(
@@ -1821,12 +2153,7 @@ def get_user_personal_digest(
             )
         except Exception:
             pass
-        return {
-            'text': '❌ У вас нет активных подписок по категориям. Используйте /subscribe для выбора тем.',
-            'total_posts': 0,
-            'selected_posts': 0,
-            'themes': []
-        }
+        return {"digest": _empty_digest(DIGEST_NO_CATEGORY_SUBS_TEXT)}
 
     # Если пользователь не подписан ни на один канал — не формируем дайджест
     if not subscribed_channel_ids:
@@ -1836,125 +2163,205 @@ def get_user_personal_digest(
             )
         except Exception:
             pass
-        return {
-            'text': '❌ У вас нет подписанных каналов. Используйте /channels для выбора.',
-            'total_posts': 0,
-            'selected_posts': 0,
-            'themes': []
-        }
+        return {"digest": _empty_digest(DIGEST_NO_CHANNEL_SUBS_TEXT)}
+
+    # Delta режим: окно (водяной знак доставки, последний processed_at бота]
+    processed_after = processed_until = None
+    if delta:
+        processed_after = _as_utc(db.query(DigestDeliveryWatermark.delivered_until).filter(
+            DigestDeliveryWatermark.public_bot_id == bot_id,
+            DigestDeliveryWatermark.user_telegram_id == telegram_id
+        ).scalar())
+        processed_until = _as_utc(db.query(func.max(ProcessedData.processed_at)).filter(
+            ProcessedData.public_bot_id == bot_id
+        ).scalar())
+        if processed_until is not None:
+            # Посты последних DIGEST_DELTA_SAFETY_LAG_SECONDS уйдут в следующий delta дайджест
+            processed_until = min(
+                processed_until,
+                datetime.now(timezone.utc) - timedelta(seconds=DIGEST_DELTA_SAFETY_LAG_SECONDS)
+            )
+        if processed_until is None or (processed_after is not None and processed_until <= processed_after):
+            watermark = processed_after or processed_until
+            return {"digest": {
+                **_empty_digest(DIGEST_NO_NEW_POSTS_TEXT),
+                'watermark': watermark.isoformat() if watermark else None
+            }}
 
-    # Посты с AI результатами для bot_id
-    q = db.query(
-        PostCache.id,
-        PostCache.title,
-        PostCache.content,
-        PostCache.views,
-        PostCache.post_date,
-        ProcessedData.summaries,
-        ProcessedData.categories,
-        ProcessedData.metrics,
-        ProcessedData.processed_at,
-        ProcessedData.public_bot_id,
-        Channel.id.label('channel_id'),
-        Channel.title.label('channel_title'),
-    ).join(
-        ProcessedData, PostCache.id == ProcessedData.post_id
-    ).join(
-        Channel, Channel.telegram_id == PostCache.channel_telegram_id
-    ).filter(
-        ProcessedData.public_bot_id == bot_id,
-        ProcessedData.is_categorized == True
+    return {
+        "max_posts": max_posts,
+        "subs_categories": subs_categories,
+        "subscribed_channel_ids": subscribed_channel_ids,
+        "processed_after": processed_after,
+        "processed_until": processed_until
+    }
+
+@app.get("/api/public-bots/{bot_id}/users/{telegram_id}/digest")
+async def get_user_personal_digest(
+    bot_id: int,
+    telegram_id: int,
+    limit: int = Query(15, ge=1, le=50),
+    date_from: Optional[str] = None,
+    delta: bool = False  # только новое с последнего доставленного дайджеста (см. .../digest/delivered)
+):
+    """Сформировать персональный дайджест на стороне Backend.
+
+    Логика:
+    - Получаем подписки пользователя (категории и каналы) для данного бота
+    - Берём обработанные AI посты из processed_data по bot_id (JOIN с posts_cache)
+    - Фильтруем по индивидуальной категории поста и подпискам пользователя, а также по подписанным каналам
+      (JOIN с таблицами подписок в SQL)
+    - Ограничиваем количеством limit или max_posts_per_digest из public_bots (LIMIT запроса)
+    - Группируем по теме → каналу и собираем готовый текст
+    - delta=true: только посты, обработанные после водяного знака доставки (processed_at),
+      в ответе watermark - его бот передает в .../digest/delivered после отправки
+
+    Async endpoint: всплеск запросов в момент рассылки ждет соединения async пула, а не потока.
+    """
+    context = await _run_db(_load_personal_digest_context, bot_id, telegram_id, limit, delta)
+    if "digest" in context:
+        return context["digest"]
+    processed_after = context["processed_after"]
+    processed_until = context["processed_until"]
+
+    # Повторный /digest без новых AI результатов и изменений подписок - из кэша
+    signature = _digest_subscription_signature(
+        context["subs_categories"], context["subscribed_channel_ids"], context["max_posts"], date_from,
+        delta_window=[processed_after, processed_until] if delta else None
     )
-    # Фильтр по подписанным каналам
-    if subscribed_channel_ids:
-        q = q.filter(Channel.id.in_(list(subscribed_channel_ids)))
-    if date_from:
-        try:
-            dt_from = datetime.fromisoformat(date_from.replace('Z', '+00:00'))
-            q = q.filter(PostCache.post_date >= dt_from)
-        except Exception:
-            pass
+    cached_digest, generations = await run_in_threadpool(_get_cached_digest, bot_id, telegram_id, signature)
+    if cached_digest is not None:
+        return cached_digest
 
-    # Берем самые свежие по дате поста
-    rows = q.order_by(PostCache.post_date.desc()).limit(200).all()
+    digest = await _run_db(
+        _select_personal_digest, bot_id, telegram_id, context["subs_categories"], context["max_posts"], date_from,
+        processed_after=processed_after, processed_until=processed_until
+    )
+    if delta:
+        if not digest['selected_posts']:
+            digest = _empty_digest(DIGEST_NO_NEW_POSTS_TEXT)
+        digest['watermark'] = processed_until.isoformat()
+    await run_in_threadpool(_store_cached_digest, bot_id, [telegram_id], signature, generations, digest)
+    return digest
 
-    # Фильтрация по подпискам и сбор структуры
-    grouped: dict = {}
-    selected_posts = 0
-    for row in rows:
-        # AI category
-        category_name = None
-        try:
-            categories = row.categories if isinstance(row.categories, dict) else json.loads(row.categories)
-            category_name = categories.get('category_name') or categories.get('ru') or categories.get('primary')
-        except Exception:
-            pass
-        if not category_name:
-            continue
+class DigestDeliveredRequest(BaseModel):
+    """Подтверждение доставки delta дайджеста"""
+    watermark: datetime
 
-        # Фильтр по подпискам категорий
-        if subscribed_category_names and category_name.lower() not in subscribed_category_names:
-            continue
+@app.post("/api/public-bots/{bot_id}/users/{telegram_id}/digest/delivered")
+async def mark_digest_delivered(bot_id: int, telegram_id: int, request: DigestDeliveredRequest):
+    """Бот отправил delta дайджест - сдвигаем водяной знак доставки (только вперед)"""
+    # asyncpg не приводит naive datetime к TIMESTAMPTZ - водяной знак без зоны считаем UTC
+    return await _run_db(_mark_digest_delivered, bot_id, telegram_id, _as_utc(request.watermark))
 
-        # Фильтр по подписанным каналам (если заданы подписки на каналы)
-        # У нас нет прямого channel_id в запросе; в MVP пропускаем контроль channel_id, так как бот подписывает на id из справочника
+def _mark_digest_delivered(db: Session, bot_id: int, telegram_id: int, watermark: datetime) -> dict:
+    try:
+        dialect_insert = insert if USE_POSTGRESQL else sqlite_insert
+        stmt = dialect_insert(DigestDeliveryWatermark).values(
+            public_bot_id=bot_id,
+            user_telegram_id=telegram_id,
+            delivered_until=watermark
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['public_bot_id', 'user_telegram_id'],
+            set_={'delivered_until': stmt.excluded.delivered_until, 'updated_at': func.now()},
+            where=DigestDeliveryWatermark.delivered_until < stmt.excluded.delivered_until
+        )
+        db.execute(stmt)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Ошибка сохранения водяного знака дайджеста (bot={bot_id}, user={telegram_id}): {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка сохранения водяного знака: {str(e)}")
 
-        # Суммари (обязательно не пустое)
-        summary = None
-        try:
-            summaries = row.summaries if isinstance(row.summaries, dict) else json.loads(row.summaries)
-            summary = summaries.get('ru') or summaries.get('summary') or summaries.get('text')
-        except Exception:
-            pass
-        if not summary or not str(summary).strip():
-            continue
+    delivered_until = db.query(DigestDeliveryWatermark.delivered_until).filter(
+        DigestDeliveryWatermark.public_bot_id == bot_id,
+        DigestDeliveryWatermark.user_telegram_id == telegram_id
+    ).scalar()
+    return {
+        "bot_id": bot_id,
+        "telegram_id": telegram_id,
+        "delivered_until": delivered_until
+    }
 
-        # Метрики
-        importance = urgency = significance = views = 0
-        try:
-            metrics = row.metrics if isinstance(row.metrics, dict) else json.loads(row.metrics)
-            importance = metrics.get('importance', 0)
-            urgency = metrics.get('urgency', 0)
-            significance = metrics.get('significance', 0)
-        except Exception:
-            pass
-        views = row.views or 0
+class DigestBatchRequest(BaseModel):
+    """Запрос batch генерации дайджестов бота"""
+    telegram_ids: Optional[List[int]] = None  # None - все пользователи с подписками в боте
+    limit: int = Field(15, ge=1, le=50)
+    date_from: Optional[str] = None
 
-        # Группировка: тема → канал
-        theme = str(category_name)
-        try:
-            channel_title = getattr(row, 'channel_title', None) or "Канал"
-        except Exception:
-            channel_title = "Канал"
+@app.post("/api/public-bots/{bot_id}/digests/batch")
+def generate_bot_digests_batch(bot_id: int, request: DigestBatchRequest, db: Session = Depends(get_db)):
+    """Сформировать персональные дайджесты для пользователей бота (плановая рассылка).
 
-        grouped.setdefault(theme, {}).setdefault(channel_title, []).append({
-            'title': row.title,
-            'summary': summary,
-            'importance': importance,
-            'urgency': urgency,
-            'significance': significance,
-            'views': views,
-            'post_date': getattr(row, 'post_date', None),
-        })
+    Пользователи с одинаковыми подписками (категории + каналы) группируются по сигнатуре -
+    выборка и _build_digest_text выполняются один раз на группу. Результат возвращается
+    по группам и записывается в кэш /digest каждого участника группы.
+    """
+    bot = db.query(PublicBot).filter(PublicBot.id == bot_id).first()
+    if not bot:
+        raise HTTPException(status_code=404, detail="Бот не найден")
 
-        selected_posts += 1
-        if selected_posts >= max_posts:
-            break
+    max_posts = _digest_max_posts(bot, request.limit)
+
+    # Подписки всех пользователей бота - двумя запросами
+    category_query = db.query(user_category_subscriptions.c.user_telegram_id, Category).join(
+        Category, Category.id == user_category_subscriptions.c.category_id
+    ).filter(user_category_subscriptions.c.public_bot_id == bot_id)
+    channel_query = db.query(
+        user_channel_subscriptions.c.user_telegram_id,
+        user_channel_subscriptions.c.channel_id
+    ).filter(user_channel_subscriptions.c.public_bot_id == bot_id)
+    if request.telegram_ids is not None:
+        category_query = category_query.filter(user_category_subscriptions.c.user_telegram_id.in_(request.telegram_ids))
+        channel_query = channel_query.filter(user_channel_subscriptions.c.user_telegram_id.in_(request.telegram_ids))
+
+    user_categories: Dict[int, list] = {}
+    for telegram_id, category in category_query.all():
+        user_categories.setdefault(telegram_id, []).append(category)
+    user_channels: Dict[int, set] = {}
+    for telegram_id, channel_id in channel_query.all():
+        user_channels.setdefault(telegram_id, set()).add(channel_id)
+
+    # Группировка пользователей по сигнатуре подписок
+    telegram_ids = set(user_categories) | set(user_channels) | set(request.telegram_ids or [])
+    groups: Dict[str, Dict[str, Any]] = {}
+    for telegram_id in sorted(telegram_ids):
+        subs_categories = user_categories.get(telegram_id, [])
+        subscribed_channel_ids = user_channels.get(telegram_id, set())
+        signature = _digest_subscription_signature(subs_categories, subscribed_channel_ids, max_posts, request.date_from)
+        group = groups.setdefault(signature, {
+            "telegram_ids": [],
+            "categories": subs_categories,
+            "channel_ids": subscribed_channel_ids
+        })
+        group["telegram_ids"].append(telegram_id)
+
+    digests = []
+    for signature, group in groups.items():
+        if not group["categories"]:
+            digest = _empty_digest(DIGEST_NO_CATEGORY_SUBS_TEXT)
+        elif not group["channel_ids"]:
+            digest = _empty_digest(DIGEST_NO_CHANNEL_SUBS_TEXT)
+        else:
+            # Подписки участников группы одинаковы - выборка по первому из них
+            representative = group["telegram_ids"][0]
+            digest, generations = _get_cached_digest(bot_id, representative, signature)
+            if digest is None:
+                digest = _select_personal_digest(db, bot_id, representative, group["categories"], max_posts, request.date_from)
+            _store_cached_digest(bot_id, group["telegram_ids"], signature, generations, digest)
+        digests.append({
+            "signature": signature,
+            "telegram_ids": group["telegram_ids"],
+            "digest": digest
+        })
 
-    subscribed_human = {c.name for c in subs_categories}
-    try:
-        logging.getLogger("main").info(
-            f"digest: bot_id={bot_id}, user_id={telegram_id}, subs_cat={len(subscribed_category_names)}, "
-            f"subs_chan={len(subscribed_channel_ids)}, rows={len(rows)}, selected={selected_posts}"
-        )
-    except Exception:
-        pass
-    text = _build_digest_text(grouped, subscribed_human)
+    logger.info(f"📰 Batch дайджесты бота {bot_id}: {len(telegram_ids)} пользователей, {len(groups)} уникальных подписок")
     return {
-        'text': text,
-        'total_posts': len(rows),
-        'selected_posts': selected_posts,
-        'themes': list(grouped.keys()),
+        "bot_id": bot_id,
+        "users": len(telegram_ids),
+        "groups": len(groups),
+        "digests": digests
     }
 
 @app.post("/api/public-bots/{bot_id}/users/{telegram_id}/subscriptions")
@@ -2008,6 +2415,7 @@ def update_user_bot_subscriptions(
             )
     
     db.commit()
+    _invalidate_user_digest_cache(bot_id, telegram_id)
     
     return {
         "message": f"Подписки для бота {bot_id} сохранены! Выбрано категорий: {len(category_ids)}",
@@ -2049,6 +2457,7 @@ def remove_user_bot_subscription(bot_id: int, telegram_id: int, category_id: int
     )
     
     db.commit()
+    _invalidate_user_digest_cache(bot_id, telegram_id)
     
     return {"message": "Подписка удалена"}
 
@@ -2166,6 +2575,7 @@ def update_user_bot_channel_subscriptions(
                 )
     
     db.commit()
+    _invalidate_user_digest_cache(bot_id, telegram_id)
     
     return {
         "message": "Подписки на каналы обновлены",
@@ -2207,66 +2617,114 @@ def remove_user_bot_channel_subscription(bot_id: int, telegram_id: int, channel_
     )
     
     db.commit()
+    _invalidate_user_digest_cache(bot_id, telegram_id)
     
     return {"message": "Подписка на канал удалена"}
 
 # API для posts_cache
+# Размер одного INSERT в posts_cache: ~10 параметров на строку, держимся далеко от лимитов драйверов
+POSTS_INSERT_CHUNK_SIZE = 500
+
+def _match_channel_metadata(channel_telegram_id: int, channels_metadata: Optional[Dict[str, Dict[str, Any]]]) -> dict:
+    """Ищет metadata канала от userbot по различным ключам (telegram_id может входить в ключ)"""
+    if not channels_metadata:
+        return {}
+    channel_key = str(channel_telegram_id)
+    for key in channels_metadata.keys():
+        if channel_key in key or key == channel_key:
+            return channels_metadata[key] or {}
+    return {}
+
+def _insert_posts_skip_existing(db: Session, posts: List[PostCacheCreate], channels_metadata: Optional[Dict[str, Dict[str, Any]]] = None):
+    """Set-based вставка постов: один INSERT ... ON CONFLICT DO NOTHING ... RETURNING на чанк.
+
+    Дедупликация выполняется базой по uq_posts_cache_channel_message.
+    Возвращает (created_rows, skipped_details), где created_rows - строки RETURNING (id, channel_telegram_id, telegram_message_id).
+    """
+    metadata_cache: Dict[int, dict] = {}
+    rows = []
+    seen_keys = set()
+    skipped_details = []
+
+    for post_data in posts:
+        key = (post_data.channel_telegram_id, post_data.telegram_message_id)
+        if key in seen_keys:
+            # Дубликат внутри одного батча
+            skipped_details.append({
+                "channel_id": post_data.channel_telegram_id,
+                "message_id": post_data.telegram_message_id,
+                "reason": "duplicate_in_batch"
+            })
+            continue
+        seen_keys.add(key)
+
+        if post_data.channel_telegram_id not in metadata_cache:
+            metadata_cache[post_data.channel_telegram_id] = _match_channel_metadata(post_data.channel_telegram_id, channels_metadata)
+        metadata = metadata_cache[post_data.channel_telegram_id]
+
+        post_dict = post_data.model_dump()
+        # Убираем processing_status так как мы убрали глобальные статусы
+        post_dict.pop("processing_status", None)
+        media_urls = post_dict.get("media_urls") or []
+        post_dict["media_urls"] = media_urls if USE_POSTGRESQL else json.dumps(media_urls, ensure_ascii=False)
+        post_dict["userbot_metadata"] = metadata if USE_POSTGRESQL else json.dumps(metadata, ensure_ascii=False)
+        rows.append(post_dict)
+
+    created_rows = []
+    dialect_insert = insert if USE_POSTGRESQL else sqlite_insert
+    for i in range(0, len(rows), POSTS_INSERT_CHUNK_SIZE):
+        chunk = rows[i:i + POSTS_INSERT_CHUNK_SIZE]
+        stmt = dialect_insert(PostCache).values(chunk).on_conflict_do_nothing(
+            index_elements=['channel_telegram_id', 'telegram_message_id']
+        ).returning(PostCache.id, PostCache.channel_telegram_id, PostCache.telegram_message_id)
+        created_rows.extend(db.execute(stmt).fetchall())
+
+    created_keys = {(r.channel_telegram_id, r.telegram_message_id) for r in created_rows}
+    for row in rows:
+        key = (row["channel_telegram_id"], row["telegram_message_id"])
+        if key not in created_keys:
+            skipped_details.append({
+                "channel_id": key[0],
+                "message_id": key[1],
+                "reason": "already_exists"
+            })
+
+    return created_rows, skipped_details
+
+def _publish_new_posts_event(created_rows, source: str):
+    """Публикует событие "новые посты в каналах X" после commit. Ошибки Redis не ломают ingest -
+    подписчики подстрахованы периодическим опросом."""
+    if not created_rows or not _redis_available():
+        return
+    event = {
+        "event": "new_posts",
+        "source": source,
+        "created": len(created_rows),
+        "channel_telegram_ids": sorted({row.channel_telegram_id for row in created_rows}),
+        "post_ids": [row.id for row in created_rows],
+        "published_at": datetime.utcnow().isoformat()
+    }
+    try:
+        receivers = _get_redis_client().publish(NEW_POSTS_CHANNEL, json.dumps(event))
+        logger.info(f"📣 Событие new_posts ({source}): {len(created_rows)} постов, каналы {event['channel_telegram_ids']}, подписчиков {receivers}")
+    except Exception as e:
+        _redis_failed("публикация new_posts", e)
+
 @app.post("/api/posts/batch", status_code=status.HTTP_201_CREATED)
 def create_posts_batch(batch: PostsBatchCreate, db: Session = Depends(get_db)):
-    """Принимает batch постов от userbot и сохраняет в posts_cache"""
+    """Принимает batch постов от userbot и сохраняет в posts_cache (дедупликация на стороне БД)"""
     try:
-        created_posts = []
-        skipped_posts = []
-        
-        for post_data in batch.posts:
-            # Проверяем, не существует ли уже такой пост
-            existing_post = db.query(PostCache).filter(
-                PostCache.channel_telegram_id == post_data.channel_telegram_id,
-                PostCache.telegram_message_id == post_data.telegram_message_id
-            ).first()
-            
-            if existing_post:
-                skipped_posts.append({
-                    "channel_id": post_data.channel_telegram_id,
-                    "message_id": post_data.telegram_message_id,
-                    "reason": "already_exists"
-                })
-                continue
-            
-            # Создаем новый пост
-            post_dict = post_data.model_dump()
-            # Убираем processing_status так как мы убрали глобальные статусы
-            post_dict.pop("processing_status", None)
-            
-            # Добавляем metadata от userbot - ищем по различным ключам
-            metadata = {}
-            if batch.channels_metadata:
-                # Пытаемся найти metadata по различным идентификаторам
-                channel_key = None
-                for key in batch.channels_metadata.keys():
-                    if str(post_data.channel_telegram_id) in key or key == str(post_data.channel_telegram_id):
-                        channel_key = key
-                        break
-                
-                if channel_key:
-                    metadata = batch.channels_metadata[channel_key]
-            
-            # JSONB поля теперь сохраняются напрямую как Python объекты
-            post_dict["userbot_metadata"] = metadata if metadata else {}
-            
-            db_post = PostCache(**post_dict)
-            db.add(db_post)
-            created_posts.append(post_data.telegram_message_id)
-        
+        created_rows, skipped_posts = _insert_posts_skip_existing(db, batch.posts, batch.channels_metadata)
         db.commit()
+        _publish_new_posts_event(created_rows, "batch")
         
         return {
             "message": "Batch обработан успешно",
             "timestamp": batch.timestamp,
             "collection_stats": batch.collection_stats,
-            "created_posts": len(created_posts),
+            "created_posts": len(created_rows),
             "skipped_posts": len(skipped_posts),
-            "created_ids": created_posts,
+            "created_ids": [r.telegram_message_id for r in created_rows],
             "skipped_details": skipped_posts
         }
         
@@ -2277,39 +2735,315 @@ def create_posts_batch(batch: PostsBatchCreate, db: Session = Depends(get_db)):
             detail=f"Ошибка сохранения постов: {str(e)}"
         )
 
-@app.get("/api/posts/cache", response_model=List[PostCacheResponse])
-def get_posts_cache(
-    skip: int = 0,
-    limit: int = 100,
-    channel_telegram_id: Optional[int] = None,
-    processing_status: Optional[str] = None,
-    search: Optional[str] = None,
-    date_from: Optional[str] = None,
-    date_to: Optional[str] = None,
-    sort_by: str = "collected_at",
-    sort_order: str = "desc",
+# Потоковый ingest: сколько постов копим перед коммитом чанка
+STREAM_INGEST_CHUNK_SIZE = 200
+
+@app.post("/api/posts/stream", status_code=status.HTTP_201_CREATED)
+async def ingest_posts_stream(
+    request: Request,
+    chunk_size: int = Query(STREAM_INGEST_CHUNK_SIZE, ge=1, le=POSTS_INSERT_CHUNK_SIZE),
     db: Session = Depends(get_db)
 ):
-    """Получить список постов из cache с расширенной фильтрацией"""
-    from datetime import datetime
-    
-    query = db.query(PostCache)
-    
-    # Фильтр по каналу
-    if channel_telegram_id:
-        query = query.filter(PostCache.channel_telegram_id == channel_telegram_id)
-    
-    # Фильтр по статусу обработки
-    if processing_status:
+    """Потоковый приём постов от userbot в формате NDJSON (одна запись на строку).
+
+    - Строка с ключом "channels_metadata" обновляет metadata каналов для последующих постов
+    - Остальные строки - посты в формате PostCacheCreate
+    - Поддерживается Content-Encoding: gzip
+    - Посты коммитятся чанками по chunk_size по мере поступления, тело целиком в память не читается
+    """
+    is_gzip = request.headers.get("content-encoding", "").lower() == "gzip"
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if is_gzip else None
+
+    channels_metadata: Dict[str, Dict[str, Any]] = {}
+    pending: List[PostCacheCreate] = []
+    stats = {"created_posts": 0, "skipped_posts": 0, "chunks_committed": 0, "lines": 0}
+    invalid_lines = []
+
+    async def flush():
+        if not pending:
+            return
+        created_rows, skipped = await run_in_threadpool(_insert_posts_skip_existing, db, list(pending), channels_metadata)
+        await run_in_threadpool(db.commit)
+        await run_in_threadpool(_publish_new_posts_event, created_rows, "stream")
+        stats["created_posts"] += len(created_rows)
+        stats["skipped_posts"] += len(skipped)
+        stats["chunks_committed"] += 1
+        pending.clear()
+
+    def handle_line(raw_line: bytes):
+        raw_line = raw_line.strip()
+        if not raw_line:
+            return
+        stats["lines"] += 1
+        try:
+            record = json.loads(raw_line)
+            if "channels_metadata" in record:
+                channels_metadata.update(record["channels_metadata"] or {})
+                return
+            pending.append(PostCacheCreate.model_validate(record))
+        except Exception as e:
+            # Невалидная строка не должна ронять весь поток
+            if len(invalid_lines) < 100:
+                invalid_lines.append({"line": stats["lines"], "error": str(e)[:200]})
+
+    try:
+        buffer = b""
+        async for chunk in request.stream():
+            if decompressor is not None:
+                chunk = decompressor.decompress(chunk)
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                handle_line(line)
+                if len(pending) >= chunk_size:
+                    await flush()
+
+        if decompressor is not None:
+            buffer += decompressor.flush()
+        for line in buffer.split(b"\n"):
+            handle_line(line)
+        await flush()
+
+        logger.info(
+            f"📥 NDJSON ingest: строк {stats['lines']}, создано {stats['created_posts']}, "
+            f"пропущено {stats['skipped_posts']}, чанков {stats['chunks_committed']}, ошибок {len(invalid_lines)}"
+        )
+
+        return {
+            "message": "Поток обработан успешно",
+            **stats,
+            "invalid_lines": len(invalid_lines),
+            "invalid_details": invalid_lines
+        }
+
+    except Exception as e:
+        await run_in_threadpool(db.rollback)
+        logger.error(f"❌ Ошибка потокового приёма постов: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка потокового сохранения постов (закоммичено чанков: {stats['chunks_committed']}): {str(e)}"
+        )
+
+# === ПОЛНОТЕКСТОВЫЙ ПОИСК POSTS_CACHE ===
+# PostgreSQL: генерируемая колонка search_vector (russian, title - вес A, content - вес B) + GIN индекс,
+# создается только миграцией 006 (ADD COLUMN ... STORED переписывает таблицу). До миграции поиск
+# идет по выражению индекса idx_posts_cache_content_search из 001.
+# SQLite: внешняя FTS5 таблица posts_cache_fts, синхронизируется триггерами.
+# См. database/migrations/006_posts_cache_fulltext_search.sql
+POSTS_SEARCH_TS_CONFIG = "russian"
+POSTS_SEARCH_VECTOR_AVAILABLE = False  # PostgreSQL: колонка search_vector есть (проверяется при старте)
+
+def _apply_posts_search(query, search: str):
+    """Фильтр поиска по title/content. Возвращает (query, rank) - rank больше у более релевантных постов"""
+    terms = re.findall(r"\w+", search)
+    if not terms:
+        # Только знаки препинания - полнотекстовому поиску искать нечего, оставляем подстроку
+        search_pattern = f"%{search}%"
+        return query.filter(PostCache.content.ilike(search_pattern) | PostCache.title.ilike(search_pattern)), None
+    
+    if USE_POSTGRESQL:
+        if POSTS_SEARCH_VECTOR_AVAILABLE:
+            search_vector = literal_column("posts_cache.search_vector")
+        else:
+            # То же выражение, что в idx_posts_cache_content_search (001) - иначе индекс не используется
+            search_vector = literal_column(
+                f"to_tsvector('{POSTS_SEARCH_TS_CONFIG}', "
+                "COALESCE(posts_cache.title, '') || ' ' || COALESCE(posts_cache.content, ''))"
+            )
+        ts_query = func.websearch_to_tsquery(POSTS_SEARCH_TS_CONFIG, search)
+        return query.filter(search_vector.op("@@")(ts_query)), func.ts_rank_cd(search_vector, ts_query)
+    
+    # FTS5: каждое слово как префикс ("слово"*) - без русского стеммера так находятся словоформы
+    fts_query = " ".join(f'"{term}"*' for term in terms)
+    matches = select(
+        literal_column("rowid").label("post_id"),
+        literal_column("bm25(posts_cache_fts)").label("bm25")
+    ).select_from(text("posts_cache_fts")).where(
+        text("posts_cache_fts MATCH :fts_query").bindparams(fts_query=fts_query)
+    ).subquery()
+    # bm25: меньше - релевантнее
+    return query.join(matches, matches.c.post_id == PostCache.id), -matches.c.bm25
+
+# === KEYSET ПАГИНАЦИЯ POSTS_CACHE ===
+# Cursor режим: следующая страница начинается после ключа (sort_column, id) последней строки,
+# без OFFSET - стоимость не растет с глубиной страницы (индексы idx_posts_cache_*_id)
+# 🚀 Быстрый путь ответа (?fast=true): строки из БД → dict → orjson, без response_model валидации.
+# Данные приходят прямо из БД, повторная проверка Pydantic для сотен строк - чистые накладные расходы.
+class FastJSONResponse(JSONResponse):
+    """JSON ответ через orjson (без orjson - стандартный json с тем же форматом дат)"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(
+            content, ensure_ascii=False, separators=(",", ":"),
+            default=lambda value: value.isoformat() if isinstance(value, datetime) else str(value)
+        ).encode("utf-8")
+
+POSTS_CACHE_FAST_COLUMNS = (
+    PostCache.id, PostCache.channel_telegram_id, PostCache.telegram_message_id, PostCache.title,
+    PostCache.content, PostCache.media_urls, PostCache.views, PostCache.post_date,
+    PostCache.collected_at, PostCache.userbot_metadata
+)
+POSTS_CACHE_JSON_FIELDS = ("media_urls", "userbot_metadata")
+
+def _fast_rows(rows, json_fields=(), extra: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Строки with_entities(...) → список dict; JSON поля SQLite (Text) разбираются в объекты"""
+    if not rows:
+        return []
+    keys = rows[0]._fields
+    json_indexes = [] if USE_POSTGRESQL else [keys.index(field) for field in json_fields]
+    items = []
+    for row in rows:
+        item = dict(zip(keys, row))
+        for index in json_indexes:
+            value = row[index]
+            item[keys[index]] = json.loads(value) if value else None
+        if extra:
+            item.update(extra)
+        items.append(item)
+    return items
+
+POSTS_CURSOR_SORT_COLUMNS = ("collected_at", "post_date", "id")
+POSTS_COUNT_MODES = ("exact", "estimated", "none")
+# estimated: точный COUNT только до этого порога, дальше - оценка планировщика PostgreSQL
+POSTS_EXACT_COUNT_LIMIT = int(os.getenv("POSTS_EXACT_COUNT_LIMIT", "10000"))
+
+def _posts_keyset_columns(sort_by: str, extra_columns=()):
+    """Колонки ключа cursor пагинации: сортировка + id (+ доп. колонки для уникальности при JOIN)"""
+    if sort_by not in POSTS_CURSOR_SORT_COLUMNS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cursor пагинация поддерживает сортировку только по: {', '.join(POSTS_CURSOR_SORT_COLUMNS)}"
+        )
+    columns = [getattr(PostCache, sort_by)]
+    if sort_by != "id":
+        columns.append(PostCache.id)
+    return columns + list(extra_columns)
+
+def _encode_posts_cursor(sort_by: str, descending: bool, values) -> str:
+    """Непрозрачный cursor: base64(JSON) с ключом последней строки и параметрами сортировки"""
+    payload = {
+        "s": sort_by,
+        "d": descending,
+        "k": [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def _decode_posts_cursor(cursor: str, sort_by: str, descending: bool, key_count: int):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        values = list(payload["k"])
+        if payload["s"] != sort_by or payload["d"] != descending or len(values) != key_count:
+            raise ValueError("cursor выдан для другой сортировки")
+        if sort_by != "id":
+            values[0] = datetime.fromisoformat(values[0])
+        return values
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Некорректный cursor: {e}")
+
+def _apply_posts_keyset(query, key_columns, sort_by: str, descending: bool, cursor: Optional[str]):
+    """ORDER BY по ключу и условие (key) < / > (cursor) через сравнение row values"""
+    if cursor:
+        values = _decode_posts_cursor(cursor, sort_by, descending, len(key_columns))
+        row_key = tuple_(*key_columns)
+        cursor_key = tuple_(*[literal(value, column.type) for column, value in zip(key_columns, values)])
+        query = query.filter(row_key < cursor_key if descending else row_key > cursor_key)
+    return query.order_by(*[column.desc() if descending else column.asc() for column in key_columns])
+
+def _estimate_table_rows(db: Session, table_name: str) -> Optional[int]:
+    """Оценка числа строк таблицы из pg_class.reltuples (обновляется ANALYZE/autovacuum)"""
+    if not USE_POSTGRESQL:
+        return None
+    estimate = db.execute(
+        text("SELECT reltuples::BIGINT FROM pg_class WHERE oid = to_regclass(:table_name)"),
+        {"table_name": table_name}
+    ).scalar()
+    # reltuples = -1: таблица еще ни разу не анализировалась
+    return estimate if estimate is not None and estimate >= 0 else None
+
+def _estimate_query_rows(db: Session, query) -> Optional[int]:
+    """Оценка числа строк запроса планировщиком PostgreSQL (EXPLAIN без выполнения).
+    None - если оценку получить не удалось (вызывающий считает точно)."""
+    # render_postcompile раскрывает expanding IN (...) в отдельные параметры,
+    # иначе в SQL остается __[POSTCOMPILE_...], который драйвер не понимает
+    compiled = query.statement.compile(
+        dialect=db.get_bind().dialect,
+        compile_kwargs={"render_postcompile": True}
+    )
+    try:
+        # SAVEPOINT: ошибка EXPLAIN не должна abort'ить транзакцию запроса
+        with db.begin_nested():
+            plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось получить оценку EXPLAIN, используем точный COUNT: {e}")
+        return None
+
+def _count_posts_query(db: Session, query, count_mode: str, reltuples_table: Optional[str] = None):
+    """Общее количество для пагинации: (total_count, is_estimate).
+    exact - COUNT(*); none - без подсчета; estimated - reltuples для запроса без фильтров,
+    иначе точный COUNT до POSTS_EXACT_COUNT_LIMIT строк и оценка планировщика сверх него."""
+    if count_mode not in POSTS_COUNT_MODES:
+        raise HTTPException(status_code=400, detail=f"count_mode должен быть одним из: {', '.join(POSTS_COUNT_MODES)}")
+    if count_mode == "none":
+        return None, False
+    if count_mode == "exact" or not USE_POSTGRESQL:
+        return query.order_by(None).count(), False
+    
+    if reltuples_table:
+        estimate = _estimate_table_rows(db, reltuples_table)
+        if estimate is not None and estimate > POSTS_EXACT_COUNT_LIMIT:
+            return estimate, True
+    
+    capped_count = db.query(func.count()).select_from(
+        query.order_by(None).limit(POSTS_EXACT_COUNT_LIMIT + 1).subquery()
+    ).scalar()
+    if capped_count <= POSTS_EXACT_COUNT_LIMIT:
+        return capped_count, False
+    estimate = _estimate_query_rows(db, query.order_by(None))
+    if estimate is None:
+        return query.order_by(None).count(), False
+    return max(capped_count, estimate), True
+
+@app.get("/api/posts/cache", response_model=List[PostCacheResponse])
+def get_posts_cache(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,  # cursor режим: "" - первая страница, далее значение X-Next-Cursor
+    channel_telegram_id: Optional[int] = None,
+    processing_status: Optional[str] = None,
+    search: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    sort_by: str = "collected_at",
+    sort_order: str = "desc",
+    fast: bool = False,  # быстрый путь: orjson без response_model валидации
+    db: Session = Depends(get_db)
+):
+    """Получить список постов из cache с расширенной фильтрацией.
+    Offset режим (skip/limit) сохранен; при cursor следующий cursor отдается в заголовке X-Next-Cursor."""
+    from datetime import datetime
+    
+    query = db.query(PostCache)
+    if fast:
+        query = query.with_entities(*POSTS_CACHE_FAST_COLUMNS)
+    
+    # Фильтр по каналу
+    if channel_telegram_id:
+        query = query.filter(PostCache.channel_telegram_id == channel_telegram_id)
+    
+    # Фильтр по статусу обработки
+    if processing_status:
         query = query.filter(PostCache.processing_status == processing_status)
     
     # Поиск по содержимому
+    search_rank = None
     if search:
-        search_pattern = f"%{search}%"
-        query = query.filter(
-            PostCache.content.ilike(search_pattern) |
-            PostCache.title.ilike(search_pattern)
-        )
+        query, search_rank = _apply_posts_search(query, search)
     
     # Фильтр по дате
     if date_from:
@@ -2326,20 +3060,47 @@ def get_posts_cache(
         except ValueError:
             pass
     
-    # Сортировка
-    sort_column = getattr(PostCache, sort_by, PostCache.collected_at)
+    # 🚀 Cursor режим: keyset по (sort_column, id), limit + 1 строка для признака следующей страницы
+    if cursor is not None:
+        descending = sort_order.lower() == "desc"
+        key_columns = _posts_keyset_columns(sort_by)
+        query = _apply_posts_keyset(query, key_columns, sort_by, descending, cursor)
+        posts = query.limit(limit + 1).all()
+        if len(posts) > limit:
+            posts = posts[:limit]
+            last = posts[-1]
+            response.headers["X-Next-Cursor"] = _encode_posts_cursor(
+                sort_by, descending, [getattr(last, column.key) for column in key_columns]
+            )
+        if fast:
+            next_cursor = response.headers.get("X-Next-Cursor")
+            return FastJSONResponse(
+                _fast_rows(posts, POSTS_CACHE_JSON_FIELDS),
+                headers={"X-Next-Cursor": next_cursor} if next_cursor else None
+            )
+        return posts
+    
+    # Сортировка (relevance - по рангу полнотекстового поиска)
+    if sort_by == "relevance" and search_rank is not None:
+        sort_column = search_rank
+    else:
+        sort_column = getattr(PostCache, sort_by, PostCache.collected_at)
     if sort_order.lower() == "desc":
         query = query.order_by(sort_column.desc())
     else:
         query = query.order_by(sort_column.asc())
     
     posts = query.offset(skip).limit(limit).all()
+    if fast:
+        return FastJSONResponse(_fast_rows(posts, POSTS_CACHE_JSON_FIELDS))
     return posts
 
 @app.get("/api/posts/cache-with-ai")
 def get_posts_cache_with_ai(
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,  # cursor режим: "" - первая страница, далее next_cursor из ответа
+    count_mode: str = "exact",  # exact, estimated, none
     channel_telegram_id: Optional[int] = None,
     processing_status: Optional[str] = None,
     ai_status: Optional[str] = None,  # all, processed, unprocessed
@@ -2368,14 +3129,18 @@ def get_posts_cache_with_ai(
         PostCache.post_date,
         PostCache.collected_at,
         PostCache.userbot_metadata,
-        # AI результаты из processed_data (могут быть NULL)
-        ProcessedData.summaries.label('ai_summaries'),
-        ProcessedData.categories.label('ai_categories'),
-        ProcessedData.metrics.label('ai_metrics'),
+        # AI результаты из processed_data (могут быть NULL) - типизированные колонки, без разбора JSON
+        ProcessedData.summary_text.label('ai_summary'),
+        ProcessedData.category_name.label('ai_category'),
+        ProcessedData.importance.label('ai_importance'),
+        ProcessedData.urgency.label('ai_urgency'),
+        ProcessedData.significance.label('ai_significance'),
+        ProcessedData.digest_score.label('ai_digest_score'),
         ProcessedData.processed_at.label('ai_processed_at'),
         ProcessedData.processing_version.label('ai_processing_version'),
         ProcessedData.is_categorized.label('ai_is_categorized'),
-        ProcessedData.is_summarized.label('ai_is_summarized')
+        ProcessedData.is_summarized.label('ai_is_summarized'),
+        sql_func.coalesce(ProcessedData.id, 0).label('cursor_processed_id')
     ).outerjoin(
         ProcessedData, 
         PostCache.id == ProcessedData.post_id
@@ -2401,22 +3166,14 @@ def get_posts_cache_with_ai(
         query = query.filter(ProcessedData.id.is_(None))
     # ai_status == "all" - без дополнительного фильтра
     
-    # Фильтр по AI категории
+    # Фильтр по AI категории (индекс idx_processed_data_bot_category)
     if ai_category:
-        if USE_POSTGRESQL:
-            # PostgreSQL: фильтруем по JSONB полю categories
-            query = query.filter(ProcessedData.categories['category_name'].astext == ai_category)
-        else:
-            # SQLite: фильтруем через JSON_EXTRACT
-            query = query.filter(ProcessedData.categories.like(f'%"category_name": "{ai_category}"%'))
+        query = query.filter(ProcessedData.category_name == ai_category)
     
     # Поиск по содержимому
+    search_rank = None
     if search:
-        search_pattern = f"%{search}%"
-        query = query.filter(
-            PostCache.content.ilike(search_pattern) |
-            PostCache.title.ilike(search_pattern)
-        )
+        query, search_rank = _apply_posts_search(query, search)
     
     # Фильтр по дате
     if date_from:
@@ -2433,154 +3190,57 @@ def get_posts_cache_with_ai(
         except ValueError:
             pass
     
-    # Сортировка
-    if sort_by == "ai_processed_at":
-        sort_column = ProcessedData.processed_at
-    elif sort_by == "ai_importance":
-        # Извлекаем importance из JSONB поля metrics
-        if USE_POSTGRESQL:
-            sort_column = ProcessedData.metrics['importance'].astext.cast(Float)
-        else:
-            sort_column = PostCache.collected_at  # fallback для SQLite
-    else:
-        sort_column = getattr(PostCache, sort_by, PostCache.collected_at)
-    
-    if sort_order.lower() == "desc":
-        query = query.order_by(sort_column.desc())
-    else:
-        query = query.order_by(sort_column.asc())
-    
-    # Выполняем запрос
-    results = query.offset(skip).limit(limit).all()
-    
-    logger.info(f"📊 cache-with-ai: Найдено {len(results)} записей для bot_id={bot_id}")
-    
-    # ИСПРАВЛЕНО: отдельный count запрос для правильной пагинации
-    # Создаем count запрос с теми же фильтрами, но без offset/limit
-    count_query = db.query(PostCache.id).outerjoin(
-        ProcessedData, 
-        PostCache.id == ProcessedData.post_id
+    # Общее количество - по тем же фильтрам, до сортировки и пагинации
+    has_filters = any([bot_id, channel_telegram_id, ai_status in ("processed", "unprocessed"), ai_category, search, date_from, date_to])
+    total_count, total_count_estimated = _count_posts_query(
+        db,
+        query.with_entities(PostCache.id),
+        count_mode,
+        # Без фильтров (и без bot_id) строк не меньше, чем постов - оценка по posts_cache
+        reltuples_table=None if has_filters else "posts_cache"
     )
     
-    # Применяем те же фильтры что и к основному запросу
-    if bot_id:
-        count_query = count_query.filter(ProcessedData.public_bot_id == bot_id)
-    
-    if channel_telegram_id:
-        count_query = count_query.filter(PostCache.channel_telegram_id == channel_telegram_id)
-    
-    if ai_status == "processed":
-        count_query = count_query.filter(ProcessedData.id.isnot(None))
-    elif ai_status == "unprocessed":
-        count_query = count_query.filter(ProcessedData.id.is_(None))
-    
-    # Фильтр по AI категории в count запросе
-    if ai_category:
-        if USE_POSTGRESQL:
-            # PostgreSQL: фильтруем по JSONB полю categories
-            count_query = count_query.filter(ProcessedData.categories['category_name'].astext == ai_category)
+    next_cursor = None
+    if cursor is not None:
+        # 🚀 Cursor режим: без bot_id LEFT JOIN дает строку на каждый бот - ключ дополняется processed_data.id
+        descending = sort_order.lower() == "desc"
+        extra_columns = [] if bot_id else [sql_func.coalesce(ProcessedData.id, 0)]
+        key_columns = _posts_keyset_columns(sort_by, extra_columns)
+        query = _apply_posts_keyset(query, key_columns, sort_by, descending, cursor)
+        results = query.limit(limit + 1).all()
+        if len(results) > limit:
+            results = results[:limit]
+            last = results[-1]
+            key_values = [getattr(last, sort_by)] + ([] if sort_by == "id" else [last.id])
+            if extra_columns:
+                key_values.append(last.cursor_processed_id)
+            next_cursor = _encode_posts_cursor(sort_by, descending, key_values)
+    else:
+        # Сортировка
+        if sort_by == "relevance" and search_rank is not None:
+            sort_column = search_rank
+        elif sort_by == "ai_processed_at":
+            sort_column = ProcessedData.processed_at
+        elif sort_by == "ai_importance":
+            sort_column = ProcessedData.importance
+        elif sort_by == "ai_digest_score":
+            sort_column = ProcessedData.digest_score
         else:
-            # SQLite: фильтруем через JSON_EXTRACT
-            count_query = count_query.filter(ProcessedData.categories.like(f'%"category_name": "{ai_category}"%'))
-    
-    if search:
-        search_pattern = f"%{search}%"
-        count_query = count_query.filter(
-            PostCache.content.ilike(search_pattern) |
-            PostCache.title.ilike(search_pattern)
-        )
-    
-    if date_from:
-        try:
-            date_from_obj = datetime.fromisoformat(date_from.replace('Z', '+00:00'))
-            count_query = count_query.filter(PostCache.post_date >= date_from_obj)
-        except ValueError:
-            pass
-    
-    if date_to:
-        try:
-            date_to_obj = datetime.fromisoformat(date_to.replace('Z', '+00:00'))
-            count_query = count_query.filter(PostCache.post_date <= date_to_obj)
-        except ValueError:
-            pass
+            sort_column = getattr(PostCache, sort_by, PostCache.collected_at)
+        
+        if sort_order.lower() == "desc":
+            query = query.order_by(sort_column.desc())
+        else:
+            query = query.order_by(sort_column.asc())
+        
+        # Выполняем запрос
+        results = query.offset(skip).limit(limit).all()
     
-    # Получаем общее количество записей
-    total_count = count_query.count()
+    logger.info(f"📊 cache-with-ai: Найдено {len(results)} записей для bot_id={bot_id}")
     
     # Преобразуем результаты в удобный формат
     posts_with_ai = []
     for row in results:
-        # Парсим AI результаты из JSONB
-        ai_summary = None
-        ai_category = None
-        ai_importance = None
-        ai_urgency = None
-        ai_significance = None
-        
-        if row.ai_summaries:
-            try:
-                if USE_POSTGRESQL:
-                    summaries = row.ai_summaries if isinstance(row.ai_summaries, dict) else json.loads(row.ai_summaries)
-                else:
-                    summaries = json.loads(row.ai_summaries)
-                # Исправленный парсинг: сначала пробуем ru, потом старые форматы
-                ai_summary = summaries.get('ru') or summaries.get('summary') or summaries.get('text')
-            except (json.JSONDecodeError, AttributeError):
-                pass
-        
-        if row.ai_categories:
-            try:
-                if USE_POSTGRESQL:
-                    categories = row.ai_categories if isinstance(row.ai_categories, dict) else json.loads(row.ai_categories)
-                else:
-                    categories = json.loads(row.ai_categories)
-                # ИСПРАВЛЕНО: используем правильное поле category_name из реальной структуры БД
-                ai_category = categories.get('category_name') or categories.get('ru') or categories.get('primary') or categories.get('category')
-                # Дополнительная проверка для "Нерелевантно"
-                if not ai_category and categories.get('category_name') == 'Нерелевантно':
-                    ai_category = 'Нерелевантно'
-                # НОВОЕ: обрабатываем строку "None" как null
-                if ai_category == 'None':
-                    ai_category = None
-            except (json.JSONDecodeError, AttributeError) as e:
-                # УЛУЧШЕНО: логируем ошибку и пытаемся извлечь данные как строку
-                print(f"DEBUG: Ошибка парсинга ai_categories для post {row.id}: {e}")
-                print(f"DEBUG: raw ai_categories: {row.ai_categories}")
-                # Попытка извлечь category_name из строки
-                if isinstance(row.ai_categories, str) and 'category_name' in row.ai_categories:
-                    try:
-                        import re
-                        match = re.search(r'"category_name":\s*"([^"]+)"', row.ai_categories)
-                        if match:
-                            ai_category = match.group(1)
-                    except Exception:
-                        pass
-        
-        if row.ai_metrics:
-            try:
-                if USE_POSTGRESQL:
-                    metrics = row.ai_metrics if isinstance(row.ai_metrics, dict) else json.loads(row.ai_metrics)
-                else:
-                    metrics = json.loads(row.ai_metrics)
-                ai_importance = metrics.get('importance')
-                ai_urgency = metrics.get('urgency')
-                ai_significance = metrics.get('significance')
-            except (json.JSONDecodeError, AttributeError):
-                pass
-        
-        # ДОПОЛНИТЕЛЬНО: если метрики не найдены в metrics, попробуем взять из categories
-        if not ai_importance and row.ai_categories:
-            try:
-                if USE_POSTGRESQL:
-                    categories = row.ai_categories if isinstance(row.ai_categories, dict) else json.loads(row.ai_categories)
-                else:
-                    categories = json.loads(row.ai_categories)
-                ai_importance = categories.get('importance')
-                ai_urgency = categories.get('urgency')
-                ai_significance = categories.get('significance')
-            except (json.JSONDecodeError, AttributeError):
-                pass
-        
         post_data = {
             "id": row.id,
             "channel_telegram_id": row.channel_telegram_id,
@@ -2594,11 +3254,12 @@ def get_posts_cache_with_ai(
             "userbot_metadata": row.userbot_metadata if USE_POSTGRESQL else (json.loads(row.userbot_metadata) if row.userbot_metadata else {}),
             # УБРАНО: "processing_status": row.processing_status,  # Заменено мультитенантными статусами
             # AI результаты
-            "ai_summary": ai_summary,
-            "ai_category": ai_category,
-            "ai_importance": ai_importance,
-            "ai_urgency": ai_urgency,
-            "ai_significance": ai_significance,
+            "ai_summary": row.ai_summary,
+            "ai_category": row.ai_category,
+            "ai_importance": row.ai_importance,
+            "ai_urgency": row.ai_urgency,
+            "ai_significance": row.ai_significance,
+            "ai_digest_score": row.ai_digest_score,
             "ai_processed_at": row.ai_processed_at,
             "ai_processing_version": row.ai_processing_version,
             "ai_is_categorized": row.ai_is_categorized,
@@ -2608,7 +3269,9 @@ def get_posts_cache_with_ai(
     
     return {
         "posts": posts_with_ai,
-        "total_count": total_count,  # ИСПРАВЛЕНО: правильный count запрос для пагинации
+        "total_count": total_count,  # None при count_mode=none
+        "total_count_estimated": total_count_estimated,
+        "next_cursor": next_cursor,  # только в cursor режиме; None - последняя страница
         "has_ai_results": any(post["ai_summary"] is not None for post in posts_with_ai)
     }
 
@@ -2684,6 +3347,7 @@ def get_posts_cache_count(
     search: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
+    count_mode: str = "exact",  # exact, estimated, none
     db: Session = Depends(get_db)
 ):
     """Получить количество постов с фильтрацией (для пагинации)"""
@@ -2698,11 +3362,7 @@ def get_posts_cache_count(
         query = query.filter(PostCache.processing_status == processing_status)
     
     if search:
-        search_pattern = f"%{search}%"
-        query = query.filter(
-            PostCache.content.ilike(search_pattern) |
-            PostCache.title.ilike(search_pattern)
-        )
+        query, _ = _apply_posts_search(query, search)
     
     if date_from:
         try:
@@ -2718,8 +3378,11 @@ def get_posts_cache_count(
         except ValueError:
             pass
     
-    total_count = query.count()
-    return {"total_count": total_count}
+    has_filters = any([channel_telegram_id, processing_status, search, date_from, date_to])
+    total_count, total_count_estimated = _count_posts_query(
+        db, query, count_mode, reltuples_table=None if has_filters else "posts_cache"
+    )
+    return {"total_count": total_count, "total_count_estimated": total_count_estimated}
 
 @app.get("/api/posts/cache/size")
 def get_posts_cache_size(
@@ -2929,6 +3592,7 @@ def bulk_delete_posts(
             ).delete(synchronize_session=False)
             
             db.commit()
+            _invalidate_digest_cache()
             
             logger.info(f"✅ Bulk delete завершен: {deleted_posts} постов, {deleted_processed_data} processed_data, {deleted_service_results} service_results")
             
@@ -2995,6 +3659,7 @@ def delete_post_by_id(post_id: int, db: Session = Depends(get_db)):
         db.query(PostCache).filter(PostCache.id == post_id).delete()
         
         db.commit()
+        _invalidate_digest_cache()
         
         logger.info(f"✅ Удален пост {post_id} с {processed_data_count} AI результатами и {service_results_count} сервисными записями")
         
@@ -3042,6 +3707,7 @@ def clear_database(
         # db.execute(text("TRUNCATE TABLE channel_categories"))
         
         db.commit()
+        _invalidate_digest_cache()
         
         return {
             "message": "База данных успешно очищена",
@@ -3100,6 +3766,7 @@ def cleanup_orphan_posts(
         # Удаляем orphan посты
         deleted_count = orphan_posts_query.delete(synchronize_session=False)
         db.commit()
+        _invalidate_digest_cache()
         
         return {
             "message": f"Успешно удалено {deleted_count} orphan постов",
@@ -3168,6 +3835,7 @@ def bulk_delete_ai_results(
         # ✅ posts_cache НЕ ТРОГАЕМ - посты остаются в системе!
         
         db.commit()
+        _invalidate_digest_cache()
         
         logger.info(f"✅ Удалены только AI результаты: {deleted_processed_data} processed_data, {deleted_service_results} service_results. Посты сохранены!")
         
@@ -3314,6 +3982,147 @@ def get_userbot_status(db: Session = Depends(get_db)):
 
 # ==================== PUBLIC BOTS API ====================
 
+# 🗺️ ТОПОЛОГИЯ БОТОВ: боты → активные каналы (telegram_id, вес) → категории (вес).
+# Снимок кэшируется в процессе и сбрасывается при изменениях ботов/каналов/категорий
+# и через /api/webhooks/bot-changed; TTL - страховка для изменений из других процессов.
+BOT_TOPOLOGY_TTL_SECONDS = int(os.getenv("BOT_TOPOLOGY_TTL_SECONDS", "300"))
+BOT_TOPOLOGY_ACTIVE_STATUSES = ('active', 'development')
+_bot_topology_lock = threading.Lock()
+_bot_topology_version = 0
+_bot_topology_cache: Optional[Dict[str, Any]] = None  # {"version", "etag", "built_at", "snapshot"}
+
+def _invalidate_bot_topology():
+    """Сбросить снимок топологии - следующий запрос соберет новый с новой версией"""
+    global _bot_topology_version, _bot_topology_cache
+    with _bot_topology_lock:
+        _bot_topology_version += 1
+        _bot_topology_cache = None
+
+def _build_bot_topology(db: Session) -> List[Dict[str, Any]]:
+    """Три запроса на всю топологию вместо BotChannel → Channel запросов на каждый бот"""
+    bots = {
+        bot.id: {
+            "id": bot.id,
+            "name": bot.name,
+            "status": bot.status,
+            "max_posts_per_digest": bot.max_posts_per_digest,
+            # Параметры AI обработки - оркестратор берет ботов из топологии
+            "default_language": bot.default_language,
+            "max_summary_length": bot.max_summary_length,
+            "categorization_prompt": bot.categorization_prompt,
+            "summarization_prompt": bot.summarization_prompt,
+            "channels": [],
+            "categories": []
+        }
+        for bot in db.query(
+            PublicBot.id, PublicBot.name, PublicBot.status, PublicBot.max_posts_per_digest,
+            PublicBot.default_language, PublicBot.max_summary_length,
+            PublicBot.categorization_prompt, PublicBot.summarization_prompt
+        ).order_by(PublicBot.id).all()
+    }
+
+    channel_rows = db.query(
+        BotChannel.public_bot_id, BotChannel.weight,
+        Channel.id, Channel.telegram_id, Channel.channel_name, Channel.username, Channel.title, Channel.is_active
+    ).join(
+        Channel, Channel.id == BotChannel.channel_id
+    ).filter(
+        BotChannel.is_active == True
+    ).order_by(BotChannel.public_bot_id, Channel.id).all()
+    for row in channel_rows:
+        if row.public_bot_id in bots:
+            bots[row.public_bot_id]["channels"].append({
+                "id": row.id,
+                "telegram_id": row.telegram_id,
+                "channel_name": row.channel_name,
+                "username": row.username,
+                "title": row.title,
+                "is_active": row.is_active,
+                "weight": row.weight
+            })
+
+    category_rows = db.query(
+        BotCategory.public_bot_id, BotCategory.weight,
+        Category.id, Category.name, Category.description, Category.emoji
+    ).join(
+        Category, Category.id == BotCategory.category_id
+    ).filter(
+        BotCategory.is_active == True,
+        Category.is_active == True
+    ).order_by(BotCategory.public_bot_id, BotCategory.weight.desc(), Category.id).all()
+    for row in category_rows:
+        if row.public_bot_id in bots:
+            bots[row.public_bot_id]["categories"].append({
+                "id": row.id,
+                "name": row.name,
+                "category_name": row.name,  # alias как в /api/public-bots/{bot_id}/categories
+                "description": row.description,
+                "emoji": row.emoji,
+                "weight": row.weight,
+                "priority": row.weight
+            })
+
+    return list(bots.values())
+
+def _cached_bot_topology() -> Optional[Dict[str, Any]]:
+    """Свежий снимок топологии из кэша процесса или None (без обращения к БД)"""
+    with _bot_topology_lock:
+        cached = _bot_topology_cache
+    if cached is not None and time.monotonic() - cached["built_at"] < BOT_TOPOLOGY_TTL_SECONDS:
+        return cached
+    return None
+
+def _get_bot_topology(db: Session) -> Dict[str, Any]:
+    """Снимок топологии из кэша процесса (собирается при промахе или по истечении TTL)"""
+    global _bot_topology_cache
+    with _bot_topology_lock:
+        cached = _bot_topology_cache
+        version = _bot_topology_version
+    if cached is not None and time.monotonic() - cached["built_at"] < BOT_TOPOLOGY_TTL_SECONDS:
+        return cached
+
+    bots = _build_bot_topology(db)
+    body = json.dumps(bots, ensure_ascii=False, sort_keys=True, default=str)
+    topology = {
+        "version": version,
+        # ETag по содержимому: пересборка по TTL без изменений не заставляет клиентов перечитывать снимок
+        "etag": f'W/"{hashlib.sha1(body.encode("utf-8")).hexdigest()[:20]}"',
+        "built_at": time.monotonic(),
+        "snapshot": {"version": version, "generated_at": datetime.utcnow().isoformat(), "bots": bots}
+    }
+    with _bot_topology_lock:
+        # Пока собирали, топологию могли изменить - такой снимок не кэшируем
+        if _bot_topology_version == version:
+            _bot_topology_cache = topology
+    return topology
+
+def _topology_active_bots(topology: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Боты со статусом active/development"""
+    return [bot for bot in topology["snapshot"]["bots"] if bot["status"] in BOT_TOPOLOGY_ACTIVE_STATUSES]
+
+def _topology_channel_telegram_ids(topology: Dict[str, Any], bot_ids, active_channels_only: bool = False) -> List[int]:
+    """telegram_id каналов, назначенных ботам (без повторов, в порядке топологии)"""
+    bot_ids = set(bot_ids)
+    telegram_ids = {}
+    for bot in topology["snapshot"]["bots"]:
+        if bot["id"] not in bot_ids:
+            continue
+        for channel in bot["channels"]:
+            if channel["is_active"] or not active_channels_only:
+                telegram_ids[channel["telegram_id"]] = True
+    return list(telegram_ids)
+
+@app.get("/api/bot-topology")
+async def get_bot_topology(request: Request):
+    """Версионированный снимок топологии ботов с ETag (If-None-Match → 304 без тела)"""
+    # Частый опрос оркестратором: свежий кэш отдаем без сессии, пересборка - через async пул
+    topology = _cached_bot_topology() or await _run_db(_get_bot_topology)
+    headers = {"ETag": topology["etag"], "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if topology["etag"] in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=topology["snapshot"], headers=headers)
+
 @app.get("/api/public-bots", response_model=List[PublicBotResponse])
 def get_public_bots(
     skip: int = 0,
@@ -3391,6 +4200,7 @@ def create_public_bot(bot: PublicBotCreate, db: Session = Depends(get_db)):
         db_bot = PublicBot(**bot_data)
         db.add(db_bot)
         db.commit()
+        _invalidate_bot_topology()
         db.refresh(db_bot)
         
         return db_bot
@@ -3595,6 +4405,7 @@ def update_public_bot(bot_id: int, bot_update: PublicBotUpdate, db: Session = De
             setattr(db_bot, field, value)
         
         db.commit()
+        _invalidate_bot_topology()
         db.refresh(db_bot)
         
         return db_bot
@@ -3622,6 +4433,7 @@ def delete_public_bot(bot_id: int, db: Session = Depends(get_db)):
         bot_name = db_bot.name
         db.delete(db_bot)
         db.commit()
+        _invalidate_bot_topology()
         
         return {
             "message": f"Бот '{bot_name}' успешно удален",
@@ -3661,6 +4473,7 @@ def toggle_bot_status(bot_id: int, db: Session = Depends(get_db)):
             db_bot.status = "active"
         
         db.commit()
+        _invalidate_bot_topology()
         db.refresh(db_bot)
         
         return {
@@ -3708,6 +4521,7 @@ def set_bot_status(bot_id: int, request: dict, db: Session = Depends(get_db)):
         db_bot.status = new_status
         
         db.commit()
+        _invalidate_bot_topology()
         db.refresh(db_bot)
         
         return {
@@ -3804,8 +4618,10 @@ def add_channels_to_bot(
         BotChannel.is_active == True
     ).count()
     bot.channels_count = channels_count
+    _refresh_digest_scores(db, [bot_id])
     
     db.commit()
+    _invalidate_bot_topology()
     return {"message": f"Added {added_count} channels to bot {bot_id}", "channel_ids": channel_ids}
 
 @app.delete("/api/public-bots/{bot_id}/channels/{channel_id}")
@@ -3839,8 +4655,10 @@ def remove_channel_from_bot(bot_id: int, channel_id: int, db: Session = Depends(
         BotChannel.is_active == True
     ).count()
     bot.channels_count = channels_count
+    _refresh_digest_scores(db, [bot_id])
     
     db.commit()
+    _invalidate_bot_topology()
     return {"message": f"Removed channel {channel_id} from bot {bot_id}"}
 
 # Endpoints для связей Public Bot ↔ Categories
@@ -3855,72 +4673,46 @@ def get_bot_digest_data(
     Получить AI-обработанные посты для дайджеста конкретного бота
     """
     try:
-        # Получаем каналы бота
-        bot_channels = db.query(BotChannel).filter(
-            BotChannel.public_bot_id == bot_id,
-            BotChannel.is_active == True
-        ).all()
+        # telegram_id активных каналов бота из снимка топологии
+        channel_telegram_ids = _topology_channel_telegram_ids(_get_bot_topology(db), [bot_id], active_channels_only=True)
         
-        if not bot_channels:
+        if not channel_telegram_ids:
             return {"posts": [], "total": 0, "bot_id": bot_id}
         
-        channel_ids = [bc.channel_id for bc in bot_channels]
-        
-        # Получаем telegram_id каналов
-        channels = db.query(Channel).filter(
-            Channel.id.in_(channel_ids),
-            Channel.is_active == True
-        ).all()
-        
-        channel_telegram_ids = [ch.telegram_id for ch in channels]
-        
-        # Основной запрос постов с AI результатами
+        # Основной запрос постов с AI результатами: от processed_data бота к постам,
+        # чтобы top-N шел обратным проходом по idx_processed_data_bot_digest_score
         query = db.query(
             PostCache,
-            ProcessedData.summaries,
-            ProcessedData.categories,
-            ProcessedData.metrics,
-            ProcessedData.processed_at
-        ).outerjoin(
-            ProcessedData,
-            and_(
-                PostCache.id == ProcessedData.post_id,
-                ProcessedData.public_bot_id == bot_id
-            )
+            ProcessedData.summary_text,
+            ProcessedData.category_name,
+            ProcessedData.importance,
+            ProcessedData.urgency,
+            ProcessedData.significance,
+            ProcessedData.processed_at,
+            ProcessedData.digest_score
+        ).select_from(ProcessedData).join(
+            PostCache,
+            PostCache.id == ProcessedData.post_id
         ).filter(
+            ProcessedData.public_bot_id == bot_id,
             PostCache.channel_telegram_id.in_(channel_telegram_ids),
             ProcessedData.processing_status.in_(['completed', 'categorized', 'summarized']),  # Более мягкие фильтры
             ProcessedData.is_categorized == True  # Хотя бы категоризировано
         )
         
-        # Фильтр по важности
+        # Фильтр по важности (типизированная колонка, NULL = 0)
         if importance_min is not None:
-            # Извлекаем importance из JSON metrics с защитой от NULL
-            query = query.filter(
-                text(f"COALESCE(CAST(processed_data.metrics->>'importance' AS FLOAT), 0) >= {importance_min}")
-            )
+            query = query.filter(func.coalesce(ProcessedData.importance, 0) >= importance_min)
         
-        # Сортировка по важности (умная сортировка) - только если есть данные
-        query = query.order_by(
-            text("COALESCE(CAST(processed_data.metrics->>'importance' AS FLOAT), 0) * 3 + COALESCE(CAST(processed_data.metrics->>'urgency' AS FLOAT), 0) * 2 + COALESCE(CAST(processed_data.metrics->>'significance' AS FLOAT), 0) * 2 DESC")
-        )
+        # Сортировка по предрасчитанному рангу (метрики × веса канала и категории бота)
+        query = query.order_by(ProcessedData.digest_score.desc())
         
         # Применяем лимит
         results = query.limit(limit).all()
         
         # Формируем ответ
         posts = []
-        for post_cache, summaries, categories, metrics, processed_at in results:
-            # Парсим JSON поля
-            try:
-                summaries_data = json.loads(summaries) if summaries else {}
-                categories_data = json.loads(categories) if categories else {}
-                metrics_data = json.loads(metrics) if metrics else {}
-            except:
-                summaries_data = {}
-                categories_data = {}
-                metrics_data = {}
-            
+        for post_cache, summary_text, category_name, importance, urgency, significance, processed_at, digest_score in results:
             post_data = {
                 "id": post_cache.id,
                 "channel_telegram_id": post_cache.channel_telegram_id,
@@ -3932,17 +4724,18 @@ def get_bot_digest_data(
                 "collected_at": post_cache.collected_at.isoformat(),
                 
                 # AI результаты
-                "ai_summary": summaries_data.get('summary', ''),
-                "ai_category": categories_data.get('primary_category', ''),
-                "importance": metrics_data.get('importance', 0),
-                "urgency": metrics_data.get('urgency', 0),
-                "significance": metrics_data.get('significance', 0),
+                "ai_summary": summary_text or '',
+                "ai_category": category_name or '',
+                "importance": importance or 0,
+                "urgency": urgency or 0,
+                "significance": significance or 0,
+                "digest_score": digest_score,
                 "ai_processed_at": processed_at.isoformat() if processed_at else None,
                 
                 # Дополнительные поля
-                "category": categories_data.get('primary_category', ''),
-                "summary": summaries_data.get('summary', ''),
-                "media_urls": json.loads(post_cache.media_urls) if post_cache.media_urls else []
+                "category": category_name or '',
+                "summary": summary_text or '',
+                "media_urls": post_cache.media_urls if USE_POSTGRESQL else (json.loads(post_cache.media_urls) if post_cache.media_urls else [])
             }
             
             posts.append(post_data)
@@ -4061,8 +4854,10 @@ def add_categories_to_bot(
         BotCategory.is_active == True
     ).count()
     bot.topics_count = categories_count
+    _refresh_digest_scores(db, [bot_id])
     
     db.commit()
+    _invalidate_bot_topology()
     return {
         "message": f"Added {added_count} categories to bot {bot_id}", 
         "category_ids": category_ids,
@@ -4100,8 +4895,10 @@ def remove_category_from_bot(bot_id: int, category_id: int, db: Session = Depend
         BotCategory.is_active == True
     ).count()
     bot.topics_count = categories_count
+    _refresh_digest_scores(db, [bot_id])
     
     db.commit()
+    _invalidate_bot_topology()
     return {"message": f"Removed category {category_id} from bot {bot_id}"}
 
 @app.put("/api/public-bots/{bot_id}/categories/{category_id}/priority")
@@ -4137,8 +4934,10 @@ def update_category_priority(
     
     # Обновляем приоритет
     bot_category.weight = float(priority)
+    _refresh_digest_scores(db, [bot_id])
     
     db.commit()
+    _invalidate_bot_topology()
     return {"message": f"Updated priority for category {category_id} in bot {bot_id} to {priority}"}
 
 # Bot Templates API Endpoints
@@ -4312,6 +5111,7 @@ def apply_template_to_bot(bot_id: int, db: Session = Depends(get_db)):
     
     db.commit()
     db.refresh(bot)
+    _invalidate_bot_topology()
     
     return {
         "message": f"Шаблон применен к боту '{bot.name}'",
@@ -4321,6 +5121,31 @@ def apply_template_to_bot(bot_id: int, db: Session = Depends(get_db)):
     }
 
 # === AI PROCESSED DATA MODEL ===
+# Типизированные AI колонки processed_data генерирует сама БД из JSON полей, поэтому любой путь
+# записи (ORM, batch upsert, set-based агрегация результатов сервисов) поддерживает их автоматически.
+# Ключи-синонимы - исторические форматы categories/summaries. См. migrations/007_processed_data_typed_ai_columns.sql
+def _ai_json_text_sql(column: str, keys) -> str:
+    if USE_POSTGRESQL:
+        return "COALESCE(" + ", ".join(f"NULLIF({column}->>'{key}', '')" for key in keys) + ")"
+    values = ", ".join(f"NULLIF(json_extract({column}, '$.{key}'), '')" for key in keys)
+    return f"CASE WHEN json_valid({column}) THEN COALESCE({values}) END"
+
+def _ai_json_number_sql(column: str, key: str) -> str:
+    """Числовая метрика; нечисловые значения -> NULL (без ошибки приведения типа)"""
+    if USE_POSTGRESQL:
+        return f"CASE jsonb_typeof({column}->'{key}') WHEN 'number' THEN CAST({column}->>'{key}' AS DOUBLE PRECISION) END"
+    return f"CASE WHEN json_valid({column}) AND json_type({column}, '$.{key}') IN ('integer', 'real') THEN json_extract({column}, '$.{key}') END"
+
+AI_TYPED_COLUMNS_SQL = {
+    "category_name": "NULLIF(" + _ai_json_text_sql("categories", ("category_name", "ru", "primary", "primary_category", "category")) + ", 'None')",
+    "summary_text": _ai_json_text_sql("summaries", ("ru", "summary", "text")),
+    # Метрики из metrics, для старых записей - из categories
+    **{
+        metric: f"COALESCE({_ai_json_number_sql('metrics', metric)}, {_ai_json_number_sql('categories', metric)})"
+        for metric in ("importance", "urgency", "significance")
+    },
+}
+
 class ProcessedData(Base):
     __tablename__ = "processed_data"
     id = Column(Integer, primary_key=True, index=True)
@@ -4334,7 +5159,23 @@ class ProcessedData(Base):
     processing_status = Column(String, default="pending", nullable=False)  # Итоговый агрегированный статус
     is_categorized = Column(Boolean, default=False, nullable=False)
     is_summarized = Column(Boolean, default=False, nullable=False)
-    __table_args__ = (UniqueConstraint('post_id', 'public_bot_id', name='uq_processed_post_bot'),)
+    # Типизированные AI поля (генерируются из summaries/categories/metrics)
+    category_name = Column(Text, Computed(AI_TYPED_COLUMNS_SQL["category_name"], persisted=True))
+    summary_text = Column(Text, Computed(AI_TYPED_COLUMNS_SQL["summary_text"], persisted=True))
+    importance = Column(Float, Computed(AI_TYPED_COLUMNS_SQL["importance"], persisted=True))
+    urgency = Column(Float, Computed(AI_TYPED_COLUMNS_SQL["urgency"], persisted=True))
+    significance = Column(Float, Computed(AI_TYPED_COLUMNS_SQL["significance"], persisted=True))
+    # Ранг поста в дайджесте бота с учетом весов канала и категории (см. _refresh_digest_scores)
+    digest_score = Column(Float, nullable=False, default=0.0, server_default="0")
+    __table_args__ = (
+        UniqueConstraint('post_id', 'public_bot_id', name='uq_processed_post_bot'),
+        Index('idx_processed_data_bot_category', 'public_bot_id', 'category_name'),
+        Index('idx_processed_data_bot_importance', 'public_bot_id', 'importance'),
+        # Delta дайджесты: посты бота, обработанные после водяного знака
+        Index('idx_processed_data_bot_processed_at', 'public_bot_id', 'processed_at'),
+        # Top-N дайджеста: обратный проход по индексу внутри бота
+        Index('idx_processed_data_bot_digest_score', 'public_bot_id', 'digest_score'),
+    )
 
 # НОВАЯ ТАБЛИЦА ДЛЯ РАСШИРЯЕМЫХ РЕЗУЛЬТАТОВ СЕРВИСОВ
 class ProcessedServiceResult(Base):
@@ -4354,6 +5195,42 @@ class ProcessedServiceResult(Base):
         Index('idx_psr_post_bot_service', 'post_id', 'public_bot_id', 'service_name'),
     )
 
+# ОЧЕРЕДЬ РАБОТЫ AI: аренда (lease) поста воркером на время обработки
+class AIWorkLease(Base):
+    __tablename__ = "ai_work_leases"
+
+    id = Column(Integer, primary_key=True, index=True)
+    post_id = Column(BigInteger, nullable=False)
+    public_bot_id = Column(Integer, nullable=False)
+    service_name = Column(String(64), nullable=False)
+    worker_id = Column(String(255), nullable=False)
+    leased_at = Column(DateTime, nullable=False, default=func.now())
+    lease_expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('post_id', 'public_bot_id', 'service_name', name='uq_ai_work_lease_post_bot_service'),
+        Index('idx_ai_work_leases_bot_service_expires', 'public_bot_id', 'service_name', 'lease_expires_at'),
+    )
+
+# СЧЕТЧИКИ СТАТУСОВ AI ПО БОТАМ: поддерживаются триггерами на processed_data
+# counter_name: 'total', 'status:<processing_status>', 'flag:is_categorized', 'flag:is_summarized'
+class AIStatusCounter(Base):
+    __tablename__ = "ai_status_counters"
+
+    public_bot_id = Column(Integer, primary_key=True)
+    counter_name = Column(String(64), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+# ВОДЯНОЙ ЗНАК ДОСТАВКИ ДАЙДЖЕСТА: до какого processed_at посты бота уже доставлены пользователю
+class DigestDeliveryWatermark(Base):
+    __tablename__ = "digest_delivery_watermarks"
+
+    public_bot_id = Column(Integer, primary_key=True)
+    user_telegram_id = Column(BigInteger, primary_key=True)
+    # TIMESTAMPTZ как processed_data.processed_at (001) - водяной знак сравнивается с ним
+    delivered_until = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
 # Создание таблиц БД - выполняется в конце после всех определений
 print("🔧 Создание таблиц в базе данных...")
 try:
@@ -4362,6 +5239,282 @@ try:
 except Exception as e:
     print(f"❌ Ошибка создания таблиц: {e}")
 
+# create_all не добавляет ограничения в уже существующие таблицы - догоняем уникальный индекс posts_cache
+# (для PostgreSQL см. database/migrations/002_posts_cache_unique_message.sql)
+try:
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_posts_cache_channel_message "
+            "ON posts_cache (channel_telegram_id, telegram_message_id)"
+        ))
+except Exception as e:
+    print(f"⚠️ Не удалось создать уникальный индекс posts_cache (есть дубликаты?): {e}")
+
+# Индексы keyset пагинации (для PostgreSQL см. database/migrations/005_posts_cache_keyset_indexes.sql)
+try:
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_posts_cache_collected_at_id ON posts_cache (collected_at, id)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_posts_cache_post_date_id ON posts_cache (post_date, id)"))
+except Exception as e:
+    print(f"⚠️ Не удалось создать индексы keyset пагинации posts_cache: {e}")
+
+# Полнотекстовый поиск posts_cache (для PostgreSQL см. database/migrations/006_posts_cache_fulltext_search.sql)
+POSTS_SEARCH_SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS posts_cache_fts USING fts5(
+        title, content, content='posts_cache', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_cache_fts_insert AFTER INSERT ON posts_cache BEGIN
+        INSERT INTO posts_cache_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_cache_fts_delete AFTER DELETE ON posts_cache BEGIN
+        INSERT INTO posts_cache_fts (posts_cache_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_cache_fts_update AFTER UPDATE OF title, content ON posts_cache BEGIN
+        INSERT INTO posts_cache_fts (posts_cache_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO posts_cache_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+try:
+    with engine.begin() as conn:
+        if USE_POSTGRESQL:
+            # DDL только в миграции 006 - при старте лишь проверяем, применена ли она
+            POSTS_SEARCH_VECTOR_AVAILABLE = conn.exec_driver_sql(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'posts_cache' AND column_name = 'search_vector'"
+            ).scalar() is not None
+            if not POSTS_SEARCH_VECTOR_AVAILABLE:
+                print("⚠️ Колонка posts_cache.search_vector не найдена - примените миграцию 006_posts_cache_fulltext_search.sql")
+        else:
+            fts_exists = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'posts_cache_fts'"
+            ).scalar()
+            for statement in POSTS_SEARCH_SQLITE_DDL:
+                conn.exec_driver_sql(statement)
+            if not fts_exists:
+                # Индексируем посты, сохраненные до появления FTS таблицы
+                conn.exec_driver_sql("INSERT INTO posts_cache_fts (posts_cache_fts) VALUES ('rebuild')")
+except Exception as e:
+    print(f"⚠️ Не удалось создать полнотекстовый индекс posts_cache: {e}")
+
+# create_all не добавляет колонки в существующую processed_data - для SQLite догоняем типизированные
+# AI колонки при старте. SQLite позволяет добавить через ALTER TABLE только VIRTUAL генерируемые колонки
+# (индексы на них работают). PostgreSQL: database/migrations/007_processed_data_typed_ai_columns.sql
+def _digest_scores_update(bot_ids=None, post_ids=None):
+    """UPDATE processed_data.digest_score одним запросом.
+    digest_score = (importance*3 + urgency*2 + significance*2) * вес канала в боте * вес категории в боте.
+    Нет связи бот-канал/бот-категория - вес 1.0."""
+    channel_weight = select(func.max(BotChannel.weight)).select_from(BotChannel).join(
+        Channel, Channel.id == BotChannel.channel_id
+    ).join(
+        PostCache, PostCache.channel_telegram_id == Channel.telegram_id
+    ).where(
+        PostCache.id == ProcessedData.post_id,
+        BotChannel.public_bot_id == ProcessedData.public_bot_id
+    ).scalar_subquery()
+    category_weight = select(func.max(BotCategory.weight)).select_from(BotCategory).join(
+        Category, Category.id == BotCategory.category_id
+    ).where(
+        BotCategory.public_bot_id == ProcessedData.public_bot_id,
+        func.lower(Category.name) == func.lower(ProcessedData.category_name)
+    ).scalar_subquery()
+    base_score = (
+        func.coalesce(ProcessedData.importance, 0) * 3 +
+        func.coalesce(ProcessedData.urgency, 0) * 2 +
+        func.coalesce(ProcessedData.significance, 0) * 2
+    )
+    stmt = update(ProcessedData).values(
+        digest_score=base_score * func.coalesce(channel_weight, 1.0) * func.coalesce(category_weight, 1.0)
+    )
+    if bot_ids is not None:
+        stmt = stmt.where(ProcessedData.public_bot_id.in_(sorted(set(bot_ids))))
+    if post_ids is not None:
+        stmt = stmt.where(ProcessedData.post_id.in_(sorted(set(post_ids))))
+    return stmt
+
+def _refresh_digest_scores(db: Session, bot_ids=None, post_ids=None):
+    """Пересчитать digest_score в текущей транзакции (после записи AI результатов или смены весов)"""
+    if bot_ids is not None and not bot_ids:
+        return
+    db.flush()
+    db.execute(_digest_scores_update(bot_ids, post_ids))
+
+AI_TYPED_COLUMN_TYPES = {
+    "category_name": "TEXT",
+    "summary_text": "TEXT",
+    "importance": "DOUBLE PRECISION" if USE_POSTGRESQL else "REAL",
+    "urgency": "DOUBLE PRECISION" if USE_POSTGRESQL else "REAL",
+    "significance": "DOUBLE PRECISION" if USE_POSTGRESQL else "REAL",
+}
+
+try:
+    with engine.begin() as conn:
+        if USE_POSTGRESQL:
+            # STORED колонки добавляет только миграция 007 (одним ALTER TABLE - одна перезапись
+            # таблицы); при старте лишь проверяем, что она применена
+            existing_columns = {row[0] for row in conn.exec_driver_sql(
+                "SELECT column_name FROM information_schema.columns WHERE table_name = 'processed_data'"
+            )}
+            missing_columns = [name for name in AI_TYPED_COLUMN_TYPES if name not in existing_columns]
+            if missing_columns:
+                raise RuntimeError(
+                    f"нет колонок {', '.join(missing_columns)} - примените миграцию 007_processed_data_typed_ai_columns.sql"
+                )
+        else:
+            existing_columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_xinfo(processed_data)")}
+            for column_name, column_type in AI_TYPED_COLUMN_TYPES.items():
+                if column_name not in existing_columns:
+                    conn.exec_driver_sql(
+                        f"ALTER TABLE processed_data ADD COLUMN {column_name} {column_type} "
+                        f"GENERATED ALWAYS AS ({AI_TYPED_COLUMNS_SQL[column_name]}) VIRTUAL"
+                    )
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS idx_processed_data_bot_category ON processed_data (public_bot_id, category_name)"
+        )
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS idx_processed_data_bot_importance ON processed_data (public_bot_id, importance)"
+        )
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS idx_processed_data_bot_processed_at ON processed_data (public_bot_id, processed_at)"
+        )
+except Exception as e:
+    print(f"⚠️ Не удалось добавить типизированные AI колонки processed_data: {e}")
+
+# digest_score: колонка для баз, созданных до ее появления (PostgreSQL: database/migrations/009_processed_data_digest_score.sql)
+try:
+    with engine.begin() as conn:
+        if USE_POSTGRESQL:
+            score_column_missing = conn.exec_driver_sql(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'processed_data' AND column_name = 'digest_score'"
+            ).first() is None
+        else:
+            score_column_missing = "digest_score" not in {
+                row[1] for row in conn.exec_driver_sql("PRAGMA table_xinfo(processed_data)")
+            }
+        if score_column_missing:
+            conn.exec_driver_sql(
+                f"ALTER TABLE processed_data ADD COLUMN digest_score "
+                f"{'DOUBLE PRECISION' if USE_POSTGRESQL else 'REAL'} NOT NULL DEFAULT 0"
+            )
+            conn.execute(_digest_scores_update())
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS idx_processed_data_bot_digest_score ON processed_data (public_bot_id, digest_score)"
+        )
+except Exception as e:
+    print(f"⚠️ Не удалось добавить digest_score в processed_data: {e}")
+
+
+# Счетчики ai_status_counters поддерживаются триггерами на processed_data. PostgreSQL: statement-level
+# триггеры с transition tables из database/migrations/004_ai_status_counters.sql.
+# SQLite fallback: только row-level триггеры
+_SQLITE_COUNTER_SHIFT = """
+    INSERT INTO ai_status_counters (public_bot_id, counter_name, value)
+    SELECT {row}.public_bot_id, name, {delta} FROM (
+        SELECT 'total' AS name
+        UNION ALL SELECT 'status:' || COALESCE({row}.processing_status, 'pending')
+        UNION ALL SELECT 'flag:is_categorized' WHERE {row}.is_categorized
+        UNION ALL SELECT 'flag:is_summarized' WHERE {row}.is_summarized
+    ) WHERE 1
+    ON CONFLICT (public_bot_id, counter_name) DO UPDATE SET value = value + excluded.value;
+"""
+AI_STATUS_COUNTERS_SQLITE_DDL = [
+    "CREATE TRIGGER IF NOT EXISTS trg_ai_status_counters_insert AFTER INSERT ON processed_data BEGIN"
+    + _SQLITE_COUNTER_SHIFT.format(row="NEW", delta=1) + "END",
+    "CREATE TRIGGER IF NOT EXISTS trg_ai_status_counters_delete AFTER DELETE ON processed_data BEGIN"
+    + _SQLITE_COUNTER_SHIFT.format(row="OLD", delta=-1) + "END",
+    "CREATE TRIGGER IF NOT EXISTS trg_ai_status_counters_update AFTER UPDATE OF "
+    "public_bot_id, processing_status, is_categorized, is_summarized ON processed_data BEGIN"
+    + _SQLITE_COUNTER_SHIFT.format(row="OLD", delta=-1)
+    + _SQLITE_COUNTER_SHIFT.format(row="NEW", delta=1) + "END",
+]
+
+# Полный пересчет счетчиков из processed_data (миграция 004, POST /api/ai/status-counters/rebuild)
+AI_STATUS_COUNTERS_REBUILD_SQL = [
+    "DELETE FROM ai_status_counters",
+    """
+    INSERT INTO ai_status_counters (public_bot_id, counter_name, value)
+    SELECT public_bot_id, 'total', COUNT(*) FROM processed_data GROUP BY public_bot_id
+    UNION ALL
+    SELECT public_bot_id, 'status:' || COALESCE(processing_status, 'pending'), COUNT(*)
+    FROM processed_data GROUP BY public_bot_id, COALESCE(processing_status, 'pending')
+    UNION ALL
+    SELECT public_bot_id, 'flag:is_categorized', COUNT(*) FROM processed_data WHERE is_categorized GROUP BY public_bot_id
+    UNION ALL
+    SELECT public_bot_id, 'flag:is_summarized', COUNT(*) FROM processed_data WHERE is_summarized GROUP BY public_bot_id
+    """,
+]
+
+def _rebuild_ai_status_counters(conn):
+    """Пересчитать ai_status_counters по processed_data целиком"""
+    if USE_POSTGRESQL:
+        # Блокируем запись в processed_data на время пересчета
+        conn.exec_driver_sql("LOCK TABLE processed_data IN SHARE ROW EXCLUSIVE MODE")
+    # exec_driver_sql: литералы вида 'flag:is_categorized' не должны разбираться как bind параметры
+    for statement in AI_STATUS_COUNTERS_REBUILD_SQL:
+        conn.exec_driver_sql(statement)
+
+try:
+    with engine.begin() as conn:
+        if USE_POSTGRESQL:
+            # Триггеры и начальный пересчет ставит миграция 004: при старте каждого воркера
+            # uvicorn только проверяем, что триггеры на месте (без блокировки processed_data)
+            installed = conn.exec_driver_sql(
+                "SELECT COUNT(*) FROM pg_trigger WHERE tgname IN "
+                "('trg_ai_status_counters_insert', 'trg_ai_status_counters_update', 'trg_ai_status_counters_delete')"
+            ).scalar()
+            if installed < 3:
+                print("⚠️ Триггеры ai_status_counters не найдены: примените database/migrations/004_ai_status_counters.sql")
+        else:
+            for ddl in AI_STATUS_COUNTERS_SQLITE_DDL:
+                conn.exec_driver_sql(ddl)
+            _rebuild_ai_status_counters(conn)
+except Exception as e:
+    print(f"⚠️ Не удалось инициализировать счетчики ai_status_counters: {e}")
+
+
+def _load_ai_status_counters(db: Session, bot_ids: Optional[List[int]] = None) -> Dict[int, Dict[str, int]]:
+    """Счетчики ai_status_counters по ботам: {bot_id: {counter_name: value}} (bot_ids=None - все боты)"""
+    query = db.query(AIStatusCounter)
+    if bot_ids is not None:
+        if not bot_ids:
+            return {}
+        query = query.filter(AIStatusCounter.public_bot_id.in_(bot_ids))
+
+    counters: Dict[int, Dict[str, int]] = {}
+    for row in query.all():
+        counters.setdefault(row.public_bot_id, {})[row.counter_name] = row.value
+    return counters
+
+
+def _sum_ai_status_counters(counters: Dict[int, Dict[str, int]]) -> Dict[str, int]:
+    """Сумма счетчиков по всем ботам"""
+    totals: Dict[str, int] = {}
+    for bot_counters in counters.values():
+        for name, value in bot_counters.items():
+            totals[name] = totals.get(name, 0) + value
+    return totals
+
+@app.post("/api/ai/status-counters/rebuild")
+def rebuild_ai_status_counters(db: Session = Depends(get_db)):
+    """🔧 Разовый полный пересчет ai_status_counters (после записей в processed_data в обход триггеров)"""
+    try:
+        _rebuild_ai_status_counters(db.connection())
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Ошибка пересчета ai_status_counters: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка пересчета счетчиков: {str(e)}")
+    return {"success": True, "totals": _sum_ai_status_counters(_load_ai_status_counters(db))}
+
 
 # === Pydantic схемы ===
 class AIResultCreate(BaseModel):
@@ -4378,6 +5531,12 @@ class AIResultResponse(AIResultCreate):
     class Config:
         from_attributes = True
 
+AI_RESULTS_FAST_COLUMNS = (
+    ProcessedData.post_id, ProcessedData.public_bot_id, ProcessedData.summaries, ProcessedData.categories,
+    ProcessedData.metrics, ProcessedData.processing_version, ProcessedData.id, ProcessedData.processed_at
+)
+AI_RESULTS_JSON_FIELDS = ("summaries", "categories", "metrics")
+
 # Pydantic модели для новой архитектуры
 class ProcessedServiceResultCreate(BaseModel):
     post_id: int
@@ -4397,33 +5556,24 @@ class SyncStatusRequest(BaseModel):
     bot_id: int
     service: str  # 'categorizer' | 'summarizer'
 
-# === API ENDPOINTS ДЛЯ AI SERVICE ===
-@app.post("/api/ai/results", response_model=AIResultResponse, status_code=status.HTTP_201_CREATED)
-def create_ai_result(result: AIResultCreate, db: Session = Depends(get_db)):
-    existing = db.query(ProcessedData).filter_by(post_id=result.post_id, public_bot_id=result.public_bot_id).first()
-    if existing:
-        raise HTTPException(status_code=409, detail="Result already exists")
-    
-    # Определяем флаги на основе содержимого
-    # Проверяем, что categories содержит реальные данные
-    has_valid_categories = False
-    if result.categories:
-        for key, value in result.categories.items():
-            if value and str(value).strip():
-                has_valid_categories = True
-                break
-    
-    # Проверяем, что summaries содержит реальные данные
-    has_valid_summaries = False
-    if result.summaries:
-        for key, value in result.summaries.items():
-            if value and str(value).strip():
-                has_valid_summaries = True
-                break
-    
-    is_categorized = has_valid_categories
-    is_summarized = has_valid_summaries
-    
+def _load_json_field(value) -> Dict[str, Any]:
+    """Десериализация JSON поля (строка в SQLite, dict в PostgreSQL JSONB)"""
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str):
+        try:
+            loaded = json.loads(value)
+        except (json.JSONDecodeError, ValueError):
+            return {}
+        return loaded if isinstance(loaded, dict) else {}
+    return {}
+
+
+def _derive_ai_result_status(res: AIResultCreate) -> Dict[str, Any]:
+    """Флаги и статус по содержимому результата: категория/summary засчитываются только непустые"""
+    is_categorized = any(value and str(value).strip() for value in (res.categories or {}).values())
+    is_summarized = any(value and str(value).strip() for value in (res.summaries or {}).values())
+
     # Пересчитываем статус на основе флагов
     if not is_categorized and not is_summarized:
         processing_status = "pending"
@@ -4431,100 +5581,112 @@ def create_ai_result(result: AIResultCreate, db: Session = Depends(get_db)):
         processing_status = "completed"
     else:
         processing_status = "processing"
-    
-    record = ProcessedData(
+
+    return {
+        "is_categorized": is_categorized,
+        "is_summarized": is_summarized,
+        "processing_status": processing_status,
+    }
+
+
+# === API ENDPOINTS ДЛЯ AI SERVICE ===
+@app.post("/api/ai/results", response_model=AIResultResponse, status_code=status.HTTP_201_CREATED)
+def create_ai_result(result: AIResultCreate, db: Session = Depends(get_db)):
+    existing = db.query(ProcessedData).filter_by(post_id=result.post_id, public_bot_id=result.public_bot_id).first()
+    if existing:
+        raise HTTPException(status_code=409, detail="Result already exists")
+    
+    # Определяем флаги и статус на основе содержимого
+    derived = _derive_ai_result_status(result)
+    
+    record = ProcessedData(
         post_id=result.post_id,
         public_bot_id=result.public_bot_id,
         summaries=result.summaries if USE_POSTGRESQL else json.dumps(result.summaries, ensure_ascii=False),
         categories=result.categories if USE_POSTGRESQL else json.dumps(result.categories, ensure_ascii=False),
         metrics=result.metrics if USE_POSTGRESQL else json.dumps(result.metrics, ensure_ascii=False),
         processing_version=result.processing_version,
-        is_categorized=is_categorized,
-        is_summarized=is_summarized,
-        processing_status=processing_status
+        **derived
     )
     db.add(record)
+    _refresh_digest_scores(db, [result.public_bot_id], [result.post_id])
     # Больше не трогаем глобальный статус в posts_cache (мультитенантность)
     db.commit()
+    _invalidate_digest_cache([result.public_bot_id])
     db.refresh(record)
     return record
 
 @app.post("/api/ai/results/batch", response_model=List[AIResultResponse], status_code=status.HTTP_201_CREATED)
-def create_ai_results_batch(results: List[AIResultCreate], db: Session = Depends(get_db)):
-    created_records = []
-    updated_records = []
-    
+async def create_ai_results_batch(results: List[AIResultCreate]):
+    """Батчевое сохранение AI результатов одним INSERT ... ON CONFLICT DO UPDATE ... RETURNING"""
+    if not results:
+        return []
+
+    # Векторизованный пре-пасс: флаги/статус в Python, дубликаты (post_id, bot_id) - побеждает последний
+    rows_by_key: Dict[tuple, Dict[str, Any]] = {}
     for res in results:
-        # Проверяем существующую запись
-        existing_record = db.query(ProcessedData).filter_by(post_id=res.post_id, public_bot_id=res.public_bot_id).first()
-        
-        # Определяем флаги на основе содержимого
-        # Проверяем, что categories содержит реальные данные
-        has_valid_categories = False
-        if res.categories:
-            # Проверяем наличие хотя бы одной непустой категории
-            for key, value in res.categories.items():
-                if value and str(value).strip():
-                    has_valid_categories = True
-                    break
-        
-        # Проверяем, что summaries содержит реальные данные
-        has_valid_summaries = False
-        if res.summaries:
-            # Проверяем наличие хотя бы одного непустого summary
-            for key, value in res.summaries.items():
-                if value and str(value).strip():
-                    has_valid_summaries = True
-                    break
-        
-        is_categorized = has_valid_categories
-        is_summarized = has_valid_summaries
-        
-        # Пересчитываем статус на основе флагов
-        if not is_categorized and not is_summarized:
-            processing_status = "pending"
-        elif is_categorized and is_summarized:
-            processing_status = "completed"
-        else:
-            processing_status = "processing"
-        
-        if existing_record:
-            # ОБНОВЛЯЕМ существующую запись
-            existing_record.summaries = res.summaries if USE_POSTGRESQL else json.dumps(res.summaries, ensure_ascii=False)
-            existing_record.categories = res.categories if USE_POSTGRESQL else json.dumps(res.categories, ensure_ascii=False)
-            existing_record.metrics = res.metrics if USE_POSTGRESQL else json.dumps(res.metrics, ensure_ascii=False)
-            existing_record.processing_version = res.processing_version
-            existing_record.is_categorized = is_categorized
-            existing_record.is_summarized = is_summarized
-            existing_record.processing_status = processing_status
-            existing_record.processed_at = func.now()
-            updated_records.append(existing_record)
-        else:
-            # СОЗДАЕМ новую запись
-            r = ProcessedData(
-                post_id=res.post_id,
-                public_bot_id=res.public_bot_id,
-                summaries=res.summaries if USE_POSTGRESQL else json.dumps(res.summaries, ensure_ascii=False),
-                categories=res.categories if USE_POSTGRESQL else json.dumps(res.categories, ensure_ascii=False),
-                metrics=res.metrics if USE_POSTGRESQL else json.dumps(res.metrics, ensure_ascii=False),
-                processing_version=res.processing_version,
-                is_categorized=is_categorized,
-                is_summarized=is_summarized,
-                processing_status=processing_status
-            )
-            db.add(r)
-            created_records.append(r)
-        
+        rows_by_key[(res.post_id, res.public_bot_id)] = {
+            "post_id": res.post_id,
+            "public_bot_id": res.public_bot_id,
+            "summaries": res.summaries if USE_POSTGRESQL else json.dumps(res.summaries, ensure_ascii=False),
+            "categories": res.categories if USE_POSTGRESQL else json.dumps(res.categories, ensure_ascii=False),
+            "metrics": res.metrics if USE_POSTGRESQL else json.dumps(res.metrics, ensure_ascii=False),
+            "processing_version": res.processing_version,
+            **_derive_ai_result_status(res),
+        }
+    # Стабильный порядок строк - конкурентные батчи блокируют записи в одном порядке
+    rows = [rows_by_key[key] for key in sorted(rows_by_key)]
+
+    saved = await _run_db(_save_ai_results_batch, rows)
+    await run_in_threadpool(_invalidate_digest_cache, [row["public_bot_id"] for row in rows])
+
+    logger.info(f"✅ Batch AI results: сохранено {len(saved)} (получено {len(results)})")
+    return saved
+
+def _save_ai_results_batch(db: Session, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Upsert подготовленных строк processed_data и пересчет digest_score"""
+    dialect_insert = insert if USE_POSTGRESQL else sqlite_insert
+    stmt = dialect_insert(ProcessedData).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['post_id', 'public_bot_id'],
+        set_={
+            'summaries': stmt.excluded.summaries,
+            'categories': stmt.excluded.categories,
+            'metrics': stmt.excluded.metrics,
+            'processing_version': stmt.excluded.processing_version,
+            'is_categorized': stmt.excluded.is_categorized,
+            'is_summarized': stmt.excluded.is_summarized,
+            'processing_status': stmt.excluded.processing_status,
+            'processed_at': func.now(),
+        }
+    ).returning(
+        ProcessedData.id, ProcessedData.post_id, ProcessedData.public_bot_id,
+        ProcessedData.summaries, ProcessedData.categories, ProcessedData.metrics,
+        ProcessedData.processing_version, ProcessedData.processed_at
+    )
+
+    try:
+        saved = [
+            {
+                "id": row.id,
+                "post_id": row.post_id,
+                "public_bot_id": row.public_bot_id,
+                "summaries": _load_json_field(row.summaries),
+                "categories": _load_json_field(row.categories),
+                "metrics": _load_json_field(row.metrics),
+                "processing_version": row.processing_version,
+                "processed_at": row.processed_at,
+            }
+            for row in db.execute(stmt)
+        ]
+        _refresh_digest_scores(db, [row["public_bot_id"] for row in rows], [row["post_id"] for row in rows])
         # Больше не трогаем глобальный статус в posts_cache (мультитенантность)
-    
-    db.commit()
-    
-    # Обновляем записи после commit
-    for r in created_records + updated_records:
-        db.refresh(r)
-    
-    logger.info(f"✅ Batch AI results: создано {len(created_records)}, обновлено {len(updated_records)}")
-    return created_records + updated_records
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Ошибка батчевого сохранения AI результатов: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка сохранения AI результатов: {str(e)}")
+    return saved
 
 @app.get("/api/ai/results", response_model=List[AIResultResponse])
 def get_ai_results(
@@ -4535,10 +5697,13 @@ def get_ai_results(
     processing_version: Optional[str] = None,
     sort_by: str = "processed_at",
     sort_order: str = "desc",
+    fast: bool = False,  # быстрый путь: orjson без response_model валидации
     db: Session = Depends(get_db)
 ):
     """Получение AI результатов с фильтрацией"""
     query = db.query(ProcessedData)
+    if fast:
+        query = query.with_entities(*AI_RESULTS_FAST_COLUMNS)
     
     # Фильтры
     if bot_id:
@@ -4560,7 +5725,150 @@ def get_ai_results(
         else:
             query = query.order_by(ProcessedData.post_id.asc())
     
-    return query.offset(skip).limit(limit).all()
+    results = query.offset(skip).limit(limit).all()
+    if fast:
+        return FastJSONResponse(_fast_rows(results, AI_RESULTS_JSON_FIELDS))
+    return results
+
+AI_RESULTS_LOOKUP_MAX_POSTS = 500
+
+@app.get("/api/ai/results/by-posts")
+async def get_ai_results_by_posts(
+    bot_id: int = Query(..., description="Bot ID"),
+    post_ids: str = Query(..., description="Comma-separated list of post IDs")
+):
+    """📦 AI результаты бота для списка постов одним запросом (вместо /api/ai/results на каждый пост).
+
+    Формат строк как у /api/ai/results; посты без результата в ответ не попадают.
+    """
+    try:
+        post_ids_list = list(dict.fromkeys(int(pid.strip()) for pid in post_ids.split(',') if pid.strip()))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Некорректные post_ids: {str(e)}"
+        )
+    if not post_ids_list:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="post_ids не может быть пустым"
+        )
+    if len(post_ids_list) > AI_RESULTS_LOOKUP_MAX_POSTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Максимальное количество post_ids: {AI_RESULTS_LOOKUP_MAX_POSTS}"
+        )
+
+    rows = await _run_db(_lookup_ai_results, bot_id, post_ids_list)
+    return FastJSONResponse(_fast_rows(rows, AI_RESULTS_JSON_FIELDS))
+
+def _lookup_ai_results(db: Session, bot_id: int, post_ids: List[int]):
+    return db.query(ProcessedData).with_entities(*AI_RESULTS_FAST_COLUMNS).filter(
+        ProcessedData.public_bot_id == bot_id,
+        ProcessedData.post_id.in_(post_ids)
+    ).all()
+
+# Сервисы, для которых ведется выборка необработанных постов и аренда работы
+WORK_QUEUE_SERVICES = ("categorization", "summarization")
+AI_WORK_LEASE_DEFAULT_SECONDS = 300
+AI_WORK_LEASE_MAX_SECONDS = 3600
+
+
+def _unprocessed_posts_query(
+    db: Session,
+    bot_id: int,
+    service: Optional[str] = None,
+    channel_ids_list: Optional[List[int]] = None,
+    exclude_leased: bool = True,
+):
+    """Запрос необработанных постов бота для сервиса (None - без фильтрации по сервису).
+
+    Возвращает None, если у бота нет активных каналов. Посты с действующей арендой
+    (ai_work_leases) исключаются - их уже обрабатывает другой воркер.
+    """
+    # 🔧 КРИТИЧЕСКОЕ ИСПРАВЛЕНИЕ: Фильтрация по каналам бота (снимок топологии)
+    bot_channel_telegram_ids = _topology_channel_telegram_ids(_get_bot_topology(db), [bot_id], active_channels_only=True)
+
+    if not bot_channel_telegram_ids:
+        return None  # У бота нет активных каналов
+
+    # Базовый запрос с фильтрацией по каналам бота
+    query = db.query(PostCache).filter(
+        PostCache.channel_telegram_id.in_(bot_channel_telegram_ids)
+    )
+
+    # Фильтр по каналам (если передан Query параметр channel_telegram_ids)
+    if channel_ids_list:
+        query = query.filter(PostCache.channel_telegram_id.in_(channel_ids_list))
+
+    if service not in WORK_QUEUE_SERVICES:
+        return query
+
+    # 🎯 УМНАЯ ДЕДУПЛИКАЦИЯ: Исключаем посты уже обрабатываемые или готовые по сервису
+    # ИСКЛЮЧАЕМ: 1) processing статус, 2) completed БЕЗ payload.error (реальные результаты)
+    # НЕ ИСКЛЮЧАЕМ: completed С payload.error (fallback результаты)
+    # Для саммаризации зависимость от успешной категоризации временно снята для параллельной отладки
+    processing_posts = db.query(ProcessedServiceResult.post_id).filter(
+        ProcessedServiceResult.public_bot_id == bot_id,
+        ProcessedServiceResult.service_name == service,
+        ProcessedServiceResult.status == 'processing'
+    ).subquery()
+
+    if USE_POSTGRESQL:
+        no_error_payload = ~ProcessedServiceResult.payload.has_key('error')  # PostgreSQL: нет ключа 'error'
+    else:
+        no_error_payload = ~ProcessedServiceResult.payload.like('%"error"%')  # SQLite fallback
+
+    real_success_posts = db.query(ProcessedServiceResult.post_id).filter(
+        ProcessedServiceResult.public_bot_id == bot_id,
+        ProcessedServiceResult.service_name == service,
+        ProcessedServiceResult.status == 'completed',
+        no_error_payload
+    ).subquery()
+
+    query = query.filter(
+        ~PostCache.id.in_(processing_posts),
+        ~PostCache.id.in_(real_success_posts)
+    )
+
+    if exclude_leased:
+        active_leases = db.query(AIWorkLease.post_id).filter(
+            AIWorkLease.public_bot_id == bot_id,
+            AIWorkLease.service_name == service,
+            AIWorkLease.lease_expires_at > datetime.utcnow()
+        ).subquery()
+        query = query.filter(~PostCache.id.in_(active_leases))
+
+    logger.debug(f"🛡️ Дедупликация {service}: исключены processing, completed без payload.error и арендованные посты для бота {bot_id}")
+    return query
+
+
+def _parse_channel_telegram_ids(channel_telegram_ids: Optional[str]) -> List[int]:
+    """Разбор comma-separated списка channel_telegram_ids из Query параметра"""
+    if not channel_telegram_ids:
+        return []
+    try:
+        return [int(cid.strip()) for cid in channel_telegram_ids.split(',') if cid.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректные channel_telegram_ids"
+        )
+
+
+def _release_work_leases(db: Session, bot_id: int, service_name: str, post_ids: List[int], worker_id: Optional[str] = None) -> int:
+    """Снимает аренду постов (после сохранения результата или при отказе воркера). Без commit."""
+    if not post_ids:
+        return 0
+    query = db.query(AIWorkLease).filter(
+        AIWorkLease.public_bot_id == bot_id,
+        AIWorkLease.service_name == service_name,
+        AIWorkLease.post_id.in_(post_ids)
+    )
+    if worker_id:
+        query = query.filter(AIWorkLease.worker_id == worker_id)
+    return query.delete(synchronize_session=False)
+
 
 @app.get("/api/posts/unprocessed", response_model=List[PostCacheResponseWithBot])
 def get_unprocessed_posts(
@@ -4569,129 +5877,32 @@ def get_unprocessed_posts(
     channel_telegram_ids: Optional[str] = Query(None, description="Comma-separated list of channel telegram IDs"),
     require_categorization: Optional[bool] = Query(None, description="Only posts that need categorization"),
     require_summarization: Optional[bool] = Query(None, description="Only posts that need summarization"),
+    fast: bool = Query(False, description="orjson response without response_model validation"),
     db: Session = Depends(get_db)
 ):
-    """✅ УНИВЕРСАЛЬНЫЙ ENDPOINT для v4 и v5: Поддержка фильтрации для параллельной архитектуры"""
-    
-    # 🔧 КРИТИЧЕСКОЕ ИСПРАВЛЕНИЕ: Фильтрация по каналам бота
-    # Получаем каналы бота
-    bot_channels = db.query(BotChannel).filter(
-        BotChannel.public_bot_id == bot_id,
-        BotChannel.is_active == True
-    ).all()
-    
-    if not bot_channels:
-        return []  # У бота нет каналов - нет постов для обработки
-    
-    channel_ids = [bc.channel_id for bc in bot_channels]
-    
-    # Получаем telegram_id каналов
-    channels = db.query(Channel).filter(
-        Channel.id.in_(channel_ids),
-        Channel.is_active == True
-    ).all()
-    
-    bot_channel_telegram_ids = [ch.telegram_id for ch in channels]
-    
-    if not bot_channel_telegram_ids:
-        return []  # У бота нет активных каналов
-    
-    # Базовый запрос с фильтрацией по каналам бота
-    query = db.query(PostCache).filter(
-        PostCache.channel_telegram_id.in_(bot_channel_telegram_ids)
-    )
-    
-    # Фильтр по каналам (если передан Query параметр channel_telegram_ids)
-    if channel_telegram_ids:
-        try:
-            channel_ids_list = [int(cid.strip()) for cid in channel_telegram_ids.split(',') if cid.strip()]
-            if channel_ids_list:
-                query = query.filter(PostCache.channel_telegram_id.in_(channel_ids_list))
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Некорректные channel_telegram_ids"
-            )
-    
-    # 🔧 КРИТИЧЕСКОЕ ИСПРАВЛЕНИЕ: Умная дедупликация по сервисам
-    # Не добавляем общую дедупликацию здесь - она будет специфична для каждого сервиса ниже
-    
-    # 🔧 КРИТИЧЕСКОЕ ИСПРАВЛЕНИЕ: Фильтрация по processed_service_results
-    if require_categorization or require_summarization:
-        if require_categorization:
-            # 🎯 УМНАЯ ДЕДУПЛИКАЦИЯ: Исключаем посты уже обрабатываемые или готовые по категоризации
-            # ИСКЛЮЧАЕМ: 1) processing статус, 2) success БЕЗ payload.error (реальные результаты)
-            # НЕ ИСКЛЮЧАЕМ: success С payload.error (fallback результаты)
-            
-            # Подзапрос: посты в processing (точно исключаем)
-            processing_posts = db.query(ProcessedServiceResult.post_id).filter(
-                ProcessedServiceResult.public_bot_id == bot_id,
-                ProcessedServiceResult.service_name == 'categorization',
-                ProcessedServiceResult.status == 'processing'
-            ).subquery()
-            
-            # Подзапрос: посты с completed статусом БЕЗ payload.error (реальные успешные результаты)
-            if USE_POSTGRESQL:
-                real_success_posts = db.query(ProcessedServiceResult.post_id).filter(
-                    ProcessedServiceResult.public_bot_id == bot_id,
-                    ProcessedServiceResult.service_name == 'categorization',
-                    ProcessedServiceResult.status == 'completed',
-                    ~ProcessedServiceResult.payload.has_key('error')  # PostgreSQL: нет ключа 'error'
-                ).subquery()
-            else:
-                # SQLite fallback: проверяем что payload не содержит "error"
-                real_success_posts = db.query(ProcessedServiceResult.post_id).filter(
-                    ProcessedServiceResult.public_bot_id == bot_id,
-                    ProcessedServiceResult.service_name == 'categorization',
-                    ProcessedServiceResult.status == 'completed',
-                    ~ProcessedServiceResult.payload.like('%"error"%')
-                ).subquery()
-            
-            # Исключаем обе группы постов
-            query = query.filter(
-                ~PostCache.id.in_(processing_posts),
-                ~PostCache.id.in_(real_success_posts)
-            )
-            
-            logger.info(f"🛡️ Умная дедупликация категоризации: исключены processing + success без payload.error для бота {bot_id}")
-        
-        elif require_summarization:
-            # 🎯 Дедупликация для саммаризации: НЕ брать уже обрабатываемые/готовые саммари
-            # Зависимость от успешной категоризации временно снята для параллельной отладки
+    """✅ УНИВЕРСАЛЬНЫЙ ENDPOINT для v4 и v5: Поддержка фильтрации для параллельной архитектуры.
 
-            # Подзапрос: посты в processing по саммаризации
-            processing_summarization = db.query(ProcessedServiceResult.post_id).filter(
-                ProcessedServiceResult.public_bot_id == bot_id,
-                ProcessedServiceResult.service_name == 'summarization', 
-                ProcessedServiceResult.status == 'processing'
-            ).subquery()
+    Только чтение - для исключения дублей между воркерами используйте POST /api/ai/work/claim.
+    """
+    channel_ids_list = _parse_channel_telegram_ids(channel_telegram_ids)
 
-            # Подзапрос: посты с РЕАЛЬНОЙ успешной саммаризацией (без payload.error)
-            if USE_POSTGRESQL:
-                real_success_summarization = db.query(ProcessedServiceResult.post_id).filter(
-                    ProcessedServiceResult.public_bot_id == bot_id,
-                    ProcessedServiceResult.service_name == 'summarization',
-                    ProcessedServiceResult.status == 'completed',
-                    ~ProcessedServiceResult.payload.has_key('error')
-                ).subquery()
-            else:
-                real_success_summarization = db.query(ProcessedServiceResult.post_id).filter(
-                    ProcessedServiceResult.public_bot_id == bot_id,
-                    ProcessedServiceResult.service_name == 'summarization',
-                    ProcessedServiceResult.status == 'completed',
-                    ~ProcessedServiceResult.payload.like('%"error"%')
-                ).subquery()
-
-            # Исключаем processing/completed саммаризации
-            query = query.filter(
-                ~PostCache.id.in_(processing_summarization),
-                ~PostCache.id.in_(real_success_summarization)
-            )
+    service = None
+    if require_categorization:
+        service = "categorization"
+    elif require_summarization:
+        service = "summarization"
+
+    query = _unprocessed_posts_query(db, bot_id, service, channel_ids_list)
+    if query is None:
+        return []  # У бота нет каналов - нет постов для обработки
+
+    query = query.order_by(PostCache.post_date.desc()).limit(limit)
+    if fast:
+        rows = query.with_entities(*POSTS_CACHE_FAST_COLUMNS).all()
+        return FastJSONResponse(_fast_rows(rows, POSTS_CACHE_JSON_FIELDS, extra={"bot_id": bot_id}))
 
-            logger.info(f"🛡️ Дедупликация саммаризации: исключены processing и completed для бота {bot_id}")
-    
     # Возвращаем результат
-    results = query.order_by(PostCache.post_date.desc()).limit(limit).all()
+    results = query.all()
     
     # Добавляем bot_id к каждому посту
     response_data = []
@@ -4702,6 +5913,167 @@ def get_unprocessed_posts(
 
     return response_data
 
+
+class AIWorkClaimRequest(BaseModel):
+    bot_id: int
+    service: str  # 'categorization' | 'summarization'
+    worker_id: str
+    limit: int = Field(30, ge=1, le=1000)
+    lease_seconds: int = Field(AI_WORK_LEASE_DEFAULT_SECONDS, ge=1, le=AI_WORK_LEASE_MAX_SECONDS)
+    channel_telegram_ids: Optional[List[int]] = None
+
+
+class AIWorkReleaseRequest(BaseModel):
+    bot_id: int
+    service: str
+    post_ids: List[int]
+    worker_id: Optional[str] = None
+
+
+@app.post("/api/ai/work/claim")
+async def claim_ai_work(request: AIWorkClaimRequest):
+    """🔒 Атомарная аренда N необработанных постов для (bot, service).
+
+    Кандидаты блокируются через SELECT ... FOR UPDATE SKIP LOCKED (PostgreSQL), поэтому
+    конкурентные воркеры получают непересекающиеся наборы. Аренда записывается в
+    ai_work_leases через INSERT ... ON CONFLICT DO UPDATE WHERE lease_expires_at <= now -
+    просроченная аренда упавшего воркера перехватывается автоматически, действующая - нет.
+    """
+    if request.service not in WORK_QUEUE_SERVICES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Недопустимый сервис. Допустимые: {list(WORK_QUEUE_SERVICES)}"
+        )
+    return await _run_db(_claim_ai_work, request)
+
+def _claim_ai_work(db: Session, request: AIWorkClaimRequest) -> dict:
+    try:
+        query = _unprocessed_posts_query(db, request.bot_id, request.service, request.channel_telegram_ids)
+        if query is None:
+            return {"bot_id": request.bot_id, "service": request.service, "lease_expires_at": None, "posts": []}
+
+        query = query.order_by(PostCache.post_date.desc()).limit(request.limit)
+        if USE_POSTGRESQL:
+            query = query.with_for_update(skip_locked=True, of=PostCache)
+        candidates = query.all()
+
+        if not candidates:
+            db.rollback()
+            return {"bot_id": request.bot_id, "service": request.service, "lease_expires_at": None, "posts": []}
+
+        now = datetime.utcnow()
+        lease_expires_at = now + timedelta(seconds=request.lease_seconds)
+        lease_rows = [
+            {
+                "post_id": post.id,
+                "public_bot_id": request.bot_id,
+                "service_name": request.service,
+                "worker_id": request.worker_id,
+                "leased_at": now,
+                "lease_expires_at": lease_expires_at,
+            }
+            for post in candidates
+        ]
+
+        dialect_insert = insert if USE_POSTGRESQL else sqlite_insert
+        stmt = dialect_insert(AIWorkLease).values(lease_rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['post_id', 'public_bot_id', 'service_name'],
+            set_={
+                'worker_id': stmt.excluded.worker_id,
+                'leased_at': stmt.excluded.leased_at,
+                'lease_expires_at': stmt.excluded.lease_expires_at,
+            },
+            where=AIWorkLease.lease_expires_at <= now
+        ).returning(AIWorkLease.post_id)
+        claimed_ids = {row.post_id for row in db.execute(stmt)}
+
+        posts = []
+        for post in candidates:
+            if post.id in claimed_ids:
+                post_dict = post.__dict__
+                post_dict['bot_id'] = request.bot_id
+                posts.append(PostCacheResponseWithBot.model_validate(post_dict))
+
+        db.commit()
+
+        logger.info(f"🔒 Аренда {request.service}: {len(posts)}/{len(candidates)} постов для бота {request.bot_id} → {request.worker_id}")
+        return {
+            "bot_id": request.bot_id,
+            "service": request.service,
+            "worker_id": request.worker_id,
+            "lease_expires_at": lease_expires_at.isoformat(),
+            "posts": posts
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Ошибка аренды постов: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка аренды постов: {str(e)}")
+
+
+@app.post("/api/ai/work/release")
+def release_ai_work(request: AIWorkReleaseRequest, db: Session = Depends(get_db)):
+    """🔓 Досрочное снятие аренды (воркер завершил или не смог обработать посты)"""
+    if request.service not in WORK_QUEUE_SERVICES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Недопустимый сервис. Допустимые: {list(WORK_QUEUE_SERVICES)}"
+        )
+    try:
+        released = _release_work_leases(db, request.bot_id, request.service, request.post_ids, request.worker_id)
+        db.commit()
+        return {"released": released}
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Ошибка снятия аренды: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка снятия аренды: {str(e)}")
+
+@app.get("/api/ai/work/available")
+def get_ai_work_available(
+    bot_id: Optional[int] = Query(None, description="Only this bot (default: all bots with status_filter)"),
+    service: Optional[str] = Query(None, description="categorization | summarization (default: both)"),
+    status_filter: str = Query("active", description="Bot status to probe"),
+    db: Session = Depends(get_db)
+):
+    """⚡ Дешевая проверка наличия работы для оркестратора и Celery beat.
+
+    Для каждого бота и сервиса выполняется EXISTS по тем же условиям, что и claim
+    (арендованные посты не считаются доступной работой), без выборки самих постов.
+    """
+    if service is not None and service not in WORK_QUEUE_SERVICES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Недопустимый сервис. Допустимые: {list(WORK_QUEUE_SERVICES)}"
+        )
+    services = [service] if service else list(WORK_QUEUE_SERVICES)
+
+    bots_query = db.query(PublicBot.id, PublicBot.name)
+    if bot_id is not None:
+        bots_query = bots_query.filter(PublicBot.id == bot_id)
+    else:
+        bots_query = bots_query.filter(PublicBot.status == status_filter)
+
+    bots_work = []
+    totals = {name: False for name in services}
+    for bot in bots_query.order_by(PublicBot.id).all():
+        bot_work = {"bot_id": bot.id, "name": bot.name}
+        for name in services:
+            query = _unprocessed_posts_query(db, bot.id, name)
+            has_work = query is not None and db.query(query.with_entities(PostCache.id).exists()).scalar()
+            bot_work[name] = bool(has_work)
+            totals[name] = totals[name] or bot_work[name]
+        bots_work.append(bot_work)
+
+    return {
+        "work_available": any(totals.values()),
+        "services": totals,
+        "bots": bots_work,
+        "checked_at": datetime.utcnow().isoformat()
+    }
+
 # === MULTITENANT STATUS ENDPOINTS ===
 @app.get("/api/ai/results/batch-status")
 def get_ai_results_batch_status(
@@ -4871,6 +6243,7 @@ def update_ai_results_status_batch(
             }, synchronize_session=False)
         
         db.commit()
+        _invalidate_digest_cache([bot_id])
         
         total_affected = created_count + updated_count
         logger.info(f"✅ Батчево обновлено {total_affected} AI статусов на '{new_status}' для бота {bot_id}")
@@ -4915,106 +6288,156 @@ AI_SERVICES = [
     # {"name": "ner_extraction", "queue": "processing", "required": False}
 ]
 
-def _update_processed_data_flags(db: Session, post_id: int, bot_id: int):
-    """🔧 ИСПРАВЛЕНО: Пересчитывает флаги и статусы с проверкой реальных AI результатов."""
-    
-    logger.info(f"🔄 Обновление флагов для post_id={post_id}, bot_id={bot_id}")
-    
-    # Получаем или создаем агрегированную запись
-    agg_row = db.query(ProcessedData).filter(
-        ProcessedData.post_id == post_id,
-        ProcessedData.public_bot_id == bot_id
-    ).with_for_update().first()
+# Один INSERT ... SELECT ... ON CONFLICT пересчитывает processed_data для всего батча.
+# Результаты с непустым payload.error (fallback) не учитываются - как и раньше.
+_UPDATE_PROCESSED_DATA_FLAGS_SQL = text("""
+WITH keys AS (
+    SELECT DISTINCT k.post_id, k.public_bot_id
+    FROM unnest(CAST(:post_ids AS bigint[]), CAST(:bot_ids AS integer[])) AS k(post_id, public_bot_id)
+),
+ok AS (
+    SELECT psr.post_id, psr.public_bot_id, psr.service_name, psr.payload, psr.metrics
+    FROM processed_service_results psr
+    JOIN keys USING (post_id, public_bot_id)
+    WHERE psr.status = 'completed'
+      AND COALESCE(psr.payload->>'error', '') = ''
+),
+agg AS (
+    SELECT
+        keys.post_id,
+        keys.public_bot_id,
+        (array_agg(ok.payload) FILTER (WHERE ok.service_name = 'categorization'))[1] AS cat_payload,
+        (array_agg(ok.metrics) FILTER (WHERE ok.service_name = 'categorization'))[1] AS cat_metrics,
+        (array_agg(ok.payload) FILTER (WHERE ok.service_name = 'summarization'))[1] AS sum_payload,
+        (array_agg(ok.metrics) FILTER (WHERE ok.service_name = 'summarization'))[1] AS sum_metrics,
+        count(DISTINCT ok.service_name) FILTER (
+            WHERE ok.service_name = ANY(CAST(:required_services AS text[]))
+        ) AS required_done
+    FROM keys
+    LEFT JOIN ok USING (post_id, public_bot_id)
+    GROUP BY keys.post_id, keys.public_bot_id
+)
+INSERT INTO processed_data (
+    post_id, public_bot_id, summaries, categories, metrics,
+    processed_at, processing_version, processing_status, is_categorized, is_summarized
+)
+SELECT
+    agg.post_id,
+    agg.public_bot_id,
+    CASE WHEN agg.sum_payload IS NULL THEN '{}'::jsonb ELSE jsonb_build_object(
+        'summary', COALESCE(agg.sum_payload->>'summary', ''),
+        'language', COALESCE(agg.sum_payload->>'language', 'ru')
+    ) END,
+    CASE WHEN agg.cat_payload IS NULL THEN '{}'::jsonb ELSE jsonb_build_object(
+        'category_name', COALESCE(agg.cat_payload->>'primary', ''),
+        'secondary', COALESCE(agg.cat_payload->'secondary', '[]'::jsonb),
+        'relevance_scores', COALESCE(agg.cat_payload->'relevance_scores', '[]'::jsonb)
+    ) END,
+    COALESCE(agg.cat_metrics, '{}'::jsonb) || COALESCE(agg.sum_metrics, '{}'::jsonb),
+    now() AT TIME ZONE 'utc',
+    'v3.1',
+    CASE WHEN agg.required_done = cardinality(CAST(:required_services AS text[]))
+         THEN 'completed' ELSE 'processing' END,
+    agg.cat_payload IS NOT NULL,
+    agg.sum_payload IS NOT NULL
+FROM agg
+ORDER BY agg.post_id, agg.public_bot_id
+ON CONFLICT (post_id, public_bot_id) DO UPDATE SET
+    is_categorized = EXCLUDED.is_categorized,
+    is_summarized = EXCLUDED.is_summarized,
+    categories = CASE WHEN EXCLUDED.is_categorized THEN EXCLUDED.categories ELSE processed_data.categories END,
+    summaries = CASE WHEN EXCLUDED.is_summarized THEN EXCLUDED.summaries ELSE processed_data.summaries END,
+    metrics = COALESCE(processed_data.metrics, '{}'::jsonb) || EXCLUDED.metrics,
+    processing_status = EXCLUDED.processing_status,
+    processed_at = EXCLUDED.processed_at
+""")
+
+
+def _update_processed_data_flags(db: Session, post_bot_pairs) -> int:
+    """🔧 Set-based пересчет флагов и статусов processed_data для батча пар (post_id, bot_id).
+
+    PostgreSQL: один SQL запрос (ON CONFLICT блокирует строки вместо SELECT ... FOR UPDATE).
+    SQLite fallback: фиксированное число запросов с агрегацией в Python.
+    """
+    pairs = sorted(set(post_bot_pairs))
+    if not pairs:
+        return 0
 
-    if not agg_row:
-        logger.info(f"📝 Создаем новую запись ProcessedData для post_id={post_id}, bot_id={bot_id}")
-        agg_row = ProcessedData(post_id=post_id, public_bot_id=bot_id, summaries={}, categories={}, metrics={})
-        db.add(agg_row)
+    required_services = [s['name'] for s in AI_SERVICES if s.get('required', False)]
 
-    # Получаем все успешные результаты для этого поста/бота
-    service_results = db.query(ProcessedServiceResult.service_name, ProcessedServiceResult.payload, ProcessedServiceResult.metrics).filter(
-        ProcessedServiceResult.post_id == post_id,
-        ProcessedServiceResult.public_bot_id == bot_id,
-        ProcessedServiceResult.status == 'completed'  # ИСПРАВЛЕНО: ищем статус 'completed' а не 'success'
+    if USE_POSTGRESQL:
+        db.execute(_UPDATE_PROCESSED_DATA_FLAGS_SQL, {
+            "post_ids": [post_id for post_id, _ in pairs],
+            "bot_ids": [bot_id for _, bot_id in pairs],
+            "required_services": required_services,
+        })
+        logger.info(f"🔄 Флаги processed_data пересчитаны для {len(pairs)} постов/ботов")
+        return len(pairs)
+
+    # SQLite fallback
+    pair_set = set(pairs)
+    post_ids = {post_id for post_id, _ in pairs}
+    bot_ids = {bot_id for _, bot_id in pairs}
+
+    successful_services: Dict[tuple, Dict[str, Dict[str, Any]]] = {pair: {} for pair in pairs}
+    service_results = db.query(
+        ProcessedServiceResult.post_id, ProcessedServiceResult.public_bot_id,
+        ProcessedServiceResult.service_name, ProcessedServiceResult.payload, ProcessedServiceResult.metrics
+    ).filter(
+        ProcessedServiceResult.post_id.in_(post_ids),
+        ProcessedServiceResult.public_bot_id.in_(bot_ids),
+        ProcessedServiceResult.status == 'completed'
     ).all()
-    
-    logger.info(f"📊 Найдено {len(service_results)} успешных результатов для post_id={post_id}, bot_id={bot_id}")
-    
-    # 🔧 КРИТИЧЕСКОЕ ИСПРАВЛЕНИЕ: Проверяем что результаты реальные, а не fallback
-    successful_services = {}
     for res in service_results:
-        # Десериализация payload (может быть строкой JSON или уже словарем)
-        if isinstance(res.payload, str):
-            try:
-                payload = json.loads(res.payload)
-            except (json.JSONDecodeError, ValueError):
-                payload = {}
-        elif isinstance(res.payload, dict):
-            payload = res.payload
-        else:
-            payload = {}
-        
-        logger.info(f"🔍 DEBUG: Проверяем {res.service_name}: payload={payload}, type={type(res.payload)}")
-        
+        pair = (res.post_id, res.public_bot_id)
+        if pair not in pair_set:
+            continue
+        payload = _load_json_field(res.payload)
         if not payload.get('error'):  # Если нет поля 'error' - это реальный результат
-            successful_services[res.service_name] = {'payload': payload, 'metrics': res.metrics}
-            logger.info(f"✅ Принимаем реальный результат для {res.service_name}")
-        else:
-            logger.warning(f"⚠️ Игнорируем fallback результат для {res.service_name}: {payload.get('error')}")
+            successful_services[pair][res.service_name] = {'payload': payload, 'metrics': _load_json_field(res.metrics)}
 
-    # Обновляем флаги только для РЕАЛЬНЫХ результатов
-    agg_row.is_categorized = "categorization" in successful_services
-    agg_row.is_summarized = "summarization" in successful_services
-    
-    logger.info(f"🏁 Флаги обновлены: is_categorized={agg_row.is_categorized}, is_summarized={agg_row.is_summarized}")
-    
-    # Обновляем агрегированные данные
-    if agg_row.is_categorized:
-        cat_payload = successful_services["categorization"]['payload']
-        cat_metrics = successful_services["categorization"]['metrics']
-        
-        # Преобразуем формат из новой архитектуры в ожидаемый формат
-        agg_row.categories = {
-            'category_name': cat_payload.get('primary', ''),
-            'secondary': cat_payload.get('secondary', []),
-            'relevance_scores': cat_payload.get('relevance_scores', [])
-        }
-        
-        # Обновляем метрики
-        if not agg_row.metrics:
-            agg_row.metrics = {}
-        agg_row.metrics.update(cat_metrics)
-        
-        logger.info(f"📂 Категории обновлены: {agg_row.categories}")
+    existing_rows = {
+        (row.post_id, row.public_bot_id): row
+        for row in db.query(ProcessedData).filter(
+            ProcessedData.post_id.in_(post_ids),
+            ProcessedData.public_bot_id.in_(bot_ids)
+        ).all()
+    }
 
-    if agg_row.is_summarized:
-        sum_payload = successful_services["summarization"]['payload']
-        sum_metrics = successful_services["summarization"]['metrics']
-        
-        # Преобразуем формат из новой архитектуры в ожидаемый формат
-        agg_row.summaries = {
-            'summary': sum_payload.get('summary', ''),
-            'language': sum_payload.get('language', 'ru')
-        }
-        
-        # Обновляем метрики
-        if not agg_row.metrics:
-            agg_row.metrics = {}
-        agg_row.metrics.update(sum_metrics)
-        
-        logger.info(f"📄 Summary обновлено: {agg_row.summaries}")
+    now = datetime.utcnow()
+    for pair in pairs:
+        services = successful_services[pair]
+        agg_row = existing_rows.get(pair)
+        if agg_row is None:
+            agg_row = ProcessedData(post_id=pair[0], public_bot_id=pair[1], summaries="{}", categories="{}", metrics="{}")
+            db.add(agg_row)
+
+        metrics = _load_json_field(agg_row.metrics)
+        if "categorization" in services:
+            cat_payload = services["categorization"]['payload']
+            agg_row.categories = json.dumps({
+                'category_name': cat_payload.get('primary', ''),
+                'secondary': cat_payload.get('secondary', []),
+                'relevance_scores': cat_payload.get('relevance_scores', [])
+            })
+            metrics.update(services["categorization"]['metrics'])
+        if "summarization" in services:
+            sum_payload = services["summarization"]['payload']
+            agg_row.summaries = json.dumps({
+                'summary': sum_payload.get('summary', ''),
+                'language': sum_payload.get('language', 'ru')
+            })
+            metrics.update(services["summarization"]['metrics'])
+
+        agg_row.metrics = json.dumps(metrics)
+        agg_row.is_categorized = "categorization" in services
+        agg_row.is_summarized = "summarization" in services
+        agg_row.processing_status = "completed" if set(required_services).issubset(services.keys()) else "processing"
+        agg_row.processed_at = now
 
-    # Проверяем, все ли ОБЯЗАТЕЛЬНЫЕ сервисы завершены
-    required_services = {s['name'] for s in AI_SERVICES if s.get('required', False)}
-    if required_services.issubset(successful_services.keys()):
-        agg_row.processing_status = "completed"
-    else:
-        agg_row.processing_status = "processing"
-    
-    logger.info(f"✅ Обновление завершено. Статус: {agg_row.processing_status}")
-    
-    agg_row.processed_at = datetime.utcnow()
     db.flush()
+    logger.info(f"🔄 Флаги processed_data пересчитаны для {len(pairs)} постов/ботов (SQLite)")
+    return len(pairs)
 
 # --------------------------------------------------------------------------
 AI_SERVICES = [
@@ -5066,6 +6489,8 @@ def create_service_results_batch(batch: ServiceResultsBatch, db: Session = Depen
             db.execute(stmt)
         else: # Fallback для SQLite
              for r in results_to_upsert:
+                r['payload'] = json.dumps(r['payload'])
+                r['metrics'] = json.dumps(r['metrics'])
                 existing = db.query(ProcessedServiceResult).filter_by(
                     post_id=r['post_id'], 
                     public_bot_id=r['public_bot_id'],
@@ -5078,23 +6503,24 @@ def create_service_results_batch(batch: ServiceResultsBatch, db: Session = Depen
                     existing.processed_at = r['processed_at']
                 else:
                     db.add(ProcessedServiceResult(**r))
+             db.flush()  # агрегация ниже читает результаты из БД
 
         logger.info(f"✅ Успешно сохранено/обновлено {len(results_to_upsert)} записей в `processed_service_results`.")
 
-        # Шаг 3: Асинхронно обновить агрегатные статусы для затронутых постов
+        # Результат сохранен - аренда постов больше не нужна
+        leased_posts: Dict[tuple, List[int]] = {}
+        for r in batch.results:
+            leased_posts.setdefault((r.public_bot_id, r.service_name), []).append(r.post_id)
+        for (bot_id, service_name), post_ids in leased_posts.items():
+            _release_work_leases(db, bot_id, service_name, post_ids)
+
+        # Шаг 3: Пересчитать агрегатные статусы для всех затронутых постов одним запросом
         unique_posts_to_update = {(r.post_id, r.public_bot_id) for r in batch.results}
-        
-        logger.info(f"🔄 Запуск обновления агрегатных статусов для {len(unique_posts_to_update)} уникальных постов/ботов.")
-        
-        for post_id, bot_id in unique_posts_to_update:
-            try:
-                logger.info(f"🔧 DEBUG: Вызываем _update_processed_data_flags для post_id={post_id}, bot_id={bot_id}")
-                _update_processed_data_flags(db, post_id, bot_id)
-                logger.info(f"✅ DEBUG: _update_processed_data_flags завершилась для post_id={post_id}, bot_id={bot_id}")
-            except Exception as e:
-                 logger.error(f"❌ Ошибка при обновлении агрегатного статуса для post_id={post_id}, bot_id={bot_id}: {e}", exc_info=True)
+        _update_processed_data_flags(db, unique_posts_to_update)
+        _refresh_digest_scores(db, [r.public_bot_id for r in batch.results], [r.post_id for r in batch.results])
 
         db.commit()
+        _invalidate_digest_cache([r.public_bot_id for r in batch.results])
         
         return JSONResponse(
             status_code=201,
@@ -5177,7 +6603,12 @@ def sync_ai_service_status(request: SyncStatusRequest, db: Session = Depends(get
             
             updated_count += 1
         
+        # Сервис отчитался по постам - снимаем их аренду
+        lease_service = "categorization" if request.service == "categorizer" else "summarization"
+        _release_work_leases(db, request.bot_id, lease_service, request.post_ids)
+        
         db.commit()
+        _invalidate_digest_cache([request.bot_id])
         
         # Получаем статистику после обновления
         stats = db.query(
@@ -5226,39 +6657,30 @@ def sync_ai_service_status(request: SyncStatusRequest, db: Session = Depends(get
 def get_ai_status(db: Session = Depends(get_db)):
     """Получить статус AI обработки (МУЛЬТИТЕНАНТНЫЕ СТАТУСЫ)"""
     try:
-        # Получаем активные боты (active + development)
-        active_bots = db.query(PublicBot).filter(
-            PublicBot.status.in_(['active', 'development'])
-        ).all()
-        
-        # Получаем каналы активных ботов
-        active_bot_ids = [bot.id for bot in active_bots]
+        # Активные боты (active + development) и их каналы - из снимка топологии
+        topology = _get_bot_topology(db)
+        active_bot_ids = [bot["id"] for bot in _topology_active_bots(topology)]
+        
+        # 🚀 Счетчики ai_status_counters: O(bots) вместо COUNT(DISTINCT) по processed_data.
+        # Считаются все записи processed_data бота, включая посты каналов, снятых с бота или
+        # выключенных после обработки (прежний запрос учитывал только текущие активные каналы).
+        # Счетчики ведутся по ботам: пост канала, назначенного двум ботам, входит в статусы дважды -
+        # поэтому прогресс считается от назначений пост×бот (total_bot_assignments), а не от total_posts
+        all_counters = _load_ai_status_counters(db)
+        active_counters = _sum_ai_status_counters({
+            bot_id: counters for bot_id, counters in all_counters.items() if bot_id in active_bot_ids
+        })
         
         if active_bot_ids:
-            # Получаем каналы, назначенные активным ботам
-            bot_channels = db.query(BotChannel).filter(
-                BotChannel.public_bot_id.in_(active_bot_ids),
-                BotChannel.is_active == True
-            ).all()
+            # telegram_id каналов, назначенных активным ботам
+            channel_telegram_ids = _topology_channel_telegram_ids(topology, active_bot_ids)
             
-            if bot_channels:
-                # Получаем telegram_id каналов
-                channel_ids = [bc.channel_id for bc in bot_channels]
-                channels_info = db.query(Channel).filter(Channel.id.in_(channel_ids)).all()
-                channel_telegram_ids = [ch.telegram_id for ch in channels_info]
-                
+            if channel_telegram_ids:
                 # 🚀 МУЛЬТИТЕНАНТНАЯ статистика постов по статусам
-                multitenant_stats = {}
-                for status in ['pending', 'categorized', 'summarized', 'completed', 'failed']:
-                    # Считаем уникальные посты из каналов активных ботов с данным статусом
-                    count = db.query(PostCache.id).join(
-                        ProcessedData, PostCache.id == ProcessedData.post_id
-                    ).filter(
-                        ProcessedData.processing_status == status,
-                        ProcessedData.public_bot_id.in_(active_bot_ids),
-                        PostCache.channel_telegram_id.in_(channel_telegram_ids)
-                    ).distinct().count()
-                    multitenant_stats[status] = count
+                multitenant_stats = {
+                    status: active_counters.get(f"status:{status}", 0)
+                    for status in ['pending', 'categorized', 'summarized', 'completed', 'failed']
+                }
                 
                 # Создаем совместимую с UI статистику (processing = categorized + summarized)
                 processing_count = multitenant_stats.get('categorized', 0) + multitenant_stats.get('summarized', 0)
@@ -5269,60 +6691,52 @@ def get_ai_status(db: Session = Depends(get_db)):
                     'failed': multitenant_stats.get('failed', 0)
                 }
                 
-                # Общая статистика постов (только для активных ботов)
-                total_assignable_posts = db.query(PostCache).filter(
+                # Посты по каналам одним GROUP BY: уникальные посты активных ботов (total_posts)
+                # и назначения пост×бот - знаменатель прогресса, сопоставимый с суммой счетчиков ботов
+                posts_per_channel = dict(db.query(PostCache.channel_telegram_id, func.count(PostCache.id)).filter(
                     PostCache.channel_telegram_id.in_(channel_telegram_ids)
-                ).count()
+                ).group_by(PostCache.channel_telegram_id).all())
+                total_assignable_posts = sum(posts_per_channel.values())
+                total_bot_assignments = sum(
+                    posts_per_channel.get(telegram_id, 0)
+                    for bot_id in active_bot_ids
+                    for telegram_id in _topology_channel_telegram_ids(topology, [bot_id])
+                )
             else:
                 # Нет назначенных каналов
                 multitenant_stats = {'pending': 0, 'categorized': 0, 'summarized': 0, 'completed': 0, 'failed': 0}
                 posts_stats = {'pending': 0, 'processing': 0, 'completed': 0, 'failed': 0}
-                total_assignable_posts = 0
+                total_assignable_posts = total_bot_assignments = 0
         else:
             # Нет активных ботов
             multitenant_stats = {'pending': 0, 'categorized': 0, 'summarized': 0, 'completed': 0, 'failed': 0}
             posts_stats = {'pending': 0, 'processing': 0, 'completed': 0, 'failed': 0}
-            total_assignable_posts = 0
+            total_assignable_posts = total_bot_assignments = 0
         
-        # Расчет прогресса от назначенных постов
+        # Расчет прогресса: завершенные записи ботов от назначений пост×бот (та же единица счета)
         progress_percentage = 0
-        if total_assignable_posts > 0:
+        if total_bot_assignments > 0:
             completed_posts = posts_stats.get('completed', 0)
-            progress_percentage = round((completed_posts / total_assignable_posts) * 100, 2)
+            progress_percentage = min(round((completed_posts / total_bot_assignments) * 100, 2), 100)
         
         # Общая статистика всех постов (для справки)
         total_posts_in_system = db.query(PostCache).count()
         
         # Статистика AI результатов
-        total_ai_results = db.query(ProcessedData).count()
+        total_ai_results = _sum_ai_status_counters(all_counters).get('total', 0)
         results_per_post = round(total_ai_results / max(total_assignable_posts, 1), 2)
         
         # 🔧 НОВОЕ: Статистика по флагам для активных ботов
-        flags_stats = {}
-        if active_bot_ids:
-            # Считаем посты с is_categorized = true
-            categorized_count = db.query(ProcessedData).filter(
-                ProcessedData.public_bot_id.in_(active_bot_ids),
-                ProcessedData.is_categorized == True
-            ).count()
-            
-            # Считаем посты с is_summarized = true
-            summarized_count = db.query(ProcessedData).filter(
-                ProcessedData.public_bot_id.in_(active_bot_ids),
-                ProcessedData.is_summarized == True
-            ).count()
-            
-            flags_stats = {
-                "categorized": categorized_count,
-                "summarized": summarized_count
-            }
-        else:
-            flags_stats = {"categorized": 0, "summarized": 0}
+        flags_stats = {
+            "categorized": active_counters.get('flag:is_categorized', 0),
+            "summarized": active_counters.get('flag:is_summarized', 0)
+        }
         
         # Статистика ботов
-        total_bots = db.query(PublicBot).count()
-        active_bots_count = db.query(PublicBot).filter(PublicBot.status == 'active').count()
-        development_bots = db.query(PublicBot).filter(PublicBot.status == 'development').count()
+        topology_bots = topology["snapshot"]["bots"]
+        total_bots = len(topology_bots)
+        active_bots_count = sum(1 for bot in topology_bots if bot["status"] == 'active')
+        development_bots = sum(1 for bot in topology_bots if bot["status"] == 'development')
         processing_bots = active_bots_count + development_bots
         
         return {
@@ -5330,6 +6744,7 @@ def get_ai_status(db: Session = Depends(get_db)):
             "multitenant_stats": multitenant_stats,  # Полная мультитенантная статистика
             "flags_stats": flags_stats,  # 🔧 НОВОЕ: Статистика по флагам
             "total_posts": total_assignable_posts,  # Посты назначенные активным ботам
+            "total_bot_assignments": total_bot_assignments,  # Пары пост×бот (единица posts_stats)
             "total_posts_in_system": total_posts_in_system,  # Все посты в системе
             "progress_percentage": progress_percentage,  # Прогресс от назначенных постов
             "ai_results_stats": {
@@ -5352,6 +6767,7 @@ def get_ai_status(db: Session = Depends(get_db)):
             "multitenant_stats": {"pending": 0, "categorized": 0, "summarized": 0, "completed": 0, "failed": 0},
             "flags_stats": {"categorized": 0, "summarized": 0},
             "total_posts": 0,
+            "total_bot_assignments": 0,
             "progress_percentage": 0,
             "ai_results_stats": {"total_results": 0, "results_per_post": 0},
             "bots_stats": {"total_bots": 0, "active_bots": 0, "development_bots": 0, "total_processing_bots": 0},
@@ -5363,10 +6779,9 @@ def get_ai_status(db: Session = Depends(get_db)):
 def get_multitenant_ai_status(db: Session = Depends(get_db)):
     """🚀 НОВЫЙ: Полная мультитенантная статистика AI обработки по ботам"""
     try:
-        # Получаем активные боты
-        active_bots = db.query(PublicBot).filter(
-            PublicBot.status.in_(['active', 'development'])
-        ).all()
+        # Активные боты и их каналы - из снимка топологии
+        topology = _get_bot_topology(db)
+        active_bots = _topology_active_bots(topology)
         
         if not active_bots:
             return {
@@ -5381,16 +6796,11 @@ def get_multitenant_ai_status(db: Session = Depends(get_db)):
         summary_stats = {"pending": 0, "processing": 0, "categorized": 0, "summarized": 0, "completed": 0, "failed": 0}
         
         for bot in active_bots:
-            # Получаем каналы бота
-            bot_channels = db.query(BotChannel).filter(
-                BotChannel.public_bot_id == bot.id,
-                BotChannel.is_active == True
-            ).all()
+            # Каналы бота
+            bot_channels = bot["channels"]
             
             if bot_channels:
-                channel_ids = [bc.channel_id for bc in bot_channels]
-                channels_info = db.query(Channel).filter(Channel.id.in_(channel_ids)).all()
-                channel_telegram_ids = [ch.telegram_id for ch in channels_info]
+                channel_telegram_ids = _topology_channel_telegram_ids(topology, [bot["id"]])
                 
                 # Статистика по статусам для этого бота
                 bot_stats = {}
@@ -5401,7 +6811,7 @@ def get_multitenant_ai_status(db: Session = Depends(get_db)):
                         ProcessedData, PostCache.id == ProcessedData.post_id
                     ).filter(
                         ProcessedData.processing_status == status,
-                        ProcessedData.public_bot_id == bot.id,
+                        ProcessedData.public_bot_id == bot["id"],
                         PostCache.channel_telegram_id.in_(channel_telegram_ids)
                     ).distinct().count()
                     bot_stats[status] = count
@@ -5411,7 +6821,7 @@ def get_multitenant_ai_status(db: Session = Depends(get_db)):
                     ProcessedData, PostCache.id == ProcessedData.post_id
                 ).filter(
                     ProcessedData.is_categorized == True,
-                    ProcessedData.public_bot_id == bot.id,
+                    ProcessedData.public_bot_id == bot["id"],
                     PostCache.channel_telegram_id.in_(channel_telegram_ids)
                 ).distinct().count()
                 
@@ -5419,7 +6829,7 @@ def get_multitenant_ai_status(db: Session = Depends(get_db)):
                     ProcessedData, PostCache.id == ProcessedData.post_id
                 ).filter(
                     ProcessedData.is_summarized == True,
-                    ProcessedData.public_bot_id == bot.id,
+                    ProcessedData.public_bot_id == bot["id"],
                     PostCache.channel_telegram_id.in_(channel_telegram_ids)
                 ).distinct().count()
                 
@@ -5457,9 +6867,9 @@ def get_multitenant_ai_status(db: Session = Depends(get_db)):
             }
             
             bots_detailed.append({
-                "bot_id": bot.id,
-                "name": bot.name,
-                "status": bot.status,
+                "bot_id": bot["id"],
+                "name": bot["name"],
+                "status": bot["status"],
                 "multitenant_stats": bot_stats,  # Полная статистика
                 "ui_stats": ui_compatible_stats,  # Совместимая с UI
                 "total_posts": total_bot_posts,
@@ -5562,7 +6972,11 @@ async def reprocess_all_posts(db: Session = Depends(get_db)):
         # 🔧 ИСПРАВЛЕНИЕ: Удаляем все записи из processed_service_results  
         db.query(ProcessedServiceResult).delete(synchronize_session=False)
         
+        # Снимаем все аренды, чтобы посты сразу стали доступны для повторной обработки
+        db.query(AIWorkLease).delete(synchronize_session=False)
+        
         db.commit()
+        _invalidate_digest_cache()
         
         # 🚀 АВТОЗАПУСК AI ORCHESTRATOR
         ai_start_success = False
@@ -5641,6 +7055,7 @@ def reprocess_bot_posts(bot_id: int, db: Session = Depends(get_db)):
         ).delete(synchronize_session=False)
         
         db.commit()
+        _invalidate_digest_cache([bot_id])
         
         return {
             "success": True,
@@ -5695,6 +7110,7 @@ def reprocess_channel_posts(channel_id: int, db: Session = Depends(get_db)):
             ).delete(synchronize_session=False)
         
         db.commit()
+        _invalidate_digest_cache()
         
         return {
             "success": True,
@@ -5780,6 +7196,7 @@ def reprocess_multiple_channels(request: dict, db: Session = Depends(get_db)):
             })
         
         db.commit()
+        _invalidate_digest_cache()
         
         return {
             "success": True,
@@ -5850,7 +7267,11 @@ async def clear_ai_results(confirm: bool = False, db: Session = Depends(get_db))
         # 🔧 ИСПРАВЛЕНИЕ: Удаляем все записи из processed_service_results
         db.query(ProcessedServiceResult).delete(synchronize_session=False)
         
+        # Снимаем все аренды, чтобы посты сразу стали доступны для повторной обработки
+        db.query(AIWorkLease).delete(synchronize_session=False)
+        
         db.commit()
+        _invalidate_digest_cache()
         
         # АВТОМАТИЧЕСКИ ЗАПУСКАЕМ AI ORCHESTRATOR ПОСЛЕ СБРОСА
         ai_orchestrator_triggered = False
@@ -6029,14 +7450,6 @@ async def generate_digest_preview(bot_id: int, db: Session = Depends(get_db)):
             if not post:
                 continue
             
-            # Парсим AI данные
-            try:
-                summaries = result.summaries if USE_POSTGRESQL else json.loads(result.summaries)
-                categories = result.categories if USE_POSTGRESQL else json.loads(result.categories)
-                metrics = result.metrics if USE_POSTGRESQL else json.loads(result.metrics)
-            except:
-                continue
-            
             digest_posts.append({
                 "post_id": post.id,
                 "title": post.title,
@@ -6044,12 +7457,12 @@ async def generate_digest_preview(bot_id: int, db: Session = Depends(get_db)):
                 "channel_telegram_id": post.channel_telegram_id,
                 "post_date": post.post_date,
                 "views": post.views,
-                "ai_summary": summaries.get("summary", "Резюме недоступно"),
-                "ai_category": categories.get("category", "Без категории"),
+                "ai_summary": result.summary_text or "Резюме недоступно",
+                "ai_category": result.category_name or "Без категории",
                 "ai_metrics": {
-                    "importance": metrics.get("importance", 0),
-                    "urgency": metrics.get("urgency", 0),
-                    "significance": metrics.get("significance", 0)
+                    "importance": result.importance or 0,
+                    "urgency": result.urgency or 0,
+                    "significance": result.significance or 0
                 }
             })
         
@@ -6090,10 +7503,9 @@ async def trigger_ai_processing():
         # 🔧 ИСПРАВЛЕНО: Используем мультитенантную логику для подсчета необработанных постов
         db = next(get_db())
         
-        # Находим активные боты
-        active_bots = db.query(PublicBot).filter(
-            PublicBot.status.in_(['active', 'development'])
-        ).all()
+        # Находим активные боты (снимок топологии)
+        topology = _get_bot_topology(db)
+        active_bots = _topology_active_bots(topology)
         
         if not active_bots:
             return {
@@ -6102,27 +7514,16 @@ async def trigger_ai_processing():
                 "pending_posts": 0
             }
         
-        # Собираем каналы всех активных ботов
-        active_channel_ids = set()
-        for bot in active_bots:
-            bot_channels = db.query(BotChannel).filter(
-                BotChannel.public_bot_id == bot.id,
-                BotChannel.is_active == True
-            ).all()
-            for bot_channel in bot_channels:
-                active_channel_ids.add(bot_channel.channel_id)
+        # telegram_id каналов всех активных ботов
+        active_telegram_ids = _topology_channel_telegram_ids(topology, [bot["id"] for bot in active_bots])
         
-        if not active_channel_ids:
+        if not active_telegram_ids:
             return {
                 "success": True,
                 "message": "У активных ботов нет каналов для обработки",
                 "pending_posts": 0
             }
         
-        # Получаем telegram_id каналов
-        channels = db.query(Channel).filter(Channel.id.in_(active_channel_ids)).all()
-        active_telegram_ids = [ch.telegram_id for ch in channels]
-        
         # Считаем все посты из каналов активных ботов
         total_posts = db.query(PostCache).filter(
             PostCache.channel_telegram_id.in_(active_telegram_ids)
@@ -6233,6 +7634,7 @@ def reprocess_multiple_channels_with_auto_start(request: dict, db: Session = Dep
             })
         
         db.commit()
+        _invalidate_digest_cache()
         
         # 2. Автозапуск AI Orchestrator через Celery
         ai_start_success = False
@@ -6275,44 +7677,19 @@ def reprocess_multiple_channels_with_auto_start(request: dict, db: Session = Dep
 def get_detailed_ai_status(db: Session = Depends(get_db)):
     """Получить детальную статистику AI сервисов (МУЛЬТИТЕНАНТНЫЕ СТАТУСЫ)"""
     try:
-        # 1. Находим активные боты и их каналы (та же логика что в /api/ai/status)
-        active_bots = db.query(PublicBot).filter(
-            PublicBot.status.in_(['active', 'development'])
-        ).all()
-        
-        # Собираем все каналы активных ботов
-        active_channel_ids = set()
-        for bot in active_bots:
-            bot_channels = db.query(BotChannel).filter(
-                BotChannel.public_bot_id == bot.id,
-                BotChannel.is_active == True
-            ).all()
-            for bot_channel in bot_channels:
-                active_channel_ids.add(bot_channel.channel_id)
-        
-        # Получаем telegram_id каналов
-        if active_channel_ids:
-            channels = db.query(Channel).filter(Channel.id.in_(active_channel_ids)).all()
-            active_telegram_ids = [ch.telegram_id for ch in channels]
-        else:
-            active_telegram_ids = []
-        
-        # 2. 🚀 МУЛЬТИТЕНАНТНАЯ статистика постов (только для постов активных ботов)
-        active_bot_ids = [bot.id for bot in active_bots]
-        multitenant_stats = {}
-        for status in ['pending', 'categorized', 'summarized', 'completed', 'failed']:
-            if active_telegram_ids and active_bot_ids:
-                # Считаем уникальные посты с мультитенантными статусами
-                count = db.query(PostCache.id).join(
-                    ProcessedData, PostCache.id == ProcessedData.post_id
-                ).filter(
-                    ProcessedData.processing_status == status,
-                    ProcessedData.public_bot_id.in_(active_bot_ids),
-                    PostCache.channel_telegram_id.in_(active_telegram_ids)
-                ).distinct().count()
-            else:
-                count = 0
-            multitenant_stats[status] = count
+        # 1. Находим активные боты и их каналы (снимок топологии, как в /api/ai/status)
+        topology = _get_bot_topology(db)
+        active_bots = _topology_active_bots(topology)
+        active_bot_ids = [bot["id"] for bot in active_bots]
+        active_telegram_ids = _topology_channel_telegram_ids(topology, active_bot_ids)
+        
+        # 2. 🚀 МУЛЬТИТЕНАНТНАЯ статистика постов (счетчики ai_status_counters, O(bots))
+        counters_by_bot = _load_ai_status_counters(db, active_bot_ids)
+        active_counters = _sum_ai_status_counters(counters_by_bot) if active_telegram_ids else {}
+        multitenant_stats = {
+            status: active_counters.get(f"status:{status}", 0)
+            for status in ['pending', 'categorized', 'summarized', 'completed', 'failed']
+        }
         
         # Создаем совместимую с UI статистику
         processing_count = multitenant_stats.get('categorized', 0) + multitenant_stats.get('summarized', 0)
@@ -6337,57 +7714,45 @@ def get_detailed_ai_status(db: Session = Depends(get_db)):
             progress_percentage = round((completed_posts / total_posts) * 100, 2)
         
         # 3. 🚀 МУЛЬТИТЕНАНТНАЯ статистика по каналам (только активные каналы)
+        # Два сгруппированных запроса вместо шести запросов на каждый канал
         channels_detailed = []
         if active_telegram_ids and active_bot_ids:
+            channel_totals = dict(db.query(
+                PostCache.channel_telegram_id, func.count(PostCache.id)
+            ).filter(
+                PostCache.channel_telegram_id.in_(active_telegram_ids)
+            ).group_by(PostCache.channel_telegram_id).all())
+            
+            channel_status_counts: Dict[int, Dict[str, int]] = {}
+            for telegram_id, processing_status, count in db.query(
+                PostCache.channel_telegram_id,
+                ProcessedData.processing_status,
+                func.count(func.distinct(PostCache.id))
+            ).join(
+                ProcessedData, PostCache.id == ProcessedData.post_id
+            ).filter(
+                PostCache.channel_telegram_id.in_(active_telegram_ids),
+                ProcessedData.public_bot_id.in_(active_bot_ids)
+            ).group_by(PostCache.channel_telegram_id, ProcessedData.processing_status).all():
+                channel_status_counts.setdefault(telegram_id, {})[processing_status] = count
+            
+            channels_by_telegram_id = {
+                channel["telegram_id"]: channel
+                for bot in active_bots for channel in bot["channels"]
+            }
             for telegram_id in active_telegram_ids:
-                # Считаем мультитенантную статистику для каждого канала
-                channel_total_posts = db.query(PostCache).filter(PostCache.channel_telegram_id == telegram_id).count()
-                
-                # Мультитенантные статусы для канала
-                pending = db.query(PostCache.id).join(
-                    ProcessedData, PostCache.id == ProcessedData.post_id
-                ).filter(
-                    PostCache.channel_telegram_id == telegram_id,
-                    ProcessedData.processing_status == 'pending',
-                    ProcessedData.public_bot_id.in_(active_bot_ids)
-                ).distinct().count()
-                
-                categorized = db.query(PostCache.id).join(
-                    ProcessedData, PostCache.id == ProcessedData.post_id
-                ).filter(
-                    PostCache.channel_telegram_id == telegram_id,
-                    ProcessedData.processing_status == 'categorized',
-                    ProcessedData.public_bot_id.in_(active_bot_ids)
-                ).distinct().count()
-                
-                summarized = db.query(PostCache.id).join(
-                    ProcessedData, PostCache.id == ProcessedData.post_id
-                ).filter(
-                    PostCache.channel_telegram_id == telegram_id,
-                    ProcessedData.processing_status == 'summarized',
-                    ProcessedData.public_bot_id.in_(active_bot_ids)
-                ).distinct().count()
-                
-                completed = db.query(PostCache.id).join(
-                    ProcessedData, PostCache.id == ProcessedData.post_id
-                ).filter(
-                    PostCache.channel_telegram_id == telegram_id,
-                    ProcessedData.processing_status == 'completed',
-                    ProcessedData.public_bot_id.in_(active_bot_ids)
-                ).distinct().count()
-                
-                failed = db.query(PostCache.id).join(
-                    ProcessedData, PostCache.id == ProcessedData.post_id
-                ).filter(
-                    PostCache.channel_telegram_id == telegram_id,
-                    ProcessedData.processing_status == 'failed',
-                    ProcessedData.public_bot_id.in_(active_bot_ids)
-                ).distinct().count()
+                channel_total_posts = channel_totals.get(telegram_id, 0)
+                status_counts = channel_status_counts.get(telegram_id, {})
+                pending = status_counts.get('pending', 0)
+                categorized = status_counts.get('categorized', 0)
+                summarized = status_counts.get('summarized', 0)
+                completed = status_counts.get('completed', 0)
+                failed = status_counts.get('failed', 0)
                 
                 # Получаем информацию о канале
-                channel = db.query(Channel).filter(Channel.telegram_id == telegram_id).first()
-                channel_name = channel.title or channel.channel_name if channel else f'Channel {telegram_id}'
-                channel_username = channel.username if channel else None
+                channel = channels_by_telegram_id.get(telegram_id)
+                channel_name = channel["title"] or channel["channel_name"] if channel else f'Channel {telegram_id}'
+                channel_username = channel["username"] if channel else None
                 
                 processing_count = categorized + summarized  # Промежуточные статусы
                 
@@ -6408,9 +7773,9 @@ def get_detailed_ai_status(db: Session = Depends(get_db)):
         # 4. Статистика AI результатов по ботам (только активные боты)
         
         if active_bot_ids:
+            # Количество результатов берем из счетчиков, из processed_data - только время последней обработки
             ai_results_by_bot = db.query(
                 ProcessedData.public_bot_id,
-                func.count(ProcessedData.id).label('results_count'),
                 func.max(ProcessedData.processed_at).label('last_processed')
             ).filter(ProcessedData.public_bot_id.in_(active_bot_ids)).group_by(ProcessedData.public_bot_id).all()
         else:
@@ -6419,9 +7784,9 @@ def get_detailed_ai_status(db: Session = Depends(get_db)):
         # Получаем названия ботов
         bot_names = {}
         for bot in active_bots:
-            bot_names[bot.id] = {
-                'name': bot.name,
-                'status': bot.status
+            bot_names[bot["id"]] = {
+                'name': bot["name"],
+                'status': bot["status"]
             }
         
         bots_detailed = []
@@ -6431,7 +7796,7 @@ def get_detailed_ai_status(db: Session = Depends(get_db)):
                 'bot_id': stat.public_bot_id,
                 'name': bot_info.get('name', f'Bot {stat.public_bot_id}'),
                 'status': bot_info.get('status', 'unknown'),
-                'results_count': stat.results_count,
+                'results_count': counters_by_bot.get(stat.public_bot_id, {}).get('total', 0),
                 'last_processed': stat.last_processed.isoformat() if stat.last_processed else None
             })
         
@@ -6882,6 +8247,7 @@ async def clear_all_data(
             deleted_stats["posts_cache"] = posts_count
             
         db.commit()
+        _invalidate_digest_cache()
         
         logger.info(f"🧹 ПОЛНАЯ ОЧИСТКА ДАННЫХ: {deleted_stats}")
         
@@ -6963,6 +8329,7 @@ async def clear_data_by_channel(
         
         # Коммитим изменения
         db.commit()
+        _invalidate_digest_cache()
         
         return {
             "success": True,
@@ -7070,6 +8437,7 @@ async def clear_data_by_bot(
                 deleted_stats["affected_channels"] = len(telegram_ids)
         
         db.commit()
+        _invalidate_digest_cache([bot_id])
         
         logger.info(f"🧹 ОЧИСТКА ПО БОТУ {bot.name}: {deleted_stats}")
         
@@ -7248,6 +8616,7 @@ async def bot_changed_webhook(request: dict):
             raise HTTPException(status_code=400, detail="bot_id is required")
         
         logger.info(f"🔔 Webhook получен: bot_id={bot_id}, action={action}")
+        _invalidate_bot_topology()
         
         # Отправляем уведомление MultiBotManager через HTTP
         multibot_manager_url = os.getenv("MULTIBOT_MANAGER_URL", "http://localhost:8001")
@@ -694,8 +694,10 @@ async def digest_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         )
         return
     
-    # Сортируем посты по метрикам
+    # Сортируем посты по рангу из Backend (метрики × веса канала и категории бота)
     def calculate_score(post):
+        if post.get('ai_digest_score') is not None:
+            return post['ai_digest_score']
         importance = post.get('ai_importance', 0)
         urgency = post.get('ai_urgency', 0)
         significance = post.get('ai_significance', 0)
@@ -1432,8 +1434,10 @@ async def digest_command_callback(query, context):
         )
         return
     
-    # Сортируем посты по метрикам
+    # Сортируем посты по рангу из Backend (метрики × веса канала и категории бота)
     def calculate_score(post):
+        if post.get('ai_digest_score') is not None:
+            return post['ai_digest_score']
         importance = post.get('ai_importance', 0)
         urgency = post.get('ai_urgency', 0)
         significance = post.get('ai_significance', 0)
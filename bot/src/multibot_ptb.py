@@ -296,11 +296,21 @@ def register_handlers(app: Application, bot_id: int):
             async with aiohttp.ClientSession() as session:
                 url = f"{backend_url}/api/public-bots/{bot_id}/users/{user.id}/digest"
                 logger.info(f"/digest request: bot_id={bot_id}, user_id={user.id}, url={url}")
-                async with session.get(url, params={"limit": 15}, timeout=20) as resp:
+                # delta: только новое с последнего доставленного дайджеста
+                async with session.get(url, params={"limit": 15, "delta": "true"}, timeout=20) as resp:
                     if resp.status == 200:
                         data = await resp.json()
                         text = data.get("text") or "❌ Пустой дайджест"
                         await msg.edit_text(text, parse_mode="HTML")
+                        # Подтверждаем доставку - следующий /digest начнется с этого водяного знака
+                        watermark = data.get("watermark")
+                        if watermark:
+                            try:
+                                async with session.post(f"{url}/delivered", json={"watermark": watermark}, timeout=10) as ack:
+                                    if ack.status != 200:
+                                        logger.warning(f"/digest delivered ack failed: status={ack.status}")
+                            except Exception as e:
+                                logger.warning(f"/digest delivered ack error: {e}")
                         return
         except Exception as e:
             logger.error(f"/digest error: {e}")
@@ -0,0 +1,72 @@
+-- Migration 002: Уникальность (channel_telegram_id, telegram_message_id) в posts_cache
+-- Дата: 2026-10-17
+-- Описание: /api/posts/batch дедуплицирует посты одним INSERT ... ON CONFLICT DO NOTHING,
+--           для этого нужен уникальный индекс. В unified схеме 001 он уже объявлен
+--           (CONSTRAINT uq_posts_cache_channel_message) - для таких баз миграция ничего не меняет
+--           и только догоняет базы, созданные через create_all.
+--           processed_data ссылается на posts_cache с ON DELETE CASCADE: перед удалением
+--           дубликатов их AI результаты переносятся на оставшуюся запись.
+
+BEGIN;
+
+-- Дубликат → самая ранняя запись с тем же (channel_telegram_id, telegram_message_id)
+CREATE TEMP TABLE posts_cache_duplicates ON COMMIT DROP AS
+SELECT pc.id AS duplicate_id, keep.keep_id
+FROM posts_cache pc
+JOIN (
+    SELECT channel_telegram_id, telegram_message_id, MIN(id) AS keep_id
+    FROM posts_cache
+    GROUP BY channel_telegram_id, telegram_message_id
+    HAVING COUNT(*) > 1
+) keep
+  ON keep.channel_telegram_id = pc.channel_telegram_id
+ AND keep.telegram_message_id = pc.telegram_message_id
+WHERE pc.id <> keep.keep_id;
+
+-- AI результаты дубликата переносим на оставшуюся запись, если у нее нет своих для этого бота
+-- (DISTINCT ON: из нескольких дубликатов одного бота переносится один результат)
+UPDATE processed_data pd
+SET post_id = moved.keep_id
+FROM (
+    SELECT DISTINCT ON (d.keep_id, pd2.public_bot_id) pd2.id, d.keep_id
+    FROM processed_data pd2
+    JOIN posts_cache_duplicates d ON d.duplicate_id = pd2.post_id
+    WHERE NOT EXISTS (
+        SELECT 1 FROM processed_data own
+        WHERE own.post_id = d.keep_id AND own.public_bot_id = pd2.public_bot_id
+    )
+    ORDER BY d.keep_id, pd2.public_bot_id, pd2.processed_at DESC NULLS LAST
+) moved
+WHERE pd.id = moved.id;
+
+-- processed_service_results без FK - переносим так же, чтобы не оставить сирот
+UPDATE processed_service_results psr
+SET post_id = moved.keep_id
+FROM (
+    SELECT DISTINCT ON (d.keep_id, psr2.public_bot_id, psr2.service_name) psr2.id, d.keep_id
+    FROM processed_service_results psr2
+    JOIN posts_cache_duplicates d ON d.duplicate_id = psr2.post_id
+    WHERE NOT EXISTS (
+        SELECT 1 FROM processed_service_results own
+        WHERE own.post_id = d.keep_id
+          AND own.public_bot_id = psr2.public_bot_id
+          AND own.service_name = psr2.service_name
+    )
+    ORDER BY d.keep_id, psr2.public_bot_id, psr2.service_name, psr2.processed_at DESC
+) moved
+WHERE psr.id = moved.id;
+
+DELETE FROM processed_service_results
+WHERE post_id IN (SELECT duplicate_id FROM posts_cache_duplicates);
+
+-- Удаляем дубликаты, оставляя самую раннюю запись (оставшиеся у них processed_data дублируют
+-- результаты оставшейся записи и удаляются каскадом)
+DELETE FROM posts_cache
+WHERE id IN (SELECT duplicate_id FROM posts_cache_duplicates);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_posts_cache_channel_message
+    ON posts_cache (channel_telegram_id, telegram_message_id);
+
+SELECT log_migration('002_posts_cache_unique_message', 'Уникальный индекс posts_cache(channel_telegram_id, telegram_message_id) для set-based ingest');
+
+COMMIT;
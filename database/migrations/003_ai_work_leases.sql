@@ -0,0 +1,25 @@
+-- Migration 003: Очередь работы AI воркеров (аренда постов)
+-- Дата: 2026-10-17
+-- Описание: POST /api/ai/work/claim атомарно выдает воркеру N постов для (bot, service)
+--           через SELECT ... FOR UPDATE SKIP LOCKED и фиксирует аренду с истечением.
+--           Просроченная аренда перехватывается следующим claim автоматически.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS ai_work_leases (
+    id SERIAL PRIMARY KEY,
+    post_id BIGINT NOT NULL,
+    public_bot_id INTEGER NOT NULL,
+    service_name VARCHAR(64) NOT NULL,
+    worker_id VARCHAR(255) NOT NULL,
+    leased_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    lease_expires_at TIMESTAMP NOT NULL,
+    CONSTRAINT uq_ai_work_lease_post_bot_service UNIQUE (post_id, public_bot_id, service_name)
+);
+
+CREATE INDEX IF NOT EXISTS idx_ai_work_leases_bot_service_expires
+    ON ai_work_leases (public_bot_id, service_name, lease_expires_at);
+
+SELECT log_migration('003_ai_work_leases', 'Таблица ai_work_leases для аренды постов AI воркерами (SKIP LOCKED claim)');
+
+COMMIT;
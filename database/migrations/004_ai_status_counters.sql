@@ -0,0 +1,87 @@
+-- Migration 004: Инкрементальные счетчики статусов AI по ботам
+-- Дата: 2026-10-17
+-- Описание: /api/ai/status, /api/ai/detailed-status и /api/stats читают ai_status_counters
+--           (O(bots)) вместо COUNT(DISTINCT) по posts_cache JOIN processed_data.
+--           Счетчики поддерживаются statement-level триггерами на processed_data в той же
+--           транзакции, что и запись. Backend при старте только проверяет наличие триггеров;
+--           повторный пересчет - POST /api/ai/status-counters/rebuild.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS ai_status_counters (
+    public_bot_id INTEGER NOT NULL,
+    counter_name VARCHAR(64) NOT NULL,
+    value BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (public_bot_id, counter_name)
+);
+
+CREATE OR REPLACE FUNCTION ai_status_counter_names(p_status TEXT, p_categorized BOOLEAN, p_summarized BOOLEAN)
+RETURNS SETOF TEXT LANGUAGE sql IMMUTABLE AS $$
+    SELECT 'total'
+    UNION ALL SELECT 'status:' || COALESCE(p_status, 'pending')
+    UNION ALL SELECT 'flag:is_categorized' WHERE COALESCE(p_categorized, FALSE)
+    UNION ALL SELECT 'flag:is_summarized' WHERE COALESCE(p_summarized, FALSE)
+$$;
+
+CREATE OR REPLACE FUNCTION ai_status_counters_apply() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO ai_status_counters (public_bot_id, counter_name, value)
+        SELECT n.public_bot_id, c.name, COUNT(*)
+        FROM new_rows n
+        CROSS JOIN LATERAL ai_status_counter_names(n.processing_status, n.is_categorized, n.is_summarized) AS c(name)
+        GROUP BY 1, 2 ORDER BY 1, 2
+        ON CONFLICT (public_bot_id, counter_name) DO UPDATE SET value = ai_status_counters.value + EXCLUDED.value;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO ai_status_counters (public_bot_id, counter_name, value)
+        SELECT o.public_bot_id, c.name, -COUNT(*)
+        FROM old_rows o
+        CROSS JOIN LATERAL ai_status_counter_names(o.processing_status, o.is_categorized, o.is_summarized) AS c(name)
+        GROUP BY 1, 2 ORDER BY 1, 2
+        ON CONFLICT (public_bot_id, counter_name) DO UPDATE SET value = ai_status_counters.value + EXCLUDED.value;
+    ELSE
+        INSERT INTO ai_status_counters (public_bot_id, counter_name, value)
+        SELECT d.public_bot_id, d.name, SUM(d.delta)
+        FROM (
+            SELECT n.public_bot_id, c.name, 1 AS delta
+            FROM new_rows n
+            CROSS JOIN LATERAL ai_status_counter_names(n.processing_status, n.is_categorized, n.is_summarized) AS c(name)
+            UNION ALL
+            SELECT o.public_bot_id, c.name, -1 AS delta
+            FROM old_rows o
+            CROSS JOIN LATERAL ai_status_counter_names(o.processing_status, o.is_categorized, o.is_summarized) AS c(name)
+        ) d
+        GROUP BY 1, 2 HAVING SUM(d.delta) <> 0 ORDER BY 1, 2
+        ON CONFLICT (public_bot_id, counter_name) DO UPDATE SET value = ai_status_counters.value + EXCLUDED.value;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_ai_status_counters_insert AFTER INSERT ON processed_data
+REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION ai_status_counters_apply();
+
+CREATE OR REPLACE TRIGGER trg_ai_status_counters_update AFTER UPDATE ON processed_data
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION ai_status_counters_apply();
+
+CREATE OR REPLACE TRIGGER trg_ai_status_counters_delete AFTER DELETE ON processed_data
+REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION ai_status_counters_apply();
+
+-- Начальное заполнение счетчиков
+LOCK TABLE processed_data IN SHARE ROW EXCLUSIVE MODE;
+
+DELETE FROM ai_status_counters;
+
+INSERT INTO ai_status_counters (public_bot_id, counter_name, value)
+SELECT public_bot_id, 'total', COUNT(*) FROM processed_data GROUP BY public_bot_id
+UNION ALL
+SELECT public_bot_id, 'status:' || COALESCE(processing_status, 'pending'), COUNT(*)
+FROM processed_data GROUP BY public_bot_id, COALESCE(processing_status, 'pending')
+UNION ALL
+SELECT public_bot_id, 'flag:is_categorized', COUNT(*) FROM processed_data WHERE is_categorized GROUP BY public_bot_id
+UNION ALL
+SELECT public_bot_id, 'flag:is_summarized', COUNT(*) FROM processed_data WHERE is_summarized GROUP BY public_bot_id;
+
+SELECT log_migration('004_ai_status_counters', 'Счетчики статусов AI по ботам (ai_status_counters) с триггерами на processed_data');
+
+COMMIT;
@@ -0,0 +1,17 @@
+-- Migration 005: Индексы keyset (cursor) пагинации posts_cache
+-- Дата: 2026-10-17
+-- Описание: /api/posts/cache и /api/posts/cache-with-ai в cursor режиме продолжают выборку
+--           после ключа (sort_column, id) последней строки вместо OFFSET. Составные индексы
+--           позволяют читать страницу диапазоном по индексу на любой глубине.
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS idx_posts_cache_collected_at_id
+    ON posts_cache (collected_at, id);
+
+CREATE INDEX IF NOT EXISTS idx_posts_cache_post_date_id
+    ON posts_cache (post_date, id);
+
+SELECT log_migration('005_posts_cache_keyset_indexes', 'Индексы (collected_at, id) и (post_date, id) для cursor пагинации posts_cache');
+
+COMMIT;
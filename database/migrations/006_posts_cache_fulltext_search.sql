@@ -0,0 +1,27 @@
+-- Migration 006: Полнотекстовый поиск по posts_cache
+-- Дата: 2026-10-17
+-- Описание: параметр search в /api/posts/cache, /api/posts/cache-with-ai и /api/posts/cache/count
+--           вместо ILIKE '%...%' (последовательное сканирование) использует генерируемую
+--           колонку search_vector (словарь russian, title - вес A, content - вес B) с GIN индексом.
+--           sort_by=relevance сортирует по ts_rank_cd.
+--           ADD COLUMN ... STORED переписывает posts_cache под ACCESS EXCLUSIVE блокировкой -
+--           применять в окно обслуживания; backend при старте эту DDL не выполняет и до миграции
+--           ищет по выражению индекса idx_posts_cache_content_search из 001.
+--           Индекс search_vector заменяет idx_posts_cache_content_search - старый удаляется.
+
+BEGIN;
+
+ALTER TABLE posts_cache ADD COLUMN IF NOT EXISTS search_vector tsvector
+GENERATED ALWAYS AS (
+    setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce(content, '')), 'B')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_posts_cache_search_vector
+    ON posts_cache USING GIN (search_vector);
+
+DROP INDEX IF EXISTS idx_posts_cache_content_search;
+
+SELECT log_migration('006_posts_cache_fulltext_search', 'Генерируемая колонка search_vector (russian) и GIN индекс для поиска постов (заменяет idx_posts_cache_content_search)');
+
+COMMIT;
@@ -0,0 +1,33 @@
+-- Migration 007: Типизированные AI колонки processed_data
+-- Дата: 2026-10-17
+-- Описание: category_name, summary_text, importance, urgency, significance - генерируемые (STORED)
+--           колонки из categories/summaries/metrics. Читатели processed_data (cache-with-ai,
+--           персональный дайджест, digest-data, preview) больше не разбирают JSON построчно,
+--           фильтр категории и сортировка по важности идут по индексам.
+--           Выражения совпадают с AI_TYPED_COLUMNS_SQL в backend/main.py.
+--           Все колонки добавляются одним ALTER TABLE - таблица переписывается один раз
+--           (ACCESS EXCLUSIVE блокировка на время перезаписи); backend при старте эту DDL не выполняет.
+
+BEGIN;
+
+ALTER TABLE processed_data
+    ADD COLUMN IF NOT EXISTS category_name TEXT
+        GENERATED ALWAYS AS (NULLIF(COALESCE(NULLIF(categories->>'category_name', ''), NULLIF(categories->>'ru', ''), NULLIF(categories->>'primary', ''), NULLIF(categories->>'primary_category', ''), NULLIF(categories->>'category', '')), 'None')) STORED,
+    ADD COLUMN IF NOT EXISTS summary_text TEXT
+        GENERATED ALWAYS AS (COALESCE(NULLIF(summaries->>'ru', ''), NULLIF(summaries->>'summary', ''), NULLIF(summaries->>'text', ''))) STORED,
+    ADD COLUMN IF NOT EXISTS importance DOUBLE PRECISION
+        GENERATED ALWAYS AS (COALESCE(CASE jsonb_typeof(metrics->'importance') WHEN 'number' THEN CAST(metrics->>'importance' AS DOUBLE PRECISION) END, CASE jsonb_typeof(categories->'importance') WHEN 'number' THEN CAST(categories->>'importance' AS DOUBLE PRECISION) END)) STORED,
+    ADD COLUMN IF NOT EXISTS urgency DOUBLE PRECISION
+        GENERATED ALWAYS AS (COALESCE(CASE jsonb_typeof(metrics->'urgency') WHEN 'number' THEN CAST(metrics->>'urgency' AS DOUBLE PRECISION) END, CASE jsonb_typeof(categories->'urgency') WHEN 'number' THEN CAST(categories->>'urgency' AS DOUBLE PRECISION) END)) STORED,
+    ADD COLUMN IF NOT EXISTS significance DOUBLE PRECISION
+        GENERATED ALWAYS AS (COALESCE(CASE jsonb_typeof(metrics->'significance') WHEN 'number' THEN CAST(metrics->>'significance' AS DOUBLE PRECISION) END, CASE jsonb_typeof(categories->'significance') WHEN 'number' THEN CAST(categories->>'significance' AS DOUBLE PRECISION) END)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_processed_data_bot_category
+    ON processed_data (public_bot_id, category_name);
+
+CREATE INDEX IF NOT EXISTS idx_processed_data_bot_importance
+    ON processed_data (public_bot_id, importance);
+
+SELECT log_migration('007_processed_data_typed_ai_columns', 'Генерируемые типизированные AI колонки processed_data и индексы по категории/важности');
+
+COMMIT;
@@ -0,0 +1,22 @@
+-- Migration 008: Водяные знаки доставки дайджестов (delta дайджесты)
+-- Дата: 2026-10-17
+-- Описание: /api/public-bots/{bot_id}/users/{telegram_id}/digest?delta=true выбирает только посты,
+--           обработанные после последнего доставленного дайджеста. Бот подтверждает доставку
+--           через .../digest/delivered, водяной знак хранится per (bot, user).
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS digest_delivery_watermarks (
+    public_bot_id INTEGER NOT NULL,
+    user_telegram_id BIGINT NOT NULL,
+    delivered_until TIMESTAMP WITH TIME ZONE NOT NULL,  -- как processed_data.processed_at (001)
+    updated_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (public_bot_id, user_telegram_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_processed_data_bot_processed_at
+    ON processed_data (public_bot_id, processed_at);
+
+SELECT log_migration('008_digest_delivery_watermarks', 'Водяные знаки доставки дайджестов и индекс processed_data(public_bot_id, processed_at)');
+
+COMMIT;
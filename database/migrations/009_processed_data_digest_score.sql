@@ -0,0 +1,39 @@
+-- Migration 009: Предрасчитанный ранг поста в дайджесте бота
+-- Дата: 2026-10-17
+-- Описание: processed_data.digest_score = (importance*3 + urgency*2 + significance*2)
+--           × bot_channels.weight × bot_categories.weight (нет связи - вес 1.0).
+--           Backend пересчитывает его при записи AI результатов и смене весов,
+--           /api/public-bots/{bot_id}/digest-data берет top-N по индексу (public_bot_id, digest_score).
+
+BEGIN;
+
+ALTER TABLE processed_data
+    ADD COLUMN IF NOT EXISTS digest_score DOUBLE PRECISION NOT NULL DEFAULT 0;
+
+UPDATE processed_data pd
+SET digest_score = (
+        COALESCE(pd.importance, 0) * 3 +
+        COALESCE(pd.urgency, 0) * 2 +
+        COALESCE(pd.significance, 0) * 2
+    )
+    * COALESCE((
+        SELECT MAX(bc.weight)
+        FROM bot_channels bc
+        JOIN channels c ON c.id = bc.channel_id
+        JOIN posts_cache pc ON pc.channel_telegram_id = c.telegram_id
+        WHERE pc.id = pd.post_id AND bc.public_bot_id = pd.public_bot_id
+    ), 1.0)
+    * COALESCE((
+        SELECT MAX(bcat.weight)
+        FROM bot_categories bcat
+        JOIN categories cat ON cat.id = bcat.category_id
+        WHERE bcat.public_bot_id = pd.public_bot_id
+          AND lower(cat.name) = lower(pd.category_name)
+    ), 1.0);
+
+CREATE INDEX IF NOT EXISTS idx_processed_data_bot_digest_score
+    ON processed_data (public_bot_id, digest_score);
+
+SELECT log_migration('009_processed_data_digest_score', 'Колонка processed_data.digest_score с весами каналов/категорий бота и индекс (public_bot_id, digest_score)');
+
+COMMIT;
@@ -3,6 +3,7 @@ import json
 import logging
 import os
 import sys
+import zlib
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -191,6 +192,9 @@ SESSION_NAME = str(SESSION_DIR / "morningstar")
 # Настройки Backend API
 BACKEND_API_URL = os.getenv("BACKEND_API_URL", "http://localhost:8000")
 
+# Потоковая отправка постов (NDJSON + gzip в /api/posts/stream) по мере сбора каналов
+STREAM_INGEST = os.getenv("USERBOT_STREAM_INGEST", "true").lower() == "true"
+
 # Детальная диагностика TEST_MODE
 TEST_MODE_RAW = os.getenv("TEST_MODE", "true")
 print(f"🔍 TEST_MODE диагностика:")
@@ -470,6 +474,30 @@ class MorningStarUserbot:
             logger.exception("Полная трассировка ошибки:")  # Добавляем полную трассировку
             return []
 
+    def to_post_cache_payload(self, post):
+        """Конвертация собранного поста в формат PostCacheCreate"""
+        raw_payload = {
+            "channel_telegram_id": post.get("channel_id"),
+            "telegram_message_id": post.get("id"),
+            "title": None,
+            "content": post.get("text", ""),
+            "media_urls": [post.get("url")] if post.get("url") else [],
+            "views": post.get("views", 0),
+            "post_date": post.get("date"),
+            "userbot_metadata": {},
+        }
+
+        if PostBase is not None:
+            try:
+                validated = PostBase(**raw_payload)
+                return validated.model_dump(mode='json')
+            except Exception as e:
+                logger.warning("⚠️ Валидация через schemas.PostBase не удалась, отправляю raw: %s", e)
+                return raw_payload
+
+        logger.debug("ℹ️ schemas.PostBase недоступен, использую raw payload")
+        return raw_payload
+
     async def send_to_backend(self, data):
         """Отправка данных в Backend API posts_cache"""
         # В режиме тестирования просто логируем данные
@@ -500,29 +528,7 @@ class MorningStarUserbot:
         
         # Конвертируем каждый пост в формат PostCacheCreate
         for post in data.get("posts", []):
-            raw_payload = {
-                "channel_telegram_id": post.get("channel_id"),
-                "telegram_message_id": post.get("id"),
-                "title": None,
-                "content": post.get("text", ""),
-                "media_urls": [post.get("url")] if post.get("url") else [],
-                "views": post.get("views", 0),
-                "post_date": post.get("date"),
-                "userbot_metadata": {},
-            }
-
-            if PostBase is not None:
-                try:
-                    validated = PostBase(**raw_payload)
-                    post_cache = validated.model_dump(mode='json')
-                except Exception as e:
-                    logger.warning("⚠️ Валидация через schemas.PostBase не удалась, отправляю raw: %s", e)
-                    post_cache = raw_payload
-            else:
-                logger.debug("ℹ️ schemas.PostBase недоступен, использую raw payload")
-                post_cache = raw_payload
-
-            posts_batch["posts"].append(post_cache)
+            posts_batch["posts"].append(self.to_post_cache_payload(post))
 
         headers = {
             "Content-Type": "application/json",
@@ -563,31 +569,8 @@ class MorningStarUserbot:
             logger.error("💥 Ошибка при отправке в Backend API: %s", e)
             return False
 
-    async def collect_and_send(self):
-        """Основной цикл сбора и отправки данных"""
-        all_posts = []
-        successful_channels = 0
-        failed_channels = 0
-
-        # Получаем настройки из Backend API
-        collection_depth_days = await self.get_config_value("collection_depth_days", 3)
-        max_posts_per_channel = await self.get_config_value("max_posts_per_channel", 50)
-        
-        # Конвертируем дни в часы
-        collection_hours = int(collection_depth_days) * 24
-        max_posts_limit = int(max_posts_per_channel)
-        
-        logger.info("📋 Настройки сбора: %d дней (%d часов), максимум %d постов с канала", 
-                   collection_depth_days, collection_hours, max_posts_limit)
-
-        # Получаем список каналов из API
-        channels = await self.get_channels_from_api()
-        if not channels:
-            logger.warning("⚠️ Нет активных каналов для сбора постов")
-            return []
-
-        logger.info("📊 Начинаю сбор постов из %s каналов...", len(channels))
-
+    async def iter_channels_posts(self, channels, collection_hours, max_posts_limit, stats):
+        """Поочередно читает каналы и отдает посты каждого канала по мере готовности"""
         for i, channel in enumerate(channels):
             logger.info(
                 "📺 Обрабатываю канал %s/%s: %s", i + 1, len(channels), channel
@@ -603,24 +586,129 @@ class MorningStarUserbot:
                                channel, max_posts_limit, len(posts))
                 
                 if posts:
-                    all_posts.extend(posts)
-                    successful_channels += 1
+                    stats["successful_channels"] += 1
                     logger.info("✅ %s: получено %s постов", channel, len(posts))
+                    yield posts
                 else:
                     logger.warning("⚠️ %s: постов не найдено", channel)
 
             except Exception as e:
-                failed_channels += 1
+                stats["failed_channels"] += 1
                 logger.error("❌ %s: ошибка - %s", channel, e)
 
             # Задержка между каналами для избежания rate limits
             if i < len(channels) - 1:  # Не ждем после последнего канала
                 await asyncio.sleep(3)
 
+    async def stream_to_backend(self, channel_posts_iter, stats):
+        """Потоковая отправка постов в Backend API (/api/posts/stream, NDJSON + gzip).
+
+        Посты каждого канала уходят в Backend сразу после чтения канала,
+        поэтому память остается ограниченной, а AI pipeline получает первые посты раньше.
+        """
+        BACKEND_API_URL = os.getenv("BACKEND_API_URL", "http://localhost:8000")
+
+        async def body():
+            compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+            header = {"channels_metadata": getattr(self, 'channels_metadata', {})}
+            yield compressor.compress((json.dumps(header, ensure_ascii=False) + "\n").encode("utf-8"))
+            async for posts in channel_posts_iter:
+                lines = "".join(
+                    json.dumps(self.to_post_cache_payload(post), ensure_ascii=False) + "\n"
+                    for post in posts
+                )
+                stats["total_posts"] += len(posts)
+                # Z_SYNC_FLUSH - отдаем данные канала сразу, не дожидаясь заполнения буфера
+                yield compressor.compress(lines.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            yield compressor.flush()
+
+        headers = {
+            "Content-Type": "application/x-ndjson",
+            "Content-Encoding": "gzip",
+            "User-Agent": "MorningStarUserbot/1.0",
+        }
+
+        try:
+            # Сбор идет параллельно с запросом, поэтому ограничиваем только простой соединения
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=600)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                backend_url = f"{BACKEND_API_URL}/api/posts/stream"
+                logger.info("📤 Потоковая отправка в Backend API: %s", backend_url)
+
+                async with session.post(backend_url, data=body(), headers=headers) as response:
+                    if response.status == 201:
+                        response_json = await response.json()
+                        logger.info(
+                            "✅ Поток принят Backend: создано %s постов, пропущено %s, чанков %s, ошибок %s",
+                            response_json.get("created_posts", 0),
+                            response_json.get("skipped_posts", 0),
+                            response_json.get("chunks_committed", 0),
+                            response_json.get("invalid_lines", 0)
+                        )
+                        return True
+                    else:
+                        response_text = await response.text()
+                        logger.error(
+                            "❌ Ошибка потоковой отправки в Backend API: %s - %s",
+                            response.status,
+                            response_text,
+                        )
+                        return False
+
+        except asyncio.TimeoutError:
+            logger.error("⏰ Timeout при потоковой отправке в Backend API")
+            return False
+        except Exception as e:
+            logger.error("💥 Ошибка при потоковой отправке в Backend API: %s", e)
+            return False
+
+    async def collect_and_send(self):
+        """Основной цикл сбора и отправки данных. Возвращает количество собранных постов"""
+        stats = {"successful_channels": 0, "failed_channels": 0, "total_posts": 0}
+
+        # Получаем настройки из Backend API
+        collection_depth_days = await self.get_config_value("collection_depth_days", 3)
+        max_posts_per_channel = await self.get_config_value("max_posts_per_channel", 50)
+        
+        # Конвертируем дни в часы
+        collection_hours = int(collection_depth_days) * 24
+        max_posts_limit = int(max_posts_per_channel)
+        
+        logger.info("📋 Настройки сбора: %d дней (%d часов), максимум %d постов с канала", 
+                   collection_depth_days, collection_hours, max_posts_limit)
+
+        # Получаем список каналов из API
+        channels = await self.get_channels_from_api()
+        if not channels:
+            logger.warning("⚠️ Нет активных каналов для сбора постов")
+            return 0
+
+        logger.info("📊 Начинаю сбор постов из %s каналов...", len(channels))
+
+        channel_posts_iter = self.iter_channels_posts(channels, collection_hours, max_posts_limit, stats)
+
+        if STREAM_INGEST and not TEST_MODE:
+            success = await self.stream_to_backend(channel_posts_iter, stats)
+            logger.info(
+                "📈 Сбор завершен: успешно %s, ошибок %s",
+                stats["successful_channels"],
+                stats["failed_channels"],
+            )
+            if success:
+                logger.info("📤 Потоково отправлено %s постов в Backend API", stats["total_posts"])
+            else:
+                logger.error("❌ Ошибка потоковой отправки в Backend API")
+            return stats["total_posts"]
+
+        all_posts = []
+        async for posts in channel_posts_iter:
+            all_posts.extend(posts)
+        stats["total_posts"] = len(all_posts)
+
         logger.info(
             "📈 Сбор завершен: успешно %s, ошибок %s",
-            successful_channels,
-            failed_channels,
+            stats["successful_channels"],
+            stats["failed_channels"],
         )
 
         # Отправляем данные в Backend API
@@ -629,8 +717,8 @@ class MorningStarUserbot:
                 "timestamp": datetime.now().isoformat(),
                 "collection_stats": {
                     "total_posts": len(all_posts),
-                    "successful_channels": successful_channels,
-                    "failed_channels": failed_channels,
+                    "successful_channels": stats["successful_channels"],
+                    "failed_channels": stats["failed_channels"],
                     "channels_processed": channels,
                 },
                 "posts": all_posts,
@@ -645,15 +733,15 @@ class MorningStarUserbot:
         else:
             logger.warning("⚠️ Нет постов для отправки")
 
-        return all_posts
+        return len(all_posts)
 
     async def run_once(self):
         """Однократный запуск сбора данных"""
         await self.start()
         logger.info("🚀 Запуск однократного сбора постов...")
-        posts = await self.collect_and_send()
-        logger.info("✅ Сбор завершен! Всего постов: %s", len(posts))
-        return posts
+        posts_count = await self.collect_and_send()
+        logger.info("✅ Сбор завершен! Всего постов: %s", posts_count)
+        return posts_count
 
     async def run_periodic(self, interval_minutes=30):
         """Запуск в режиме периодического сбора"""
@@ -664,8 +752,8 @@ class MorningStarUserbot:
         while True:
             try:
                 logger.info("📊 Начинаю периодический сбор...")
-                posts = await self.collect_and_send()
-                logger.info("✅ Цикл завершен! Собрано постов: %s", len(posts))
+                posts_count = await self.collect_and_send()
+                logger.info("✅ Цикл завершен! Собрано постов: %s", posts_count)
 
                 # Ожидание до следующего цикла
                 sleep_seconds = interval_minutes * 60